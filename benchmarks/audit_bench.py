@@ -0,0 +1,77 @@
+import argparse
+import itertools
+import time
+
+from benchmarks.common import save_results
+from benchmarks.seed import seed_database
+from benchmarks.service_bench import measure
+from config import get_user_id
+from src.services.audit import flush_audit_log, set_audit_enabled
+from src.services.detection import (
+    create_detection_session,
+    delete_detection_session,
+    update_detection_session,
+)
+from src.services.patient import get_patient_full_details, update_patient_details
+
+
+def audited_cases(patient_code):
+    """Write paths that record audit entries; every call changes a field so an entry is queued."""
+    patient = get_patient_full_details(patient_code, user_id=get_user_id())
+    session = patient["detection_sessions"][0]
+    counter = itertools.count()
+
+    def delete_session_case():
+        created = create_detection_session(patient["id"], get_user_id(), {"detection_date": session["detection_date"]})
+        delete_detection_session(created["id"], get_user_id())
+
+    return {
+        "update_patient_details": lambda: update_patient_details(patient["id"], get_user_id(), {
+            "name": f"Audit Benchmark {next(counter)}",
+            "sex": patient["sex"],
+            "date_of_birth": patient["dob"],
+        }),
+        "update_detection_session": lambda: update_detection_session(session["id"], get_user_id(), {
+            "follow_up_plan": f"Follow-up {next(counter)}",
+        }),
+        "create_detection_session+delete_detection_session": delete_session_case,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the write latency added by the audit log")
+    parser.add_argument("--patients", type=int, default=100, help="Patients per doctor")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--output", help="Where to write the JSON results")
+    args = parser.parse_args()
+
+    seeded = seed_database(patients_per_doctor=args.patients, sessions_per_patient=1, images_per_session=1)
+    cases = audited_cases(seeded["patients"][str(get_user_id())][0])
+
+    results = {}
+    print(f"{'case':<56}{'off p50':>10}{'on p50':>10}{'off p95':>10}{'on p95':>10}{'overhead':>10}")
+    for name, func in cases.items():
+        set_audit_enabled(False)
+        off = measure(func, args.iterations)
+        set_audit_enabled(True)
+        on = measure(func, args.iterations)
+
+        # Time to drain what the measured calls queued, i.e. the background cost
+        started = time.perf_counter()
+        flush_audit_log()
+        drain_ms = (time.perf_counter() - started) * 1000
+
+        results[name] = {
+            "audit_off": off,
+            "audit_on": on,
+            "overhead_p50_ms": on["p50_ms"] - off["p50_ms"],
+            "overhead_p95_ms": on["p95_ms"] - off["p95_ms"],
+            "drain_ms": drain_ms,
+        }
+        print(
+            f"{name:<56}{off['p50_ms']:>10.3f}{on['p50_ms']:>10.3f}{off['p95_ms']:>10.3f}{on['p95_ms']:>10.3f}"
+            f"{results[name]['overhead_p50_ms']:>+10.3f}"
+        )
+
+    path = save_results("audit_bench", vars(args), results, args.output)
+    print(f"\nResults written to {path}")
@@ -0,0 +1,133 @@
+import argparse
+
+import psycopg2
+
+from benchmarks.seed import add_scale_arguments, seed_from_args
+from config import DATABASE_URL, get_user_id
+from src.services.detection import (
+    delete_detection_session,
+    get_detection_result,
+    get_detection_session_images,
+    get_detection_sessions_page,
+    get_patient_detection_trend,
+    update_detection_session,
+)
+from src.services.patient import (
+    delete_patient,
+    get_all_patients,
+    get_patient_basic_details,
+    get_patient_full_details,
+    update_patient_details,
+)
+from src.services.storage import require_postgres
+from src.utils.tracing import count_queries
+
+# Plan nodes that mean a hot query is not served by an index in the right order
+FORBIDDEN_NODES = {"Seq Scan", "Sort", "Incremental Sort"}
+
+# Tiny lookup tables where a sequential scan is the planner's correct choice
+SMALL_TABLES = ("users",)
+
+
+def hot_query_cases(patient_codes):
+    """
+    Service calls whose statements must be index-driven.
+
+    Each case runs the real service function so the checked SQL can never
+    drift from the SQL the application issues.
+    """
+    patient_code = patient_codes[0]
+    patient = get_patient_full_details(patient_code, user_id=get_user_id())
+    session = patient["detection_sessions"][0]
+
+    return {
+        "get_all_patients": lambda: get_all_patients(user_id=get_user_id()),
+        "get_patient_full_details": lambda: get_patient_full_details(patient_code, user_id=get_user_id()),
+        "get_patient_basic_details": lambda: get_patient_basic_details(patient_code, user_id=get_user_id()),
+        "get_detection_sessions_page": lambda: get_detection_sessions_page(patient["id"], get_user_id(), limit=10),
+        "get_patient_detection_trend": lambda: get_patient_detection_trend(patient["id"], get_user_id()),
+        "get_detection_session_images": lambda: get_detection_session_images(session["id"], get_user_id()),
+        "get_detection_result": lambda: get_detection_result(session["id"], get_user_id()),
+        "update_patient_details": lambda: update_patient_details(patient["id"], get_user_id(), {
+            "name": patient["name"],
+            "sex": patient["sex"],
+            "date_of_birth": patient["dob"],
+        }),
+        "update_detection_session": lambda: update_detection_session(session["id"], get_user_id(), {
+            "diagnostic_result": session["diagnostic_result"],
+        }),
+        "delete_detection_session": lambda: delete_detection_session(session["id"], get_user_id()),
+        "delete_patient": lambda: delete_patient(patient_codes[-1], get_user_id()),
+    }
+
+
+def find_forbidden_nodes(plan, found=None):
+    """Collect forbidden node types (with their relation) from an EXPLAIN JSON plan tree."""
+    if found is None:
+        found = []
+    if plan["Node Type"] in FORBIDDEN_NODES:
+        found.append(f"{plan['Node Type']} {plan.get('Relation Name', '')}".strip())
+    for child in plan.get("Plans", []):
+        find_forbidden_nodes(child, found)
+    return found
+
+
+def check_statement(cur, query, vars):
+    """
+    EXPLAIN one captured statement.
+
+    Returns:
+        list: Forbidden plan nodes, or None if the statement is not checked
+    """
+    sql = cur.mogrify(query, vars).decode()
+    normalized = " ".join(sql.split()).upper()
+    if normalized.startswith("INSERT"):
+        return None
+    if any(f"FROM {table.upper()} " in normalized + " " for table in SMALL_TABLES):
+        return None
+
+    cur.execute(f"EXPLAIN (FORMAT JSON) {sql}")
+    plan = cur.fetchone()[0][0]["Plan"]
+    return find_forbidden_nodes(plan)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Fail if a hot service query plans a sequential scan or an explicit sort"
+    )
+    add_scale_arguments(parser)
+    parser.set_defaults(doctors=20, patients_per_doctor=500, sessions_per_patient=5)
+    args = parser.parse_args()
+    require_postgres("Query plan checks")  # Reads PostgreSQL EXPLAIN output
+
+    seeded = seed_from_args(args)
+    patient_codes = seeded["patients"][str(get_user_id())]
+
+    conn = psycopg2.connect(DATABASE_URL)
+    conn.autocommit = True
+    cur = conn.cursor()
+    # Index-only scans need an up-to-date visibility map
+    cur.execute("VACUUM ANALYZE patients, detection_sessions, detection_images")
+
+    failures = []
+    for name, call in hot_query_cases(patient_codes).items():
+        with count_queries() as captured:
+            call()
+        for query, vars in captured["statements"]:
+            found = check_statement(cur, query, vars)
+            if found is None:
+                continue
+            first_line = " ".join(query.split())[:90]
+            status = "FAIL" if found else "ok"
+            print(f"[{status}] {name}: {first_line}")
+            for node in found:
+                print(f"       {node}")
+            if found:
+                failures.append(name)
+
+    cur.close()
+    conn.close()
+
+    if failures:
+        raise SystemExit(f"\n{len(failures)} hot statement(s) fell back to a sequential scan or sort")
+    print("\nAll hot statements are index-driven")
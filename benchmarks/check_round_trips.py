@@ -0,0 +1,171 @@
+import argparse
+import asyncio
+import os
+from datetime import datetime
+
+from benchmarks.seed import add_scale_arguments, seed_from_args
+from config import IMAGE_UPLOAD_DIR, get_user_id
+from src.api.detection import _create_detection
+from src.services.detection import (
+    create_detection_session,
+    create_detection_session_for_patient,
+    delete_detection_session,
+    get_detection_session_images,
+    update_detection_session,
+)
+from src.services.patient import get_patient_full_details, update_patient_details
+from src.services.storage import is_sqlite
+from src.utils.tracing import count_queries
+
+# Statements each write path may issue (background audit/report/indexing work is not counted)
+EXPECTED_STATEMENTS = 1
+
+
+def run_counted(call):
+    with count_queries() as counter:
+        result = call()
+    return result, counter["count"]
+
+
+def by_id(images):
+    return sorted(images, key=lambda image: image["id"])
+
+
+def check_timestamps(name, records, fields):
+    """Every timestamp must come back as a datetime, as it did before the JSON aggregation."""
+    problems = []
+    for record in records:
+        for field in fields:
+            if not isinstance(record[field], datetime):
+                problems.append(f"{name}: {field} is {type(record[field]).__name__}, expected datetime")
+    return problems
+
+
+def round_trip_cases(patient_code):
+    """
+    Write paths, each with a check of the returned shape against the read path.
+
+    Returns:
+        dict: name -> (call, check(result) -> list of problems, cleanup(result))
+    """
+    patient = get_patient_full_details(patient_code, user_id=get_user_id())
+    session = patient["detection_sessions"][0]
+    image_path = session["detection_images"][0]["image_path"]
+
+    def check_patient(result):
+        expected = get_patient_full_details(patient_code, user_id=get_user_id())
+        for p in (result, expected):
+            for s in p["detection_sessions"]:
+                s["detection_images"] = by_id(s["detection_images"])
+        problems = [] if result == expected else ["update_patient_details: result differs from get_patient_full_details"]
+        problems += check_timestamps("update_patient_details", result["detection_sessions"],
+                                     ("detection_date", "created_at", "updated_at"))
+        for s in result["detection_sessions"]:
+            problems += check_timestamps("update_patient_details", s["detection_images"], ("created_at",))
+        return problems
+
+    def check_session(result):
+        expected = get_detection_session_images(session["id"], get_user_id())
+        problems = []
+        if [i["id"] for i in result["detection_images"]] != [i["id"] for i in expected]:
+            problems.append("update_detection_session: detection_images differ from get_detection_session_images")
+        problems += check_timestamps("update_detection_session", result["detection_images"], ("created_at",))
+        return problems
+
+    def check_created(name, images):
+        def check(result):
+            problems = [] if result else [f"{name}: no session created"]
+            if result and len(result["detection_images"]) != images:
+                problems.append(f"{name}: {len(result['detection_images'])} images returned, expected {images}")
+            if result:
+                problems += check_timestamps(name, result["detection_images"], ("created_at",))
+            return problems
+        return check
+
+    def delete_session(result):
+        if result:
+            delete_detection_session(result["id"] if "id" in result else result["session_id"], get_user_id())
+
+    def remove_uploads(result):
+        delete_session(result)
+        for name in os.listdir(IMAGE_UPLOAD_DIR):
+            if name.startswith(f"{patient_code}_") and name.endswith("_round_trip.jpg"):
+                os.remove(os.path.join(IMAGE_UPLOAD_DIR, name))
+
+    def api_upload():
+        with open(image_path, "rb") as f:
+            content = f.read()
+        return asyncio.run(_create_detection(patient_code, [("round_trip.jpg", content)],
+                                             '{"detection": "Eczema", "confidence": 0.9}'))
+
+    new_session = {"detection_result": '{"detection": "Eczema", "confidence": 0.9}', "detection_images": [image_path] * 2}
+    return {
+        "update_patient_details": (
+            lambda: update_patient_details(patient["id"], get_user_id(), {
+                "name": patient["name"],
+                "sex": patient["sex"],
+                "date_of_birth": patient["dob"],
+            }),
+            check_patient,
+            lambda result: None,
+        ),
+        "update_detection_session": (
+            lambda: update_detection_session(session["id"], get_user_id(), {"follow_up_plan": session["follow_up_plan"]}),
+            check_session,
+            lambda result: None,
+        ),
+        "update_detection_session[new images]": (
+            lambda: update_detection_session(session["id"], get_user_id(), {"detection_images": [image_path] * 2}),
+            check_session,
+            lambda result: None,
+        ),
+        "create_detection_session": (
+            lambda: create_detection_session(patient["id"], get_user_id(), new_session),
+            check_created("create_detection_session", 2),
+            delete_session,
+        ),
+        "create_detection_session_for_patient": (
+            lambda: create_detection_session_for_patient(patient_code, get_user_id(), new_session),
+            check_created("create_detection_session_for_patient", 2),
+            delete_session,
+        ),
+        "POST /api/detection/{patient_id}": (
+            api_upload,
+            lambda result: [] if "session_id" in result else [f"POST /api/detection: {result}"],
+            remove_uploads,
+        ),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Fail if a write path takes more than one database round trip or changes its returned shape"
+    )
+    add_scale_arguments(parser)
+    parser.set_defaults(patients_per_doctor=5, sessions_per_patient=3, images_per_session=2)
+    args = parser.parse_args()
+
+    seeded = seed_from_args(args)
+    patient_code = seeded["patients"][str(get_user_id())][0]
+
+    # SQLite statements are in-process calls rather than round trips, so only the shapes are checked there
+    count_statements = not is_sqlite()
+
+    failures = []
+    for name, (call, check, cleanup) in round_trip_cases(patient_code).items():
+        result, statements = run_counted(call)
+        problems = check(result)
+        cleanup(result)
+        if count_statements and statements != EXPECTED_STATEMENTS:
+            problems.append(f"{name}: {statements} statements, expected {EXPECTED_STATEMENTS}")
+        print(f"[{'FAIL' if problems else 'ok'}] {name}: {statements} statement(s)")
+        for problem in problems:
+            print(f"       {problem}")
+        failures.extend(problems)
+
+    if failures:
+        raise SystemExit(f"\n{len(failures)} round-trip check(s) failed")
+    if count_statements:
+        print("\nEvery write path is a single round trip with its original result shape")
+    else:
+        print("\nEvery write path returns its original result shape")
@@ -0,0 +1,119 @@
+import json
+import os
+import platform
+import subprocess
+from datetime import datetime
+
+RESULTS_DIR = os.path.join("benchmarks", "results")
+
+
+def percentile(values, pct):
+    """Return the pct-th percentile (0-100) of values using linear interpolation."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize(latencies_ms, errors, elapsed_s):
+    """
+    Summarize one operation's samples.
+
+    Args:
+        latencies_ms (list): Latency of every completed call in milliseconds
+        errors (int): Number of failed calls
+        elapsed_s (float): Wall-clock duration of the run
+
+    Returns:
+        dict: count, throughput, error rate and p50/p95/p99 latency
+    """
+    total = len(latencies_ms) + errors
+    return {
+        "count": total,
+        "errors": errors,
+        "error_rate": errors / total if total else 0.0,
+        "throughput_rps": total / elapsed_s if elapsed_s else 0.0,
+        "p50_ms": percentile(latencies_ms, 50),
+        "p95_ms": percentile(latencies_ms, 95),
+        "p99_ms": percentile(latencies_ms, 99),
+        "mean_ms": sum(latencies_ms) / len(latencies_ms) if latencies_ms else None,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except Exception:
+        return "unknown"
+
+
+def save_results(name, params, results, output=None):
+    """
+    Write a JSON baseline for a benchmark run.
+
+    Returns:
+        str: Path of the written file
+    """
+    revision = git_revision()
+    payload = {
+        "benchmark": name,
+        "revision": revision,
+        "timestamp": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "params": params,
+        "results": results,
+    }
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{name}-{revision}.json")
+    with open(output, "w") as f:
+        json.dump(payload, f, indent=2, default=str)
+    return output
+
+
+def compare_results(baseline_path, results, tolerance=0.2, metrics=("p50_ms", "p95_ms", "p99_ms")):
+    """
+    Compare results against a saved baseline.
+
+    Args:
+        baseline_path (str): JSON file written by save_results
+        results (dict): operation name -> summary dict
+        tolerance (float): Allowed relative slowdown, e.g. 0.2 for 20%
+        metrics (tuple): Latency metrics to compare
+
+    Returns:
+        list: Human readable regression descriptions, empty if none
+    """
+    with open(baseline_path) as f:
+        baseline = json.load(f)["results"]
+
+    regressions = []
+    for operation, summary in results.items():
+        previous = baseline.get(operation)
+        if not previous:
+            continue
+        for metric in metrics:
+            old, new = previous.get(metric), summary.get(metric)
+            if old and new and new > old * (1 + tolerance):
+                regressions.append(f"{operation} {metric}: {old:.2f} -> {new:.2f} (+{(new / old - 1) * 100:.0f}%)")
+        if summary.get("error_rate", 0) > previous.get("error_rate", 0) + 0.01:
+            regressions.append(
+                f"{operation} error_rate: {previous.get('error_rate', 0):.3f} -> {summary['error_rate']:.3f}"
+            )
+    return regressions
+
+
+def print_table(results):
+    print(f"{'operation':<36}{'count':>8}{'rps':>10}{'err%':>8}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for operation, s in results.items():
+        def fmt(v):
+            return f"{v:10.2f}" if v is not None else f"{'-':>10}"
+        print(
+            f"{operation:<36}{s['count']:>8}{s['throughput_rps']:>10.1f}{s['error_rate'] * 100:>8.2f}"
+            f"{fmt(s['p50_ms'])}{fmt(s['p95_ms'])}{fmt(s['p99_ms'])}"
+        )
@@ -0,0 +1,91 @@
+import argparse
+import subprocess
+import sys
+import time
+
+from benchmarks.common import save_results
+
+# Entry points measured by default: the UI script, the login page it renders
+# first, each page component, and the API module a uvicorn worker boots with.
+DEFAULT_MODULES = [
+    "main",
+    "src.components.login",
+    "src.components.patient_list",
+    "src.components.patient_form",
+    "src.components.patient_detail",
+    "src.api.detection",
+]
+
+
+def parse_importtime(stderr):
+    """
+    Parse `python -X importtime` output.
+
+    Returns:
+        list: (module, self_us, cumulative_us) tuples in import order
+    """
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|", 2)
+        rows.append((module.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def profile_module(module, repeat):
+    """
+    Import module in fresh interpreters.
+
+    Returns:
+        dict: Best wall-clock import time and the heaviest imports it pulled in
+    """
+    wall_times = []
+    rows = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            capture_output=True,
+            text=True,
+        )
+        wall_times.append((time.perf_counter() - started) * 1000)
+        if completed.returncode != 0:
+            raise RuntimeError(f"import {module} failed:\n{completed.stderr[-2000:]}")
+        rows = parse_importtime(completed.stderr)
+
+    top_level = {}
+    for name, _, cumulative in rows:
+        root = name.split(".")[0]
+        top_level[root] = max(top_level.get(root, 0), cumulative)
+
+    return {
+        "wall_ms": min(wall_times),
+        "import_ms": max((cumulative for _, _, cumulative in rows), default=0) / 1000,
+        "modules_loaded": len(rows),
+        "heaviest": sorted(
+            ({"package": k, "cumulative_ms": v / 1000} for k, v in top_level.items()),
+            key=lambda r: r["cumulative_ms"],
+            reverse=True,
+        )[:15],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import-time profile of the app entry points")
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh interpreters per module; best is kept")
+    parser.add_argument("--top", type=int, default=8, help="Heaviest packages listed per module")
+    parser.add_argument("--output", help="Where to write the JSON results")
+    args = parser.parse_args()
+
+    results = {}
+    for module in args.modules:
+        results[module] = profile_module(module, args.repeat)
+        r = results[module]
+        print(f"\n{module}: {r['wall_ms']:.0f}ms wall, {r['import_ms']:.0f}ms importing {r['modules_loaded']} modules")
+        for heavy in r["heaviest"][:args.top]:
+            print(f"  {heavy['package']:<30}{heavy['cumulative_ms']:>9.1f}ms")
+
+    path = save_results("import_profile", vars(args), results, args.output)
+    print(f"\nResults written to {path}")
@@ -0,0 +1,204 @@
+import argparse
+import glob
+import json
+import os
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import compare_results, print_table, save_results, summarize
+from benchmarks.seed import add_scale_arguments, random_detection, seed_from_args
+from config import get_user_id
+from src.services.detection import update_detection_session
+from src.services.patient import get_all_patients, get_patient_full_details
+
+# Uploaded files carry this marker so --cleanup can remove them afterwards
+UPLOAD_MARKER = "loadtest"
+
+
+class Recorder:
+    """Thread-safe collection of latency samples and errors per operation."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, operation, started, ok):
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            if ok:
+                self.latencies[operation].append(elapsed_ms)
+            else:
+                self.errors[operation] += 1
+
+    def summary(self, elapsed_s):
+        operations = set(self.latencies) | set(self.errors)
+        return {
+            op: summarize(self.latencies[op], self.errors[op], elapsed_s)
+            for op in sorted(operations)
+        }
+
+
+def build_multipart(files, fields):
+    """
+    Encode files and form fields as multipart/form-data.
+
+    Args:
+        files (list): (field name, filename, bytes) tuples
+        fields (dict): Plain form fields
+
+    Returns:
+        tuple: (body bytes, content type header)
+    """
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+        )
+    for name, filename, content in files:
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            f"Content-Type: image/jpeg\r\n\r\n".encode() + content + b"\r\n"
+        )
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+def device_upload(api_url, patient_code, images, rng, recorder, device_id="device"):
+    """
+    Simulate one device posting a detection with 1-3 images.
+
+    Rejections by admission control (429/503) are recorded separately as
+    api.create_detection[rejected], and the device waits Retry-After as a
+    real client would.
+    """
+    chosen = rng.sample(images, k=min(len(images), rng.randint(1, 3)))
+    files = [
+        ("images", f"{UPLOAD_MARKER}_{i}_{os.path.basename(path)}", content)
+        for i, (path, content) in enumerate(chosen)
+    ]
+    detection = random_detection(rng).model_dump_json()
+    body, content_type = build_multipart(files, {"detection_result": detection})
+    request = urllib.request.Request(
+        f"{api_url}/api/detection/{patient_code}",
+        data=body,
+        headers={"Content-Type": content_type, "X-Client-Id": device_id},
+        method="POST",
+    )
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=60) as response:
+            payload = json.loads(response.read())
+        recorder.record("api.create_detection", started, response.status == 200 and "error" not in payload)
+    except urllib.error.HTTPError as e:
+        if e.code not in (429, 503):
+            recorder.record("api.create_detection", started, False)
+            return
+        recorder.record("api.create_detection[rejected]", started, True)
+        time.sleep(min(int(e.headers.get("Retry-After", "1")), 10))
+    except (urllib.error.URLError, OSError, ValueError):
+        recorder.record("api.create_detection", started, False)
+
+
+def clinician_actions(patient_codes, rng, recorder):
+    """Simulate one clinician interaction: list, open a patient, sometimes edit a session."""
+    started = time.perf_counter()
+    patients = get_all_patients(user_id=get_user_id())
+    recorder.record("service.get_all_patients", started, bool(patients))
+
+    started = time.perf_counter()
+    patient = get_patient_full_details(rng.choice(patient_codes), user_id=get_user_id())
+    recorder.record("service.get_patient_full_details", started, patient is not None)
+
+    if patient and patient["detection_sessions"] and rng.random() < 0.2:
+        session = rng.choice(patient["detection_sessions"])
+        started = time.perf_counter()
+        updated = update_detection_session(session["id"], get_user_id(), {
+            "diagnostic_result": session["diagnostic_result"],
+            "follow_up_plan": session["follow_up_plan"],
+        })
+        recorder.record("service.update_detection_session", started, updated is not None)
+
+
+def run_load(args, patient_codes):
+    images = [
+        (path, open(path, "rb").read())
+        for path in sorted(glob.glob(os.path.join("local_files", "images", "*")))
+        if UPLOAD_MARKER not in os.path.basename(path)
+    ]
+    recorder = Recorder()
+    deadline = time.perf_counter() + args.duration
+
+    def device_worker(worker_id):
+        rng = random.Random(args.seed + worker_id)
+        while time.perf_counter() < deadline:
+            device_upload(args.api_url, rng.choice(patient_codes), images, rng, recorder, f"loadtest-device-{worker_id}")
+
+    def clinician_worker(worker_id):
+        rng = random.Random(args.seed + 10000 + worker_id)
+        while time.perf_counter() < deadline:
+            clinician_actions(patient_codes, rng, recorder)
+            time.sleep(args.think_time)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.devices + args.clinicians) as pool:
+        futures = [pool.submit(device_worker, i) for i in range(args.devices)]
+        futures += [pool.submit(clinician_worker, i) for i in range(args.clinicians)]
+        for future in futures:
+            future.result()
+    return recorder.summary(time.perf_counter() - started)
+
+
+def cleanup_uploads():
+    removed = 0
+    for path in glob.glob(os.path.join("local_files", "images", f"*_{UPLOAD_MARKER}_*")):
+        os.remove(path)
+        removed += 1
+    return removed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent load test for the detection API and services")
+    add_scale_arguments(parser)
+    parser.add_argument("--api-url", default="http://localhost:8001")
+    parser.add_argument("--devices", type=int, default=8, help="Concurrent uploading devices")
+    parser.add_argument("--clinicians", type=int, default=8, help="Concurrent clinicians using the UI services")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to run")
+    parser.add_argument("--think-time", type=float, default=0.1, help="Pause between clinician actions")
+    parser.add_argument("--skip-seed", action="store_true", help="Reuse previously seeded data")
+    parser.add_argument("--output", help="Where to write the JSON results")
+    parser.add_argument("--compare", help="Baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative slowdown")
+    parser.add_argument("--cleanup", action="store_true", help="Delete uploaded files afterwards")
+    args = parser.parse_args()
+
+    if args.skip_seed:
+        patient_codes = [p["ID"] for p in get_all_patients(user_id=get_user_id())]
+    else:
+        patient_codes = seed_from_args(args)["patients"][str(get_user_id())]
+    if not patient_codes:
+        raise SystemExit("No patients available for the admin doctor")
+
+    results = run_load(args, patient_codes)
+    print_table(results)
+    path = save_results("load_test", vars(args), results, args.output)
+    print(f"\nResults written to {path}")
+
+    if args.cleanup:
+        print(f"Removed {cleanup_uploads()} uploaded files")
+
+    if args.compare:
+        regressions = compare_results(args.compare, results, args.tolerance)
+        if regressions:
+            print("\nPerformance regressions:")
+            for regression in regressions:
+                print(f"  {regression}")
+            raise SystemExit(1)
+        print("\nNo regressions against baseline")
@@ -0,0 +1,75 @@
+import argparse
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date
+
+from config import get_user_id
+from src.services.patient import create_patient
+from src.services.patient_id import allocate_patient_id, allocate_patient_ids
+from src.services.storage import connect
+
+STRESS_NAME = "Patient ID Stress"
+
+
+def create_one(_):
+    """Create a patient the way the new-patient form does; returns its id or None on failure."""
+    patient = create_patient({
+        "patient_id": allocate_patient_id(),
+        "name": STRESS_NAME,
+        "sex": "Other",
+        "date_of_birth": date(1990, 1, 1),
+    }, user_id=get_user_id())
+    return patient["patient_id"] if patient else None
+
+
+def process_worker(args):
+    """One OS process creating patients from several threads."""
+    creations, threads, bulk = args
+    ids = []
+    if bulk:
+        # Bulk-import path: reserve identifiers in one go
+        ids.extend(allocate_patient_ids(bulk))
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        ids.extend(pool.map(create_one, range(creations)))
+    return ids
+
+
+def clear_stress_patients():
+    conn = connect()
+    with conn, conn.cursor() as cur:
+        cur.execute("DELETE FROM patients WHERE name = %s", (STRESS_NAME,))
+    conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create thousands of patients concurrently and check id uniqueness")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=16, help="Threads per process")
+    parser.add_argument("--per-process", type=int, default=1000, help="Patients created per process")
+    parser.add_argument("--bulk", type=int, default=5000, help="Ids bulk-allocated per process")
+    parser.add_argument("--keep", action="store_true", help="Keep the created patients")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.processes) as pool:
+        results = list(pool.map(
+            process_worker,
+            [(args.per_process, args.threads, args.bulk)] * args.processes,
+        ))
+    elapsed = time.perf_counter() - started
+
+    ids = [patient_id for batch in results for patient_id in batch]
+    failures = ids.count(None)
+    duplicates = {k: v for k, v in Counter(i for i in ids if i).items() if v > 1}
+    created = args.processes * args.per_process - failures
+
+    print(f"Created {created} patients and allocated {args.processes * args.bulk} bulk ids in {elapsed:.1f}s "
+          f"({created / elapsed:.0f} creations/s)")
+    print(f"Failed creations: {failures}")
+    print(f"Duplicate ids: {len(duplicates)}")
+
+    if not args.keep:
+        clear_stress_patients()
+    if failures or duplicates:
+        raise SystemExit(1)
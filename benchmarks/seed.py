@@ -0,0 +1,202 @@
+import argparse
+import glob
+import os
+import random
+from datetime import datetime, timedelta
+
+from psycopg2.extras import RealDictCursor, execute_values
+
+from config import AUTH_CREDENTIALS, DETECTION_CLASSES
+from src.services.storage import connect, is_sqlite
+from src.utils.detection_result import DetectionResult
+
+# Seeded rows are recognisable by these prefixes so they can be removed again
+PATIENT_PREFIX = "B-"
+DOCTOR_PREFIX = "bench_doctor_"
+
+
+def random_detection(rng):
+    """A detection result with a full class distribution, as a device sends it."""
+    weights = [rng.random() ** 4 for _ in DETECTION_CLASSES]  # Skewed towards one class
+    total = sum(weights)
+    probabilities = {label: weight / total for label, weight in zip(DETECTION_CLASSES, weights)}
+    detection = max(probabilities, key=probabilities.get)
+    return DetectionResult(
+        detection=detection, confidence=round(probabilities[detection], 2), probabilities=probabilities
+    )
+
+
+def insert_values(cur, query, rows, fetch=False):
+    """
+    execute_values on PostgreSQL. SQLite runs one prepared statement per row,
+    which is an in-process call there rather than a round trip.
+    """
+    if not is_sqlite():
+        return execute_values(cur, query, rows, page_size=1000, fetch=fetch)
+    query = query.replace("VALUES %s", f"VALUES ({', '.join(['%s'] * len(rows[0]))})")
+    if not fetch:
+        cur.executemany(query, rows)
+        return None
+    results = []
+    for row in rows:
+        cur.execute(query, row)
+        results.append(cur.fetchone())
+    return results
+
+
+def clear_seeded_data(cur):
+    """Remove everything created by seed_database."""
+    cur.execute("DELETE FROM patients WHERE patient_id LIKE %s", (PATIENT_PREFIX + "%",))
+    cur.execute("DELETE FROM users WHERE username LIKE %s", (DOCTOR_PREFIX + "%",))
+
+
+def seed_database(doctors=1, patients_per_doctor=100, sessions_per_patient=3,
+                  images_per_session=2, seed=42):
+    """
+    Seed the database with synthetic patients, sessions and images.
+
+    The admin doctor is always the first doctor, so the detection API (which acts
+    as the admin user) can be exercised against the seeded patients.
+
+    Args:
+        doctors (int): Number of doctors, including the admin doctor
+        patients_per_doctor (int): Patients created for each doctor
+        sessions_per_patient (int): Detection sessions per patient
+        images_per_session (int): Images per detection session
+        seed (int): Random seed, so the same scale always yields the same data
+
+    Returns:
+        dict: doctor user_ids and seeded patient business identifiers
+    """
+    rng = random.Random(seed)
+    image_paths = sorted(glob.glob(os.path.join("local_files", "images", "*")))
+    if not image_paths:
+        raise Exception("No images found in local_files/images/ directory")
+
+    conn = None
+    cur = None
+    try:
+        conn = connect()
+        cur = conn.cursor(cursor_factory=RealDictCursor)
+        clear_seeded_data(cur)
+
+        cur.execute(
+            "SELECT user_id FROM users WHERE username = %s",
+            (AUTH_CREDENTIALS["username"].replace("-", "_"),)
+        )
+        doctor_ids = [cur.fetchone()["user_id"]]
+        for i in range(1, doctors):
+            cur.execute(
+                "INSERT INTO users (username, password_hash) VALUES (%s, %s) RETURNING user_id",
+                (f"{DOCTOR_PREFIX}{i}", "benchmark")
+            )
+            doctor_ids.append(cur.fetchone()["user_id"])
+
+        patient_codes = {}
+        counter = 0
+        now = datetime.now()
+        for doctor_id in doctor_ids:
+            patient_rows = []
+            for _ in range(patients_per_doctor):
+                counter += 1
+                patient_rows.append((
+                    doctor_id,
+                    f"{PATIENT_PREFIX}{counter:08d}",
+                    f"Bench Patient {counter}",
+                    rng.choice(["Male", "Female", "Other"]),
+                    (now - timedelta(days=rng.randint(365, 365 * 90))).date(),
+                    f"555-{counter:07d}",
+                    "Benchmark Street",
+                    "None",
+                    "Skin condition",
+                ))
+            patients = insert_values(cur, """
+                INSERT INTO patients (
+                    user_id, patient_id, name, sex, date_of_birth,
+                    phone, address, past_medical_history, present_illness_history
+                ) VALUES %s RETURNING id, patient_id
+            """, patient_rows, fetch=True)
+            patient_codes[str(doctor_id)] = [p["patient_id"] for p in patients]
+
+            session_rows = []
+            for patient in patients:
+                for _ in range(sessions_per_patient):
+                    detection_result, probabilities = random_detection(rng).to_columns()
+                    session_rows.append((
+                        patient["id"],
+                        doctor_id,
+                        now - timedelta(days=rng.randint(1, 720), seconds=rng.randint(0, 86400)),
+                        detection_result,
+                        probabilities,
+                        "Benchmark diagnostic result",
+                        "Benchmark follow-up plan",
+                    ))
+            if not session_rows:
+                continue
+            sessions = insert_values(cur, """
+                INSERT INTO detection_sessions (
+                    patient_id, user_id, detection_date,
+                    detection_result, detection_probabilities, diagnostic_result, follow_up_plan
+                ) VALUES %s RETURNING id
+            """, session_rows, fetch=True)
+
+            image_rows = [
+                (s["id"], rng.choice(image_paths))
+                for s in sessions
+                for _ in range(images_per_session)
+            ]
+            if image_rows:
+                insert_values(cur, """
+                    INSERT INTO detection_images (detection_session_id, image_path) VALUES %s
+                """, image_rows)
+
+        cur.execute("ANALYZE")
+        conn.commit()
+        return {"doctor_ids": [str(d) for d in doctor_ids], "patients": patient_codes}
+
+    except Exception:
+        if conn:
+            conn.rollback()
+        raise
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            conn.close()
+
+
+def add_scale_arguments(parser):
+    """Register the data-scale options shared by all benchmark scripts."""
+    parser.add_argument("--doctors", type=int, default=1)
+    parser.add_argument("--patients-per-doctor", type=int, default=100)
+    parser.add_argument("--sessions-per-patient", type=int, default=3)
+    parser.add_argument("--images-per-session", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=42)
+
+
+def seed_from_args(args):
+    return seed_database(
+        doctors=args.doctors,
+        patients_per_doctor=args.patients_per_doctor,
+        sessions_per_patient=args.sessions_per_patient,
+        images_per_session=args.images_per_session,
+        seed=args.seed,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seed the database for benchmarks")
+    add_scale_arguments(parser)
+    parser.add_argument("--clear", action="store_true", help="Only remove seeded data")
+    args = parser.parse_args()
+
+    if args.clear:
+        conn = connect()
+        with conn, conn.cursor() as cur:
+            clear_seeded_data(cur)
+        conn.close()
+        print("Removed seeded benchmark data")
+    else:
+        seeded = seed_from_args(args)
+        total = sum(len(codes) for codes in seeded["patients"].values())
+        print(f"Seeded {len(seeded['doctor_ids'])} doctors and {total} patients")
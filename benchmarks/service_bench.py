@@ -0,0 +1,205 @@
+import argparse
+import itertools
+import json
+import os
+import statistics
+import tempfile
+import time
+from datetime import date, datetime
+
+from benchmarks.common import compare_results, percentile, save_results
+from benchmarks.seed import PATIENT_PREFIX, seed_database
+from config import get_user_id
+from src.services.detection import (
+    create_detection_session,
+    delete_detection_session,
+    get_detection_result,
+    get_detection_session_images,
+    get_detection_sessions_page,
+    get_patient_detection_trend,
+    update_detection_session,
+)
+from src.services.patient import (
+    create_patient,
+    delete_patient,
+    get_all_patients,
+    get_patient_basic_details,
+    get_patient_full_details,
+    update_patient_details,
+)
+from src.services.qr import get_qr_png
+from src.utils.qr_code import generate_qr, read_qr
+from src.utils.tracing import count_queries
+
+
+def measure(func, iterations, warmup=2):
+    """
+    Time repeated calls of func.
+
+    Args:
+        func: Zero-argument callable; may return a teardown callable that is not timed
+        iterations (int): Measured calls
+        warmup (int): Unmeasured calls made first
+
+    Returns:
+        dict: Per-call timing statistics and the number of SQL statements per call
+    """
+    for _ in range(warmup):
+        teardown = func()
+        if callable(teardown):
+            teardown()
+
+    timings = []
+    queries = []
+    for _ in range(iterations):
+        with count_queries() as counter:
+            started = time.perf_counter()
+            teardown = func()
+            timings.append((time.perf_counter() - started) * 1000)
+            queries.append(counter["count"])
+        if callable(teardown):
+            teardown()
+
+    return {
+        "iterations": iterations,
+        "mean_ms": statistics.fmean(timings),
+        "p50_ms": percentile(timings, 50),
+        "p95_ms": percentile(timings, 95),
+        "min_ms": min(timings),
+        "queries_per_call": statistics.fmean(queries),
+    }
+
+
+def new_patient_data(counter):
+    return {
+        "patient_id": f"{PATIENT_PREFIX}M{next(counter):07d}",
+        "name": "Micro Benchmark",
+        "sex": "Female",
+        "date_of_birth": date(1980, 1, 1),
+        "phone": "555-0000000",
+    }
+
+
+def service_cases(patient_code, images_per_session, counter):
+    """Build the benchmark callables for one seeded data size."""
+    patient = get_patient_full_details(patient_code, user_id=get_user_id())
+    session = patient["detection_sessions"][0] if patient["detection_sessions"] else None
+    image_paths = [img["image_path"] for img in session["detection_images"]] if session else []
+    session_data = {
+        "detection_result": '{"detection": "Eczema", "confidence": 0.9}',
+        "detection_date": datetime.now(),
+        "detection_images": (image_paths or ["local_files/images/image_1.jpg"]) * max(images_per_session, 1),
+    }
+
+    def create_patient_case():
+        created = create_patient(new_patient_data(counter), user_id=get_user_id())
+        return lambda: delete_patient(created["patient_id"], get_user_id())
+
+    def delete_patient_case():
+        # Creation is part of the call but reported separately by create_patient
+        created = create_patient(new_patient_data(counter), user_id=get_user_id())
+        delete_patient(created["patient_id"], get_user_id())
+
+    def create_session_case():
+        created = create_detection_session(patient["id"], get_user_id(), session_data)
+        return lambda: delete_detection_session(created["id"], get_user_id())
+
+    def delete_session_case():
+        created = create_detection_session(patient["id"], get_user_id(), session_data)
+        delete_detection_session(created["id"], get_user_id())
+
+    cases = {
+        "get_all_patients": lambda: get_all_patients(user_id=get_user_id()),
+        "get_patient_full_details": lambda: get_patient_full_details(patient_code, user_id=get_user_id()),
+        "get_patient_basic_details": lambda: get_patient_basic_details(patient_code, user_id=get_user_id()),
+        "get_detection_sessions_page": lambda: get_detection_sessions_page(patient["id"], get_user_id(), limit=10),
+        "get_patient_detection_trend": lambda: get_patient_detection_trend(patient["id"], get_user_id()),
+        "update_patient_details": lambda: update_patient_details(patient["id"], get_user_id(), {
+            "name": patient["name"],
+            "sex": patient["sex"],
+            "date_of_birth": patient["dob"],
+        }),
+        "create_patient": create_patient_case,
+        "create_patient+delete_patient": delete_patient_case,
+        "create_detection_session": create_session_case,
+        "create_detection_session+delete_detection_session": delete_session_case,
+    }
+    if session:
+        cases["get_detection_session_images"] = lambda: get_detection_session_images(session["id"], get_user_id())
+        cases["get_detection_result"] = lambda: get_detection_result(session["id"], get_user_id())
+        cases["update_detection_session"] = lambda: update_detection_session(session["id"], get_user_id(), {
+            "diagnostic_result": session["diagnostic_result"],
+            "follow_up_plan": session["follow_up_plan"],
+        })
+    return cases
+
+
+def qr_cases(workdir):
+    qr_path = os.path.join(workdir, "bench_qr.png")
+    generate_qr("P-20250101-00001", qr_path)
+    return {
+        "generate_qr": lambda: generate_qr("P-20250101-00001", os.path.join(workdir, "generated.png")),
+        "read_qr": lambda: read_qr(qr_path),
+        "get_qr_png[cached]": lambda: get_qr_png("P-20250101-00001"),
+    }
+
+
+def parse_sizes(value):
+    return [int(v) for v in value.split(",")]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for service functions and QR utilities")
+    parser.add_argument("--patients", type=parse_sizes, default=[10, 100, 1000], help="Patients per doctor")
+    parser.add_argument("--sessions", type=parse_sizes, default=[1, 10], help="Sessions per patient")
+    parser.add_argument("--images", type=parse_sizes, default=[1, 5], help="Images per session")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--filter", help="Only run cases whose name contains this text")
+    parser.add_argument("--output", help="Where to write the JSON results")
+    parser.add_argument("--compare", help="Baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative slowdown")
+    args = parser.parse_args()
+
+    results = {}
+    counter = itertools.count()
+    print(f"{'case':<80}{'mean ms':>10}{'p95 ms':>10}{'queries':>9}")
+
+    def run(name, func):
+        if args.filter and args.filter not in name:
+            return
+        results[name] = measure(func, args.iterations)
+        r = results[name]
+        print(f"{name:<80}{r['mean_ms']:>10.3f}{r['p95_ms']:>10.3f}{r['queries_per_call']:>9.1f}")
+
+    for patients, sessions, images in itertools.product(args.patients, args.sessions, args.images):
+        seeded = seed_database(
+            patients_per_doctor=patients,
+            sessions_per_patient=sessions,
+            images_per_session=images,
+        )
+        patient_code = seeded["patients"][str(get_user_id())][0]
+        for name, func in service_cases(patient_code, images, counter).items():
+            run(f"{name}[patients={patients},sessions={sessions},images={images}]", func)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for name, func in qr_cases(workdir).items():
+            run(name, func)
+
+    path = save_results("service_bench", vars(args), results, args.output)
+    print(f"\nResults written to {path}")
+
+    if args.compare:
+        regressions = compare_results(args.compare, results, args.tolerance, metrics=("mean_ms", "p95_ms"))
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        for name, r in results.items():
+            if name in baseline and r["queries_per_call"] > baseline[name]["queries_per_call"]:
+                regressions.append(
+                    f"{name} queries_per_call: {baseline[name]['queries_per_call']} -> {r['queries_per_call']}"
+                )
+        if regressions:
+            print("\nPerformance regressions:")
+            for regression in regressions:
+                print(f"  {regression}")
+            raise SystemExit(1)
+        print("\nNo regressions against baseline")
@@ -0,0 +1,59 @@
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.common import percentile, save_results
+from src.utils.image_features import EMBEDDING_DIM
+from src.utils.vector_index import VectorIndex
+
+
+def synthetic_vectors(n, dim, clusters=2000, seed=0):
+    """Unit vectors scattered around cluster centres, mimicking groups of similar lesions."""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = centres[rng.integers(0, clusters, n)] + 0.35 * rng.standard_normal((n, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure similarity search latency and recall")
+    parser.add_argument("--vectors", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, default=16)
+    parser.add_argument("--output", help="Results JSON path (default: benchmarks/results/similarity-<rev>.json)")
+    args = parser.parse_args()
+
+    vectors = synthetic_vectors(args.vectors, EMBEDDING_DIM)
+    index = VectorIndex(EMBEDDING_DIM, nprobe=args.nprobe)
+
+    started = time.perf_counter()
+    index.add(list(range(args.vectors)), vectors)
+    build_s = time.perf_counter() - started
+
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(args.vectors, args.queries, replace=False)]
+
+    latencies = []
+    recalls = []
+    for query in queries:
+        started = time.perf_counter()
+        found = index.search(query, k=args.k)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+        exact = set(np.argpartition(-(vectors @ query), args.k)[:args.k].tolist())
+        recalls.append(len(exact & {item_id for item_id, _ in found}) / args.k)
+
+    results = {
+        "build_s": build_s,
+        "partitions": 0 if index.centroids is None else len(index.centroids),
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        f"recall_at_{args.k}": sum(recalls) / len(recalls),
+    }
+    for key, value in results.items():
+        print(f"{key:<16}{value:>12.4f}" if isinstance(value, float) else f"{key:<16}{value:>12}")
+    print(f"Saved {save_results('similarity', vars(args), results, args.output)}")
@@ -1,6 +1,5 @@
 import os
-import psycopg2
-from psycopg2.extras import RealDictCursor
+import threading
 from dotenv import load_dotenv
 from loguru import logger
 
@@ -16,6 +15,11 @@ POSTGRES_DB = os.getenv("POSTGRES_DB", "skin_disease_detection")
 
 DATABASE_URL = f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
 
+# Storage backend: "postgres", or "sqlite" for a single-clinic install without a database server
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "postgres")
+SQLITE_PATH = os.getenv("SQLITE_PATH", "local_files/skin_disease_detection.db")  # Created on first use
+SQLITE_BUSY_TIMEOUT_SECONDS = float(os.getenv("SQLITE_BUSY_TIMEOUT_SECONDS", "30"))  # Wait for the write lock this long
+
 # Authentication settings
 AUTH_CREDENTIALS = {
     "username": "admin-user",
@@ -25,12 +29,94 @@ AUTH_CREDENTIALS = {
 # Session configuration
 SESSION_EXPIRE_DAYS = 30
 
+# Service configuration (used by launcher.py)
+API_HOST = os.getenv("API_HOST", "0.0.0.0")
+API_PORT = int(os.getenv("API_PORT", "8001"))
+API_WORKERS = int(os.getenv("API_WORKERS", "0"))  # 0 = derive from API_WORKERS_PER_CORE
+API_WORKERS_PER_CORE = float(os.getenv("API_WORKERS_PER_CORE", "1"))
+STREAMLIT_PORT = int(os.getenv("STREAMLIT_PORT", "8501"))
+SHUTDOWN_GRACE_SECONDS = int(os.getenv("SHUTDOWN_GRACE_SECONDS", "20"))
+# Base URL the browser uses to reach the API (images are loaded from it directly)
+API_PUBLIC_URL = os.getenv("API_PUBLIC_URL", f"http://localhost:{API_PORT}")
+
+# Admission control for the detection API (limits are per API worker process)
+ADMISSION_PATHS = [p for p in os.getenv("ADMISSION_PATHS", "/api/detection/,/api/scan").split(",") if p]  # Path prefixes
+ADMISSION_RATE_PER_SECOND = float(os.getenv("ADMISSION_RATE_PER_SECOND", "2"))  # Sustained requests per client; 0 disables the limit
+ADMISSION_BURST = int(os.getenv("ADMISSION_BURST", "10"))  # Requests a client may send at once
+ADMISSION_CLIENT_HEADER = os.getenv("ADMISSION_CLIENT_HEADER", "")  # e.g. X-Client-Id; empty = client address
+ADMISSION_MAX_CLIENTS = int(os.getenv("ADMISSION_MAX_CLIENTS", "10000"))  # Rate limit buckets kept
+ADMISSION_MAX_CONCURRENT = int(os.getenv("ADMISSION_MAX_CONCURRENT", "8"))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "32"))  # Requests waiting for a slot before 503s
+ADMISSION_MAX_WAIT_SECONDS = float(os.getenv("ADMISSION_MAX_WAIT_SECONDS", "10"))
+
+# Idempotency-Key handling of detection uploads
+IDEMPOTENCY_TTL_HOURS = int(os.getenv("IDEMPOTENCY_TTL_HOURS", "24"))  # How long a key replays its first result
+IDEMPOTENCY_LOCK_SECONDS = int(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "120"))  # Unfinished claims older than this are taken over
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "10"))  # A retry waits this long for the first request
+
+# Detection results
+# Class order of stored probability vectors; only ever append, or stored vectors are misread
+DETECTION_CLASSES = [c for c in os.getenv(
+    "DETECTION_CLASSES", "Atopic Dermatitis,Psoriasis,Eczema,Melanoma,Basal Cell Carcinoma"
+).split(",") if c]
+
+# Image serving configuration
+IMAGE_UPLOAD_DIR = os.getenv("IMAGE_UPLOAD_DIR", "local_files/images")  # Where uploaded detection images are written
+IMAGE_DERIVATIVES_DIR = os.getenv("IMAGE_DERIVATIVES_DIR", "local_files/derivatives")
+IMAGE_DERIVATIVE_WIDTHS = (160, 320, 640, 1280)
+
+# Cold storage tiering configuration
+IMAGE_COLD_DIR = os.getenv("IMAGE_COLD_DIR", "local_files/cold_images")  # May be a slower mounted volume
+IMAGE_TIER_AFTER_DAYS = int(os.getenv("IMAGE_TIER_AFTER_DAYS", "180"))
+IMAGE_COLD_QUALITY = int(os.getenv("IMAGE_COLD_QUALITY", "90"))  # WebP quality of tiered images
+IMAGE_REHYDRATE_DIR = os.getenv("IMAGE_REHYDRATE_DIR", "local_files/rehydrated")
+IMAGE_REHYDRATE_CACHE_MB = int(os.getenv("IMAGE_REHYDRATE_CACHE_MB", "1024"))
+
+# QR code configuration
+QR_CODE_DIR = os.getenv("QR_CODE_DIR", "local_files/qr_code")
+QR_CACHE_SIZE = int(os.getenv("QR_CACHE_SIZE", "512"))  # Rendered PNGs kept in memory
+
+# Session report configuration
+REPORT_DIR = os.getenv("REPORT_DIR", "local_files/reports")
+REPORT_WORKERS = int(os.getenv("REPORT_WORKERS", "2"))  # Background PDF renderers per process
+
+# Similarity search configuration
+SIMILARITY_REFRESH_SECONDS = int(os.getenv("SIMILARITY_REFRESH_SECONDS", "30"))  # How often new features are picked up
+
+# Dashboard rollup configuration
+ROLLUP_TIMEZONE = os.getenv("ROLLUP_TIMEZONE", "UTC")  # Timezone that defines a dashboard "day"
+ROLLUP_INTERVAL_SECONDS = int(os.getenv("ROLLUP_INTERVAL_SECONDS", "60"))
+ROLLUP_BATCH_SIZE = int(os.getenv("ROLLUP_BATCH_SIZE", "10000"))  # Deltas folded per transaction
+
+# Storage reconciler configuration
+STORAGE_QUARANTINE_DIR = os.getenv("STORAGE_QUARANTINE_DIR", "local_files/quarantine")
+STORAGE_GC_GRACE_HOURS = int(os.getenv("STORAGE_GC_GRACE_HOURS", "24"))  # Newer files are never treated as orphans
+
+# Audit log configuration
+AUDIT_ENABLED = os.getenv("AUDIT_ENABLED", "true").lower() == "true"
+AUDIT_QUEUE_SIZE = int(os.getenv("AUDIT_QUEUE_SIZE", "10000"))  # Entries buffered before writers are slowed down
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "500"))  # Entries written per INSERT
+AUDIT_FLUSH_INTERVAL_SECONDS = float(os.getenv("AUDIT_FLUSH_INTERVAL_SECONDS", "1.0"))
+AUDIT_ENQUEUE_TIMEOUT_SECONDS = float(os.getenv("AUDIT_ENQUEUE_TIMEOUT_SECONDS", "0.5"))  # Then the entry is written inline
+AUDIT_SHUTDOWN_TIMEOUT_SECONDS = float(os.getenv("AUDIT_SHUTDOWN_TIMEOUT_SECONDS", "10"))
+
+# Tracing configuration
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "false").lower() == "true"
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "file")  # "file" or "otlp"
+TRACING_FILE = os.getenv("TRACING_FILE", "local_files/traces/spans.jsonl")
+TRACING_OTLP_ENDPOINT = os.getenv("TRACING_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+TRACING_SERVICE_NAME = os.getenv("TRACING_SERVICE_NAME", "skin-disease-detection")
+
 def get_admin_user_id():
     """Get the admin user ID from the database."""
+    # Imported here so that importing config never loads the driver or touches the database
+    from psycopg2.extras import RealDictCursor
+    from src.services.storage import connect
+
     conn = None
     cur = None
     try:
-        conn = psycopg2.connect(DATABASE_URL)
+        conn = connect()
         cur = conn.cursor(cursor_factory=RealDictCursor)
         
         # Query to get admin user ID
@@ -57,5 +143,22 @@ def get_admin_user_id():
         if conn:
             conn.close()
 
-# Get USER_ID from database
-USER_ID = get_admin_user_id()
\ No newline at end of file
+_user_id = None
+_user_id_lock = threading.Lock()
+
+def get_user_id():
+    """
+    Get the doctor ID used by the app, resolving it on first use.
+
+    A successful lookup is cached for the life of the process; a failed one is
+    not, so a briefly unreachable database is retried on the next call.
+
+    Returns:
+        UUID of the admin doctor, or None if it cannot be resolved yet
+    """
+    global _user_id
+    if _user_id is None:
+        with _user_id_lock:
+            if _user_id is None:
+                _user_id = get_admin_user_id()
+    return _user_id
@@ -0,0 +1,72 @@
+import argparse
+import os
+
+import psycopg2
+
+from config import DATABASE_URL, get_user_id
+from src.services.bulk_import import ManifestError, load_manifest, run_import
+from src.services.storage import require_postgres
+
+
+def resolve_doctor(username):
+    """user_id of the doctor the imported patients are assigned to (default: the app's doctor)."""
+    if not username:
+        return get_user_id()
+    conn = psycopg2.connect(DATABASE_URL)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT user_id FROM users WHERE username = %s", (username,))
+            row = cur.fetchone()
+            return row[0] if row else None
+    finally:
+        conn.close()
+
+
+def print_progress(batch_no, batch, totals):
+    seconds = batch["seconds"] or 1e-9
+    print(f"batch {batch_no:>5}: {batch['patients']:>5} patients, {batch['images']:>6} images "
+          f"in {batch['seconds']:.1f}s ({batch['patients'] / seconds:.0f} patients/s, "
+          f"{batch['images'] / seconds:.0f} images/s, {batch['bytes'] / 1e6 / seconds:.1f} MB/s) | "
+          f"total {totals['patients']} patients, {totals['images']} images")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk import patients and their image archives from a manifest")
+    parser.add_argument("manifest", help="CSV (one row per session) or JSON (list of patients) manifest")
+    parser.add_argument("--images-root", default=None, help="Directory image entries are relative to "
+                                                            "(default: the manifest's directory)")
+    parser.add_argument("--doctor", default=None, help="Username of the doctor to assign patients to")
+    parser.add_argument("--batch-size", type=int, default=500, help="Patients per checkpointed transaction")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--import-id", default=None, help="Resume key (default: SHA-256 of the manifest)")
+    args = parser.parse_args()
+    require_postgres("Bulk import")
+
+    images_root = args.images_root or os.path.dirname(os.path.abspath(args.manifest))
+    try:
+        patients, digest = load_manifest(args.manifest, images_root)
+    except ManifestError as e:
+        raise SystemExit(f"Invalid manifest: {e}")
+
+    user_id = resolve_doctor(args.doctor)
+    if not user_id:
+        raise SystemExit(f"Doctor {args.doctor or 'admin'} not found")
+
+    import_id = args.import_id or digest
+    sessions = sum(len(p["sessions"]) for p in patients)
+    images = sum(len(s["images"]) for p in patients for s in p["sessions"])
+    print(f"Importing {len(patients)} patients, {sessions} sessions, {images} images (import id {import_id[:12]})")
+
+    totals = run_import(
+        patients,
+        import_id,
+        user_id,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        progress=print_progress,
+    )
+    seconds = totals["seconds"] or 1e-9
+    print(f"Imported {totals['patients']} patients, {totals['sessions']} sessions, {totals['images']} images "
+          f"({totals['bytes'] / 1e6:.1f} MB) in {totals['seconds']:.1f}s "
+          f"({totals['patients'] / seconds:.0f} patients/s, {totals['images'] / seconds:.0f} images/s); "
+          f"{totals['skipped_batches']} batches already done, {totals['missing_images']} images skipped")
@@ -0,0 +1,45 @@
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from psycopg2.extras import RealDictCursor
+
+from src.services.similarity import store_image_features
+from src.services.storage import connect
+
+
+def iter_unindexed_batches(batch_size):
+    """Stream detection images that have no stored features yet, in batches."""
+    conn = connect()
+    try:
+        with conn.cursor(name="unindexed_images", cursor_factory=RealDictCursor) as cur:
+            cur.itersize = batch_size * 4
+            cur.execute("""
+                SELECT i.id, i.image_path
+                FROM detection_images i
+                LEFT JOIN detection_image_features f ON f.image_id = i.id
+                WHERE f.image_id IS NULL
+            """)
+            batch = []
+            for row in cur:
+                batch.append(dict(row))
+                if len(batch) == batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compute similarity features for images that lack them")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=200, help="Images per worker task")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        indexed = sum(pool.map(store_image_features, iter_unindexed_batches(args.batch_size)))
+    elapsed = time.perf_counter() - started
+    print(f"Indexed {indexed} images in {elapsed:.1f}s ({indexed / elapsed if elapsed else 0:.0f}/s)")
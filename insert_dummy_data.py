@@ -1,15 +1,15 @@
-import psycopg2
 import shutil
 from datetime import datetime, timedelta
 import random
 from psycopg2.extras import RealDictCursor
-from config import DATABASE_URL
+from config import QR_CODE_DIR
 import json
 import os
 import glob
 
-from src.utils.common import generate_patient_id
-from src.utils.qr_code import generate_qr
+from src.services.patient_id import allocate_patient_ids
+from src.services.qr import generate_qr_codes
+from src.services.storage import connect
 
 def get_image_paths():
     """Get list of all image files from images folder"""
@@ -37,8 +37,10 @@ def insert_dummy_data():
     try:
         # Get available image paths
         image_paths = get_image_paths()
+        # Allocated before the transaction below, which holds SQLite's write lock
+        new_patient_ids = iter(allocate_patient_ids(10))
         
-        conn = psycopg2.connect(DATABASE_URL)
+        conn = connect()
         cur = conn.cursor(cursor_factory=RealDictCursor)
 
         # First, clear existing data
@@ -57,7 +59,7 @@ def insert_dummy_data():
         patients = [
             {
                 "user_id": doctor_id,
-                "patient_id": generate_patient_id(),
+                "patient_id": next(new_patient_ids),
                 "name": "John Smith",
                 "sex": "Male",
                 "date_of_birth": "1985-03-15",
@@ -68,7 +70,7 @@ def insert_dummy_data():
             },
             {
                 "user_id": doctor_id,
-                "patient_id": generate_patient_id(),
+                "patient_id": next(new_patient_ids),
                 "name": "Mary Johnson",
                 "sex": "Female",
                 "date_of_birth": "1992-07-22",
@@ -79,7 +81,7 @@ def insert_dummy_data():
             },
             {
                 "user_id": doctor_id,
-                "patient_id": generate_patient_id(),
+                "patient_id": next(new_patient_ids),
                 "name": "David Wilson",
                 "sex": "Male",
                 "date_of_birth": "1978-11-30",
@@ -90,7 +92,7 @@ def insert_dummy_data():
             },
             {
                 "user_id": doctor_id,
-                "patient_id": generate_patient_id(),
+                "patient_id": next(new_patient_ids),
                 "name": "Sarah Brown",
                 "sex": "Female",
                 "date_of_birth": "1990-05-18",
@@ -101,7 +103,7 @@ def insert_dummy_data():
             },
             {
                 "user_id": doctor_id,
-                "patient_id": generate_patient_id(),
+                "patient_id": next(new_patient_ids),
                 "name": "Michael Davis",
                 "sex": "Male",
                 "date_of_birth": "1982-09-25",
@@ -112,7 +114,7 @@ def insert_dummy_data():
             },
             {
                 "user_id": doctor_id,
-                "patient_id": generate_patient_id(),
+                "patient_id": next(new_patient_ids),
                 "name": "Emma Wilson",
                 "sex": "Female",
                 "date_of_birth": "1995-12-03",
@@ -123,7 +125,7 @@ def insert_dummy_data():
             },
             {
                 "user_id": doctor_id,
-                "patient_id": generate_patient_id(),
+                "patient_id": next(new_patient_ids),
                 "name": "James Taylor",
                 "sex": "Male",
                 "date_of_birth": "1975-08-14",
@@ -134,7 +136,7 @@ def insert_dummy_data():
             },
             {
                 "user_id": doctor_id,
-                "patient_id": generate_patient_id(),
+                "patient_id": next(new_patient_ids),
                 "name": "Olivia Martin",
                 "sex": "Female",
                 "date_of_birth": "1988-04-29",
@@ -145,7 +147,7 @@ def insert_dummy_data():
             },
             {
                 "user_id": doctor_id,
-                "patient_id": generate_patient_id(),
+                "patient_id": next(new_patient_ids),
                 "name": "William Anderson",
                 "sex": "Male",
                 "date_of_birth": "1980-01-10",
@@ -156,7 +158,7 @@ def insert_dummy_data():
             },
             {
                 "user_id": doctor_id,
-                "patient_id": generate_patient_id(),
+                "patient_id": next(new_patient_ids),
                 "name": "Sophia Clarke",
                 "sex": "Female",
                 "date_of_birth": "1993-06-07",
@@ -168,18 +170,15 @@ def insert_dummy_data():
         ]
 
         # Remove existing QR code directory and its contents
-        qr_code_dir = "local_files/qr_code"
+        qr_code_dir = QR_CODE_DIR
         if os.path.exists(qr_code_dir):
             shutil.rmtree(qr_code_dir)
 
         # Create fresh QR code directory
         os.makedirs(qr_code_dir, exist_ok=True)
 
-        # Generate QR codes for each patient
-        for patient in patients:
-            patient_id = patient["patient_id"]
-            qr_code_path = os.path.join(qr_code_dir, f"{patient_id}.png")
-            generate_qr(patient_id, qr_code_path)
+        # Generate QR codes for all patients in parallel
+        generate_qr_codes([patient["patient_id"] for patient in patients])
 
         # Insert patients
         for patient in patients:
@@ -203,7 +202,7 @@ def insert_dummy_data():
                         patient_id, user_id, detection_date,
                         detection_result, diagnostic_result, follow_up_plan
                     ) VALUES (
-                        %s, %s, %s, %s::jsonb, %s, %s
+                        %s, %s, %s, %s, %s, %s
                     ) RETURNING id;
                 """
                 
@@ -0,0 +1,146 @@
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+
+from loguru import logger
+
+from config import (
+    API_HOST,
+    API_PORT,
+    API_WORKERS,
+    API_WORKERS_PER_CORE,
+    SHUTDOWN_GRACE_SECONDS,
+    STREAMLIT_PORT,
+)
+
+# A process that stays up this long is considered healthy again and its backoff resets
+STABLE_AFTER_SECONDS = 60
+MAX_BACKOFF_SECONDS = 30
+
+
+def api_worker_count(workers=API_WORKERS, workers_per_core=API_WORKERS_PER_CORE):
+    """
+    Number of uvicorn workers for the detection API.
+
+    Args:
+        workers (int): Explicit worker count; 0 derives it from the CPU count
+        workers_per_core (float): Workers per CPU core when no explicit count is set
+
+    Returns:
+        int: At least one worker
+    """
+    if workers > 0:
+        return workers
+    return max(1, int((os.cpu_count() or 1) * workers_per_core))
+
+
+class ManagedProcess:
+    """A child process that is restarted with exponential backoff when it crashes."""
+
+    def __init__(self, name, command):
+        self.name = name
+        self.command = command
+        self.process = None
+        self.started_at = None
+        self.failures = 0
+        self.restart_at = None
+
+    def start(self):
+        logger.info(f"Starting {self.name}: {' '.join(self.command)}")
+        # Own process group, so a terminal Ctrl+C reaches children only through us
+        self.process = subprocess.Popen(self.command, start_new_session=True)
+        self.started_at = time.monotonic()
+        self.restart_at = None
+
+    def supervise(self):
+        """Restart the process if it exited; call periodically from the main loop."""
+        now = time.monotonic()
+        if self.restart_at is not None:
+            if now >= self.restart_at:
+                self.start()
+            return
+
+        code = self.process.poll()
+        if code is None:
+            if self.failures and now - self.started_at > STABLE_AFTER_SECONDS:
+                self.failures = 0
+            return
+
+        self.failures += 1
+        delay = min(MAX_BACKOFF_SECONDS, 2 ** (self.failures - 1))
+        logger.error(f"{self.name} exited with code {code}; restarting in {delay}s")
+        self.restart_at = now + delay
+
+    def stop(self, grace_seconds):
+        """Ask the process to shut down gracefully, killing it after grace_seconds."""
+        if not self.process or self.process.poll() is not None:
+            return
+        logger.info(f"Stopping {self.name}")
+        self.process.send_signal(signal.SIGTERM)
+        try:
+            self.process.wait(timeout=grace_seconds)
+        except subprocess.TimeoutExpired:
+            logger.warning(f"{self.name} did not stop within {grace_seconds}s; killing it")
+            self.process.kill()
+            self.process.wait()
+
+
+def build_processes(workers, api_only=False, ui_only=False):
+    processes = []
+    if not ui_only:
+        processes.append(ManagedProcess("detection API", [
+            sys.executable, "-m", "uvicorn", "src.api.detection:detection_api",
+            "--host", API_HOST,
+            "--port", str(API_PORT),
+            "--workers", str(workers),
+            "--timeout-graceful-shutdown", str(SHUTDOWN_GRACE_SECONDS),
+        ]))
+    if not api_only:
+        processes.append(ManagedProcess("Streamlit UI", [
+            sys.executable, "-m", "streamlit", "run", "main.py",
+            "--server.port", str(STREAMLIT_PORT),
+            "--server.headless", "true",
+        ]))
+        # Keeps the dashboard rollups current; a single instance is enough
+        processes.append(ManagedProcess("rollup job", [sys.executable, "refresh_rollups.py"]))
+    return processes
+
+
+def run(processes, grace_seconds=SHUTDOWN_GRACE_SECONDS):
+    """Start all processes once and supervise them until SIGINT/SIGTERM."""
+    stopping = False
+
+    def request_stop(signum, frame):
+        nonlocal stopping
+        logger.info(f"Received signal {signum}, shutting down")
+        stopping = True
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+
+    for process in processes:
+        process.start()
+
+    while not stopping:
+        for process in processes:
+            process.supervise()
+        time.sleep(0.5)
+
+    for process in processes:
+        process.stop(grace_seconds)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Start the Streamlit UI and the detection API")
+    parser.add_argument("--workers", type=int, default=None, help="API workers (default: per-core setting)")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--api-only", action="store_true")
+    group.add_argument("--ui-only", action="store_true")
+    args = parser.parse_args()
+
+    workers = args.workers if args.workers else api_worker_count()
+    logger.info(f"Detection API on port {API_PORT} with {workers} workers, UI on port {STREAMLIT_PORT}")
+    run(build_processes(workers, args.api_only, args.ui_only))
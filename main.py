@@ -1,27 +1,10 @@
 # main.py
-import uvicorn
 import streamlit as st
-import socket
-from contextlib import closing
 from loguru import logger
-from multiprocessing import Process, freeze_support
 
-from src.api.detection import detection_api
 from src.components.login import render_login
-from src.components.patient_list import render_patient_list
-from src.components.patient_detail import render_patient_detail
-from src.components.patient_form import render_patient_form
 from src.utils.session import init_session_state, is_authenticated, reset_session_state_at_home_page
-
-API_PORT = 8001 
-
-def run_api():
-    """Run FastAPI server"""
-    uvicorn.run(detection_api, host="0.0.0.0", port=API_PORT)
-
-def is_port_in_use(port):
-    with closing(socket.socket(socket.AF_INET, socket.SOCK_STREAM)) as sock:
-        return sock.connect_ex(('0.0.0.0', port)) == 0
+from src.utils.tracing import span
 
 def main():
     # Set page config
@@ -31,17 +14,17 @@ def main():
         layout="wide"
     )
 
-    # Only start API if port is available
-    if not is_port_in_use(API_PORT):
-        api_process = Process(target=run_api)
-        api_process.start()
-        logger.info(f"Detection API running on port {API_PORT}")
-    else:
-        logger.warning(f"Port {API_PORT} is already in use. API server not started.")
-
     # Initialize session state
     init_session_state()
-    
+
+    # One span per script run, so every rerun gets its own latency breakdown
+    with span("page.render", page=st.session_state.current_page):
+        render_page()
+
+def render_page():
+    """Render the login page or the current page of the authenticated app."""
+    # Page components (and their pandas/OpenCV/QR dependencies) are imported on
+    # first use, so the login page does not pay for them on a cold start.
     # Check authentication
     if not is_authenticated():
         logger.debug(f"Session state at login page:\n{st.session_state}")
@@ -56,6 +39,11 @@ def main():
                 st.session_state.selected_patient_id = None
                 st.rerun()
                 
+            if st.button("Dashboard"):
+                st.session_state.current_page = 'dashboard'
+                st.session_state.selected_patient_id = None
+                st.rerun()
+                
             if st.button("Logout"):
                 st.session_state.authenticated = False
                 st.rerun()
@@ -65,11 +53,13 @@ def main():
             reset_session_state_at_home_page()
             logger.debug(f"Session state at home page:\n{st.session_state}")
             st.title("Skin Disease Detection")
+            from src.components.patient_list import render_patient_list
             render_patient_list()
             
         elif st.session_state.current_page == 'new_patient':
             logger.debug(f"Session state at new patient page:\n{st.session_state}")
             st.title("New Patient")
+            from src.components.patient_form import render_patient_form
             render_patient_form()
             # st.write("New patient form coming soon...")
             if st.button("Back to Patient List"):
@@ -80,12 +70,17 @@ def main():
             logger.debug(f"Session state at patient detail page:\n{st.session_state}")
             st.title("Patient Profile")
             st.write(f"Viewing patient: {st.session_state.selected_patient_name}")
+            from src.components.patient_detail import render_patient_detail
             render_patient_detail()
             if st.button("Back to Patient List"):
                 st.session_state.current_page = 'home'
                 st.session_state.selected_patient_id = None
                 st.rerun()
+                
+        elif st.session_state.current_page == 'dashboard':
+            st.title("Clinic Dashboard")
+            from src.components.dashboard import render_dashboard
+            render_dashboard()
 
 if __name__ == "__main__":
-    freeze_support()
     main()
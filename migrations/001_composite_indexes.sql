@@ -0,0 +1,28 @@
+-- Composite/covering indexes matching the query shapes in src/services.
+-- Apply to an existing database with:
+--   psql -U admin_user -d skin_disease_detection -f migrations/001_composite_indexes.sql
+
+-- get_all_patients: WHERE user_id = ? ORDER BY created_at DESC (index-only scan)
+CREATE INDEX IF NOT EXISTS idx_patients_user_created
+    ON patients(user_id, created_at DESC)
+    INCLUDE (id, patient_id, name, sex, age, updated_at);
+
+-- get_patient_full_details sessions: WHERE patient_id = ? AND user_id = ? ORDER BY detection_date DESC
+CREATE INDEX IF NOT EXISTS idx_detection_sessions_patient_user_date
+    ON detection_sessions(patient_id, user_id, detection_date DESC);
+
+-- Session images: WHERE detection_session_id = ? [ORDER BY created_at DESC] (index-only scan)
+CREATE INDEX IF NOT EXISTS idx_detection_images_session_created
+    ON detection_images(detection_session_id, created_at DESC)
+    INCLUDE (id, image_path);
+
+-- Superseded: prefixes of the composites above, or a duplicate of the
+-- UNIQUE(patient_id) constraint index which already serves patient_id lookups
+DROP INDEX IF EXISTS idx_patients_user;
+DROP INDEX IF EXISTS idx_patients_patient_id;
+DROP INDEX IF EXISTS idx_detection_sessions_patient;
+DROP INDEX IF EXISTS idx_detection_images_session;
+
+ANALYZE patients;
+ANALYZE detection_sessions;
+ANALYZE detection_images;
@@ -0,0 +1,3 @@
+-- Sequence backing the patient_id allocator (src/services/patient_id.py).
+-- Each nextval reserves a block of INCREMENT BY numbers for one process.
+CREATE SEQUENCE IF NOT EXISTS patient_id_seq INCREMENT BY 100 MINVALUE 1 START WITH 1;
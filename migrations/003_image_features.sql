@@ -0,0 +1,13 @@
+-- Perceptual hash and appearance embedding per detection image, written at ingest
+CREATE TABLE IF NOT EXISTS detection_image_features (
+    image_id UUID PRIMARY KEY,
+    phash BIGINT NOT NULL,                    -- 64-bit DCT perceptual hash
+    embedding BYTEA NOT NULL,                 -- float16 vector, see src/utils/image_features.py
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT fk_detection_image
+        FOREIGN KEY(image_id)
+        REFERENCES detection_images(id)
+        ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_detection_image_features_created ON detection_image_features(created_at);
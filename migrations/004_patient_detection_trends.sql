@@ -0,0 +1,73 @@
+-- Per-patient time series of detection results, maintained by a trigger on detection_sessions
+CREATE TABLE IF NOT EXISTS patient_detection_trends (
+    patient_id UUID PRIMARY KEY,
+    user_id UUID NOT NULL,
+    points JSONB NOT NULL DEFAULT '[]',       -- [{session_id, date, detection, confidence}] ordered by date
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT fk_patient
+        FOREIGN KEY(patient_id)
+        REFERENCES patients(id)
+        ON DELETE CASCADE
+);
+
+CREATE OR REPLACE FUNCTION detection_trend_point(s detection_sessions)
+RETURNS JSONB AS $$
+    SELECT jsonb_build_object(
+        'session_id', s.id,
+        'date', s.detection_date,
+        'detection', s.detection_result->>'detection',
+        'confidence', CASE
+            WHEN jsonb_typeof(s.detection_result->'confidence') = 'number'
+            THEN (s.detection_result->>'confidence')::real
+        END
+    )
+$$ LANGUAGE sql STABLE;
+
+-- Only the changed session's point is parsed; the other points are kept as stored
+CREATE OR REPLACE FUNCTION update_patient_detection_trend()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE patient_detection_trends
+        SET points = COALESCE((
+                SELECT jsonb_agg(p ORDER BY (p->>'date')::timestamptz)
+                FROM jsonb_array_elements(points) p
+                WHERE p->>'session_id' <> OLD.id::text
+            ), '[]'),
+            updated_at = CURRENT_TIMESTAMP
+        WHERE patient_id = OLD.patient_id;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.detection_result IS NOT NULL THEN
+        INSERT INTO patient_detection_trends (patient_id, user_id, points)
+        VALUES (NEW.patient_id, NEW.user_id, jsonb_build_array(detection_trend_point(NEW)))
+        ON CONFLICT (patient_id) DO UPDATE
+        SET points = (
+                SELECT jsonb_agg(p ORDER BY (p->>'date')::timestamptz)
+                FROM jsonb_array_elements(patient_detection_trends.points || EXCLUDED.points) p
+            ),
+            user_id = EXCLUDED.user_id,
+            updated_at = CURRENT_TIMESTAMP;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS update_patient_detection_trend ON detection_sessions;
+CREATE TRIGGER update_patient_detection_trend
+    AFTER INSERT OR DELETE OR UPDATE OF detection_result, detection_date, patient_id ON detection_sessions
+    FOR EACH ROW
+    EXECUTE FUNCTION update_patient_detection_trend();
+
+-- Backfill from existing sessions
+INSERT INTO patient_detection_trends (patient_id, user_id, points)
+SELECT
+    s.patient_id,
+    (array_agg(s.user_id ORDER BY s.detection_date DESC))[1],
+    jsonb_agg(detection_trend_point(s) ORDER BY s.detection_date)
+FROM detection_sessions s
+WHERE s.detection_result IS NOT NULL
+GROUP BY s.patient_id
+ON CONFLICT (patient_id) DO UPDATE
+SET points = EXCLUDED.points, user_id = EXCLUDED.user_id, updated_at = CURRENT_TIMESTAMP;
@@ -0,0 +1,71 @@
+-- Daily detection counts per doctor and label for the dashboard, folded in from a delta queue
+CREATE TABLE IF NOT EXISTS detection_daily_rollups (
+    day DATE NOT NULL,                        -- Detection date in ROLLUP_TIMEZONE
+    user_id UUID NOT NULL,
+    detection TEXT NOT NULL,
+    sessions INTEGER NOT NULL DEFAULT 0,
+    confidence_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    confidence_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, user_id, detection)
+);
+
+-- Append-only changes written by the detection_sessions trigger; refresh_rollups.py consumes them
+CREATE TABLE IF NOT EXISTS detection_rollup_deltas (
+    id BIGSERIAL PRIMARY KEY,
+    user_id UUID NOT NULL,
+    detection_date TIMESTAMP WITH TIME ZONE NOT NULL,
+    detection TEXT,
+    sessions INTEGER NOT NULL,                -- +1 for a new/updated result, -1 for the one it replaces
+    confidence REAL
+);
+
+-- One cheap insert per write: no shared counter rows are locked on the clinical path
+CREATE OR REPLACE FUNCTION record_detection_rollup_delta()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.detection_result IS NOT NULL THEN
+        INSERT INTO detection_rollup_deltas (user_id, detection_date, detection, sessions, confidence)
+        VALUES (
+            OLD.user_id,
+            OLD.detection_date,
+            OLD.detection_result->>'detection',
+            -1,
+            CASE WHEN jsonb_typeof(OLD.detection_result->'confidence') = 'number'
+                THEN (OLD.detection_result->>'confidence')::real END
+        );
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.detection_result IS NOT NULL THEN
+        INSERT INTO detection_rollup_deltas (user_id, detection_date, detection, sessions, confidence)
+        VALUES (
+            NEW.user_id,
+            NEW.detection_date,
+            NEW.detection_result->>'detection',
+            1,
+            CASE WHEN jsonb_typeof(NEW.detection_result->'confidence') = 'number'
+                THEN (NEW.detection_result->>'confidence')::real END
+        );
+    END IF;
+
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS record_detection_rollup_delta ON detection_sessions;
+CREATE TRIGGER record_detection_rollup_delta
+    AFTER INSERT OR DELETE OR UPDATE OF detection_result, detection_date, user_id ON detection_sessions
+    FOR EACH ROW
+    EXECUTE FUNCTION record_detection_rollup_delta();
+
+-- Backfill: queue every existing result; the next refresh folds them in
+INSERT INTO detection_rollup_deltas (user_id, detection_date, detection, sessions, confidence)
+SELECT
+    user_id,
+    detection_date,
+    detection_result->>'detection',
+    1,
+    CASE WHEN jsonb_typeof(detection_result->'confidence') = 'number'
+        THEN (detection_result->>'confidence')::real END
+FROM detection_sessions
+WHERE detection_result IS NOT NULL
+ORDER BY detection_date;
@@ -0,0 +1,2 @@
+-- Byte-ordered index on image paths, so the storage reconciler can stream them in filesystem order
+CREATE INDEX IF NOT EXISTS idx_detection_images_path_c ON detection_images (image_path COLLATE "C");
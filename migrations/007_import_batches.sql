@@ -0,0 +1,10 @@
+-- Checkpoints of bulk imports; a batch row is committed together with the rows it imported
+CREATE TABLE IF NOT EXISTS import_batches (
+    import_id VARCHAR(64) NOT NULL,           -- Hash of the manifest, so a re-run resumes the same import
+    batch_no INTEGER NOT NULL,
+    patients INTEGER NOT NULL,
+    sessions INTEGER NOT NULL,
+    images INTEGER NOT NULL,
+    completed_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (import_id, batch_no)
+);
@@ -0,0 +1,33 @@
+-- Who changed or deleted which clinical record, with the fields before and after the change
+CREATE TABLE IF NOT EXISTS audit_log (
+    id BIGSERIAL PRIMARY KEY,
+    occurred_at TIMESTAMP WITH TIME ZONE NOT NULL,  -- When the change committed; rows are written in batches later
+    user_id UUID,
+    action VARCHAR(16) NOT NULL,              -- 'update' or 'delete'
+    entity VARCHAR(32) NOT NULL,              -- 'patient' or 'detection_session'
+    entity_id UUID NOT NULL,
+    before JSONB,                             -- Changed fields (update) or the whole row (delete)
+    after JSONB                               -- Changed fields (update), NULL for delete
+);
+
+CREATE INDEX IF NOT EXISTS idx_audit_log_entity ON audit_log (entity, entity_id, occurred_at);
+
+-- The log is append-only: rows can be inserted but never changed or removed
+CREATE OR REPLACE FUNCTION reject_audit_log_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    RAISE EXCEPTION 'audit_log is append-only';
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS reject_audit_log_change ON audit_log;
+CREATE TRIGGER reject_audit_log_change
+    BEFORE UPDATE OR DELETE ON audit_log
+    FOR EACH ROW
+    EXECUTE FUNCTION reject_audit_log_change();
+
+DROP TRIGGER IF EXISTS reject_audit_log_truncate ON audit_log;
+CREATE TRIGGER reject_audit_log_truncate
+    BEFORE TRUNCATE ON audit_log
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION reject_audit_log_change();
@@ -0,0 +1,12 @@
+-- Client-supplied Idempotency-Key of detection uploads; a retry with the same key replays the first result
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    user_id UUID NOT NULL,
+    idempotency_key VARCHAR(255) NOT NULL,
+    request_hash VARCHAR(64) NOT NULL,        -- A reused key with a different request is rejected
+    detection_session_id UUID,                -- Set in the transaction that creates the session; NULL while in progress
+    claimed_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    expires_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    PRIMARY KEY (user_id, idempotency_key)
+);
+
+CREATE INDEX IF NOT EXISTS idx_idempotency_keys_expires ON idempotency_keys (expires_at);
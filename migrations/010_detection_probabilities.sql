@@ -0,0 +1,2 @@
+-- Per-class probability vectors of detection results, stored apart from the detection_result summary
+ALTER TABLE detection_sessions ADD COLUMN IF NOT EXISTS detection_probabilities BYTEA;  -- float16, see src/utils/detection_result.py
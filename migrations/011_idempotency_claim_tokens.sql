@@ -0,0 +1,4 @@
+-- Owner of each idempotency key claim, so a request whose stale claim was taken over
+-- can neither complete nor release the key (src/services/idempotency.py)
+ALTER TABLE idempotency_keys ADD COLUMN IF NOT EXISTS claim_token UUID NOT NULL DEFAULT uuid_generate_v4();
+ALTER TABLE idempotency_keys ALTER COLUMN claim_token DROP DEFAULT;
@@ -0,0 +1,11 @@
+import argparse
+
+from src.services.idempotency import purge_expired_idempotency_keys
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Delete expired idempotency keys of detection uploads")
+    parser.add_argument("--batch-size", type=int, default=10000, help="Keys deleted per transaction")
+    args = parser.parse_args()
+
+    deleted = purge_expired_idempotency_keys(batch_size=args.batch_size)
+    print(f"Deleted {deleted} expired idempotency keys")
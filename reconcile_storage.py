@@ -0,0 +1,35 @@
+import argparse
+import time
+
+from config import STORAGE_GC_GRACE_HOURS
+from src.services.storage_gc import reconcile_storage, storage_roots
+from src.services.storage import require_postgres
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find image, QR code and report files no database row references")
+    parser.add_argument("--mode", choices=["report", "quarantine", "delete"], default="report",
+                        help="report only (default), move orphans to the quarantine directory, or delete them")
+    parser.add_argument("--grace-hours", type=int, default=STORAGE_GC_GRACE_HOURS,
+                        help="Leave files modified more recently than this alone")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--max-per-second", type=float, default=50, help="Maximum files removed per second")
+    parser.add_argument("--root", action="append", choices=[name for name, _, _ in storage_roots()],
+                        help="Only reconcile this directory (repeatable)")
+    args = parser.parse_args()
+    require_postgres("The storage reconciler")
+
+    started = time.perf_counter()
+    report = reconcile_storage(
+        mode=args.mode,
+        grace_hours=args.grace_hours,
+        batch_size=args.batch_size,
+        max_per_second=args.max_per_second,
+        roots=args.root,
+    )
+    elapsed = time.perf_counter() - started
+
+    print(f"{'root':<14}{'orphans':>10}{'orphan MB':>12}{'reclaimed':>11}{'reclaimed MB':>14}{'recent':>8}{'missing':>9}")
+    for name, s in report.items():
+        print(f"{name:<14}{s['orphans']:>10}{s['orphan_bytes'] / 1e6:>12.1f}{s['reclaimed']:>11}"
+              f"{s['reclaimed_bytes'] / 1e6:>14.1f}{s['recent']:>8}{s['missing']:>9}")
+    print(f"Finished in {elapsed:.1f}s")
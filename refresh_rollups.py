@@ -0,0 +1,37 @@
+import argparse
+import signal
+import time
+
+from loguru import logger
+
+from config import ROLLUP_BATCH_SIZE, ROLLUP_INTERVAL_SECONDS
+from src.services.rollups import refresh_rollups
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fold new detection changes into the dashboard rollups")
+    parser.add_argument("--once", action="store_true", help="Drain the queue once and exit")
+    parser.add_argument("--interval", type=int, default=ROLLUP_INTERVAL_SECONDS, help="Seconds between runs")
+    parser.add_argument("--batch-size", type=int, default=ROLLUP_BATCH_SIZE)
+    args = parser.parse_args()
+
+    stopping = False
+
+    def request_stop(signum, frame):
+        global stopping
+        stopping = True
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+
+    while True:
+        started = time.perf_counter()
+        folded = refresh_rollups(args.batch_size)
+        if folded:
+            logger.info(f"Folded {folded} detection changes in {time.perf_counter() - started:.2f}s")
+        if args.once or stopping:
+            break
+        deadline = time.monotonic() + args.interval
+        while not stopping and time.monotonic() < deadline:
+            time.sleep(0.5)
+        if stopping:
+            break
@@ -0,0 +1,30 @@
+import argparse
+import time
+
+from src.services.qr import generate_qr_codes
+from src.services.storage import connect
+
+
+def iter_patient_ids(batch_size=5000):
+    """Stream every patient business identifier with a server-side cursor."""
+    conn = connect()
+    try:
+        with conn.cursor(name="qr_patient_ids") as cur:
+            cur.itersize = batch_size
+            cur.execute("SELECT patient_id FROM patients ORDER BY patient_id")
+            for (patient_id,) in cur:
+                yield patient_id
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate QR codes for all patients in parallel")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="Re-render QR codes that already exist")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    written = generate_qr_codes(iter_patient_ids(), workers=args.workers, overwrite=args.force)
+    elapsed = time.perf_counter() - started
+    print(f"Wrote {written} QR codes in {elapsed:.1f}s ({written / elapsed if elapsed else 0:.0f}/s)")
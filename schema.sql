@@ -31,6 +31,9 @@ CREATE TABLE patients (
         ON DELETE RESTRICT
 );
 
+-- Patient business identifier sequence; each nextval reserves a block of 100 numbers
+CREATE SEQUENCE patient_id_seq INCREMENT BY 100 MINVALUE 1 START WITH 1;
+
 -- Detection Sessions (formerly appointments) table
 CREATE TABLE detection_sessions (
     id UUID DEFAULT uuid_generate_v4() PRIMARY KEY,
@@ -38,6 +41,7 @@ CREATE TABLE detection_sessions (
     user_id UUID NOT NULL,                    -- Doctor conducting detection
     detection_date TIMESTAMP WITH TIME ZONE NOT NULL,
     detection_result JSONB,                   -- Detection result based on one or multiple images
+    detection_probabilities BYTEA,            -- float16 per-class vector, see src/utils/detection_result.py
     diagnostic_result TEXT,                   -- Doctor's interpretation/notes
     follow_up_plan TEXT,                      -- Doctor's follow-up plan
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
@@ -64,6 +68,86 @@ CREATE TABLE detection_images (
         ON DELETE CASCADE
 );
 
+-- Detection image features table (perceptual hash + embedding for similarity search)
+CREATE TABLE detection_image_features (
+    image_id UUID PRIMARY KEY,
+    phash BIGINT NOT NULL,                    -- 64-bit DCT perceptual hash
+    embedding BYTEA NOT NULL,                 -- float16 vector, see src/utils/image_features.py
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT fk_detection_image
+        FOREIGN KEY(image_id)
+        REFERENCES detection_images(id)
+        ON DELETE CASCADE
+);
+
+-- Per-patient time series of detection results, maintained by a trigger on detection_sessions
+CREATE TABLE patient_detection_trends (
+    patient_id UUID PRIMARY KEY,
+    user_id UUID NOT NULL,
+    points JSONB NOT NULL DEFAULT '[]',       -- [{session_id, date, detection, confidence}] ordered by date
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT fk_patient
+        FOREIGN KEY(patient_id)
+        REFERENCES patients(id)
+        ON DELETE CASCADE
+);
+
+-- Daily detection counts per doctor and label for the dashboard, folded in from a delta queue
+CREATE TABLE detection_daily_rollups (
+    day DATE NOT NULL,                        -- Detection date in ROLLUP_TIMEZONE
+    user_id UUID NOT NULL,
+    detection TEXT NOT NULL,
+    sessions INTEGER NOT NULL DEFAULT 0,
+    confidence_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    confidence_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, user_id, detection)
+);
+
+-- Append-only changes written by the detection_sessions trigger; refresh_rollups.py consumes them
+CREATE TABLE detection_rollup_deltas (
+    id BIGSERIAL PRIMARY KEY,
+    user_id UUID NOT NULL,
+    detection_date TIMESTAMP WITH TIME ZONE NOT NULL,
+    detection TEXT,
+    sessions INTEGER NOT NULL,                -- +1 for a new/updated result, -1 for the one it replaces
+    confidence REAL
+);
+
+-- Checkpoints of bulk imports; a batch row is committed together with the rows it imported
+CREATE TABLE import_batches (
+    import_id VARCHAR(64) NOT NULL,           -- Hash of the manifest, so a re-run resumes the same import
+    batch_no INTEGER NOT NULL,
+    patients INTEGER NOT NULL,
+    sessions INTEGER NOT NULL,
+    images INTEGER NOT NULL,
+    completed_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (import_id, batch_no)
+);
+
+-- Client-supplied Idempotency-Key of detection uploads; a retry with the same key replays the first result
+CREATE TABLE idempotency_keys (
+    user_id UUID NOT NULL,
+    idempotency_key VARCHAR(255) NOT NULL,
+    request_hash VARCHAR(64) NOT NULL,        -- A reused key with a different request is rejected
+    claim_token UUID NOT NULL,                -- Identifies the request holding the claim; a takeover replaces it
+    detection_session_id UUID,                -- Set in the transaction that creates the session; NULL while in progress
+    claimed_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    expires_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    PRIMARY KEY (user_id, idempotency_key)
+);
+
+-- Who changed or deleted which clinical record; append-only, written in batches by src/services/audit.py
+CREATE TABLE audit_log (
+    id BIGSERIAL PRIMARY KEY,
+    occurred_at TIMESTAMP WITH TIME ZONE NOT NULL,  -- When the change committed
+    user_id UUID,
+    action VARCHAR(16) NOT NULL,              -- 'update' or 'delete'
+    entity VARCHAR(32) NOT NULL,              -- 'patient' or 'detection_session'
+    entity_id UUID NOT NULL,
+    before JSONB,                             -- Changed fields (update) or the whole row (delete)
+    after JSONB                               -- Changed fields (update), NULL for delete
+);
+
 -- Create updated_at trigger function
 CREATE OR REPLACE FUNCTION update_updated_at_column()
 RETURNS TRIGGER AS $$
@@ -82,6 +166,91 @@ BEGIN
 END;
 $$ language 'plpgsql';
 
+-- Create detection trend functions
+CREATE OR REPLACE FUNCTION detection_trend_point(s detection_sessions)
+RETURNS JSONB AS $$
+    SELECT jsonb_build_object(
+        'session_id', s.id,
+        'date', s.detection_date,
+        'detection', s.detection_result->>'detection',
+        'confidence', CASE
+            WHEN jsonb_typeof(s.detection_result->'confidence') = 'number'
+            THEN (s.detection_result->>'confidence')::real
+        END
+    )
+$$ LANGUAGE sql STABLE;
+
+-- Only the changed session's point is parsed; the other points are kept as stored
+CREATE OR REPLACE FUNCTION update_patient_detection_trend()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE patient_detection_trends
+        SET points = COALESCE((
+                SELECT jsonb_agg(p ORDER BY (p->>'date')::timestamptz)
+                FROM jsonb_array_elements(points) p
+                WHERE p->>'session_id' <> OLD.id::text
+            ), '[]'),
+            updated_at = CURRENT_TIMESTAMP
+        WHERE patient_id = OLD.patient_id;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.detection_result IS NOT NULL THEN
+        INSERT INTO patient_detection_trends (patient_id, user_id, points)
+        VALUES (NEW.patient_id, NEW.user_id, jsonb_build_array(detection_trend_point(NEW)))
+        ON CONFLICT (patient_id) DO UPDATE
+        SET points = (
+                SELECT jsonb_agg(p ORDER BY (p->>'date')::timestamptz)
+                FROM jsonb_array_elements(patient_detection_trends.points || EXCLUDED.points) p
+            ),
+            user_id = EXCLUDED.user_id,
+            updated_at = CURRENT_TIMESTAMP;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+-- Create detection rollup delta function; one cheap insert per write, no shared counter rows are locked
+CREATE OR REPLACE FUNCTION record_detection_rollup_delta()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.detection_result IS NOT NULL THEN
+        INSERT INTO detection_rollup_deltas (user_id, detection_date, detection, sessions, confidence)
+        VALUES (
+            OLD.user_id,
+            OLD.detection_date,
+            OLD.detection_result->>'detection',
+            -1,
+            CASE WHEN jsonb_typeof(OLD.detection_result->'confidence') = 'number'
+                THEN (OLD.detection_result->>'confidence')::real END
+        );
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.detection_result IS NOT NULL THEN
+        INSERT INTO detection_rollup_deltas (user_id, detection_date, detection, sessions, confidence)
+        VALUES (
+            NEW.user_id,
+            NEW.detection_date,
+            NEW.detection_result->>'detection',
+            1,
+            CASE WHEN jsonb_typeof(NEW.detection_result->'confidence') = 'number'
+                THEN (NEW.detection_result->>'confidence')::real END
+        );
+    END IF;
+
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+-- Create audit log guard function; the log can only be appended to
+CREATE OR REPLACE FUNCTION reject_audit_log_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    RAISE EXCEPTION 'audit_log is append-only';
+END;
+$$ language 'plpgsql';
+
 -- Create triggers for updated_at
 CREATE TRIGGER update_users_updated_at
     BEFORE UPDATE ON users
@@ -104,14 +273,43 @@ CREATE TRIGGER update_patient_age
     FOR EACH ROW
     EXECUTE FUNCTION update_age_column();
 
+-- Create trigger for per-patient detection trends
+CREATE TRIGGER update_patient_detection_trend
+    AFTER INSERT OR DELETE OR UPDATE OF detection_result, detection_date, patient_id ON detection_sessions
+    FOR EACH ROW
+    EXECUTE FUNCTION update_patient_detection_trend();
+
+-- Create trigger for detection rollup deltas
+CREATE TRIGGER record_detection_rollup_delta
+    AFTER INSERT OR DELETE OR UPDATE OF detection_result, detection_date, user_id ON detection_sessions
+    FOR EACH ROW
+    EXECUTE FUNCTION record_detection_rollup_delta();
+
+-- Create triggers that keep the audit log append-only
+CREATE TRIGGER reject_audit_log_change
+    BEFORE UPDATE OR DELETE ON audit_log
+    FOR EACH ROW
+    EXECUTE FUNCTION reject_audit_log_change();
+
+CREATE TRIGGER reject_audit_log_truncate
+    BEFORE TRUNCATE ON audit_log
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION reject_audit_log_change();
+
 -- Create indices for performance
+-- Composite indexes follow the service query shapes; patient_id lookups use the UNIQUE constraint index
 CREATE INDEX idx_patients_name ON patients(name);
-CREATE INDEX idx_patients_user ON patients(user_id);
-CREATE INDEX idx_patients_patient_id ON patients(patient_id);
-CREATE INDEX idx_detection_sessions_patient ON detection_sessions(patient_id);
+CREATE INDEX idx_patients_user_created ON patients(user_id, created_at DESC)
+    INCLUDE (id, patient_id, name, sex, age, updated_at);
+CREATE INDEX idx_detection_sessions_patient_user_date ON detection_sessions(patient_id, user_id, detection_date DESC);
 CREATE INDEX idx_detection_sessions_user ON detection_sessions(user_id);
 CREATE INDEX idx_detection_sessions_date ON detection_sessions(detection_date);
-CREATE INDEX idx_detection_images_session ON detection_images(detection_session_id);
+CREATE INDEX idx_detection_image_features_created ON detection_image_features(created_at);
+CREATE INDEX idx_detection_images_session_created ON detection_images(detection_session_id, created_at DESC)
+    INCLUDE (id, image_path);
+CREATE INDEX idx_idempotency_keys_expires ON idempotency_keys (expires_at);
+CREATE INDEX idx_audit_log_entity ON audit_log (entity, entity_id, occurred_at);
+CREATE INDEX idx_detection_images_path_c ON detection_images (image_path COLLATE "C");  -- Storage reconciler order
 
 -- Insert default admin user (password should be properly hashed in production)
 INSERT INTO users (user_id, username, password_hash)
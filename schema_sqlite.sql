@@ -0,0 +1,352 @@
+-- Embedded schema for STORAGE_BACKEND=sqlite; mirrors schema.sql and is applied by
+-- src/services/storage.py when the database file is first opened.
+-- UUIDs are stored as text, timestamps as UTC text in one fixed-width format (so they
+-- sort and compare as text) and JSON as text; the declared types TIMESTAMPTZ, DATE and
+-- JSONB tell src/services/storage.py how to convert values back to Python.
+
+-- Users (Doctors) table
+CREATE TABLE users (
+    user_id TEXT PRIMARY KEY DEFAULT (lower(hex(randomblob(4)) || '-' || hex(randomblob(2)) || '-4' || substr(hex(randomblob(2)), 2) || '-' || substr('89ab', 1 + abs(random()) % 4, 1) || substr(hex(randomblob(2)), 2) || '-' || hex(randomblob(6)))),
+    username VARCHAR(50) UNIQUE NOT NULL,
+    password_hash VARCHAR(255) NOT NULL,
+    created_at TIMESTAMPTZ DEFAULT (strftime('%Y-%m-%d %H:%M:%f000+00:00', 'now')),
+    updated_at TIMESTAMPTZ DEFAULT (strftime('%Y-%m-%d %H:%M:%f000+00:00', 'now'))
+);
+
+-- Patients table
+CREATE TABLE patients (
+    id TEXT PRIMARY KEY DEFAULT (lower(hex(randomblob(4)) || '-' || hex(randomblob(2)) || '-4' || substr(hex(randomblob(2)), 2) || '-' || substr('89ab', 1 + abs(random()) % 4, 1) || substr(hex(randomblob(2)), 2) || '-' || hex(randomblob(6)))),
+    user_id TEXT NOT NULL,                    -- Doctor who manages this patient
+    patient_id VARCHAR(20) UNIQUE NOT NULL,   -- Business identifier
+    name VARCHAR(100) NOT NULL,
+    sex VARCHAR(10) CHECK (sex IN ('Male', 'Female', 'Other')),
+    date_of_birth DATE NOT NULL,
+    age INTEGER,                              -- Updated via trigger
+    phone VARCHAR(20),
+    address TEXT,
+    past_medical_history TEXT,
+    present_illness_history TEXT,
+    created_at TIMESTAMPTZ DEFAULT (strftime('%Y-%m-%d %H:%M:%f000+00:00', 'now')),
+    updated_at TIMESTAMPTZ DEFAULT (strftime('%Y-%m-%d %H:%M:%f000+00:00', 'now')),
+    CONSTRAINT fk_user
+        FOREIGN KEY(user_id)
+        REFERENCES users(user_id)
+        ON DELETE RESTRICT
+);
+
+-- Stand-in for PostgreSQL sequences; patient_id_seq hands out blocks of 100 numbers
+CREATE TABLE sequences (
+    name TEXT PRIMARY KEY,
+    next_value INTEGER NOT NULL,
+    increment_by INTEGER NOT NULL
+);
+
+INSERT INTO sequences (name, next_value, increment_by) VALUES ('patient_id_seq', 1, 100);
+
+-- Detection Sessions (formerly appointments) table
+CREATE TABLE detection_sessions (
+    id TEXT PRIMARY KEY DEFAULT (lower(hex(randomblob(4)) || '-' || hex(randomblob(2)) || '-4' || substr(hex(randomblob(2)), 2) || '-' || substr('89ab', 1 + abs(random()) % 4, 1) || substr(hex(randomblob(2)), 2) || '-' || hex(randomblob(6)))),
+    patient_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,                    -- Doctor conducting detection
+    detection_date TIMESTAMPTZ NOT NULL,
+    detection_result JSONB,                   -- Detection result based on one or multiple images
+    detection_probabilities BLOB,             -- float16 per-class vector, see src/utils/detection_result.py
+    diagnostic_result TEXT,                   -- Doctor's interpretation/notes
+    follow_up_plan TEXT,                      -- Doctor's follow-up plan
+    created_at TIMESTAMPTZ DEFAULT (strftime('%Y-%m-%d %H:%M:%f000+00:00', 'now')),
+    updated_at TIMESTAMPTZ DEFAULT (strftime('%Y-%m-%d %H:%M:%f000+00:00', 'now')),
+    CONSTRAINT fk_patient
+        FOREIGN KEY(patient_id)
+        REFERENCES patients(id)
+        ON DELETE CASCADE,
+    CONSTRAINT fk_user
+        FOREIGN KEY(user_id)
+        REFERENCES users(user_id)
+        ON DELETE RESTRICT
+);
+
+-- Detection images table
+CREATE TABLE detection_images (
+    id TEXT PRIMARY KEY DEFAULT (lower(hex(randomblob(4)) || '-' || hex(randomblob(2)) || '-4' || substr(hex(randomblob(2)), 2) || '-' || substr('89ab', 1 + abs(random()) % 4, 1) || substr(hex(randomblob(2)), 2) || '-' || hex(randomblob(6)))),
+    detection_session_id TEXT NOT NULL,
+    image_path TEXT NOT NULL,
+    created_at TIMESTAMPTZ DEFAULT (strftime('%Y-%m-%d %H:%M:%f000+00:00', 'now')),
+    CONSTRAINT fk_detection_session
+        FOREIGN KEY(detection_session_id)
+        REFERENCES detection_sessions(id)
+        ON DELETE CASCADE
+);
+
+-- Detection image features table (perceptual hash + embedding for similarity search)
+CREATE TABLE detection_image_features (
+    image_id TEXT PRIMARY KEY,
+    phash BIGINT NOT NULL,                    -- 64-bit DCT perceptual hash
+    embedding BLOB NOT NULL,                  -- float16 vector, see src/utils/image_features.py
+    created_at TIMESTAMPTZ DEFAULT (strftime('%Y-%m-%d %H:%M:%f000+00:00', 'now')),
+    CONSTRAINT fk_detection_image
+        FOREIGN KEY(image_id)
+        REFERENCES detection_images(id)
+        ON DELETE CASCADE
+);
+
+-- Per-patient time series of detection results, maintained by triggers on detection_sessions
+CREATE TABLE patient_detection_trends (
+    patient_id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    points JSONB NOT NULL DEFAULT '[]',       -- [{session_id, date, detection, confidence}] ordered by date
+    updated_at TIMESTAMPTZ DEFAULT (strftime('%Y-%m-%d %H:%M:%f000+00:00', 'now')),
+    CONSTRAINT fk_patient
+        FOREIGN KEY(patient_id)
+        REFERENCES patients(id)
+        ON DELETE CASCADE
+);
+
+-- Daily detection counts per doctor and label for the dashboard, folded in from a delta queue
+CREATE TABLE detection_daily_rollups (
+    day DATE NOT NULL,                        -- Detection date in ROLLUP_TIMEZONE
+    user_id TEXT NOT NULL,
+    detection TEXT NOT NULL,
+    sessions INTEGER NOT NULL DEFAULT 0,
+    confidence_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+    confidence_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, user_id, detection)
+);
+
+-- Append-only changes written by the detection_sessions triggers; refresh_rollups.py consumes them
+CREATE TABLE detection_rollup_deltas (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    detection_date TIMESTAMPTZ NOT NULL,
+    detection TEXT,
+    sessions INTEGER NOT NULL,                -- +1 for a new/updated result, -1 for the one it replaces
+    confidence REAL
+);
+
+-- Checkpoints of bulk imports; a batch row is committed together with the rows it imported
+CREATE TABLE import_batches (
+    import_id VARCHAR(64) NOT NULL,           -- Hash of the manifest, so a re-run resumes the same import
+    batch_no INTEGER NOT NULL,
+    patients INTEGER NOT NULL,
+    sessions INTEGER NOT NULL,
+    images INTEGER NOT NULL,
+    completed_at TIMESTAMPTZ DEFAULT (strftime('%Y-%m-%d %H:%M:%f000+00:00', 'now')),
+    PRIMARY KEY (import_id, batch_no)
+);
+
+-- Client-supplied Idempotency-Key of detection uploads; a retry with the same key replays the first result
+CREATE TABLE idempotency_keys (
+    user_id TEXT NOT NULL,
+    idempotency_key VARCHAR(255) NOT NULL,
+    request_hash VARCHAR(64) NOT NULL,        -- A reused key with a different request is rejected
+    claim_token TEXT NOT NULL,                -- Identifies the request holding the claim; a takeover replaces it
+    detection_session_id TEXT,                -- Set in the transaction that creates the session; NULL while in progress
+    claimed_at TIMESTAMPTZ NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f000+00:00', 'now')),
+    expires_at TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (user_id, idempotency_key)
+);
+
+-- Who changed or deleted which clinical record; append-only, written in batches by src/services/audit.py
+CREATE TABLE audit_log (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    occurred_at TIMESTAMPTZ NOT NULL,         -- When the change committed
+    user_id TEXT,
+    action VARCHAR(16) NOT NULL,              -- 'update' or 'delete'
+    entity VARCHAR(32) NOT NULL,              -- 'patient' or 'detection_session'
+    entity_id TEXT NOT NULL,
+    before JSONB,                             -- Changed fields (update) or the whole row (delete)
+    after JSONB                               -- Changed fields (update), NULL for delete
+);
+
+-- Counterpart of detection_trend_point(); one point per session with a result
+CREATE VIEW detection_trend_points AS
+SELECT
+    patient_id,
+    detection_date,
+    json_object(
+        'session_id', id,
+        'date', detection_date,
+        'detection', json_extract(detection_result, '$.detection'),
+        'confidence', CASE
+            WHEN json_type(detection_result, '$.confidence') IN ('integer', 'real')
+            THEN json_extract(detection_result, '$.confidence')
+        END
+    ) AS point
+FROM detection_sessions
+WHERE detection_result IS NOT NULL;
+
+-- Create triggers for updated_at (recursive triggers are off, so they do not fire themselves)
+CREATE TRIGGER update_users_updated_at
+    AFTER UPDATE ON users
+    FOR EACH ROW
+BEGIN
+    UPDATE users SET updated_at = strftime('%Y-%m-%d %H:%M:%f000+00:00', 'now') WHERE user_id = NEW.user_id;
+END;
+
+CREATE TRIGGER update_patients_updated_at
+    AFTER UPDATE ON patients
+    FOR EACH ROW
+BEGIN
+    UPDATE patients SET updated_at = strftime('%Y-%m-%d %H:%M:%f000+00:00', 'now') WHERE id = NEW.id;
+END;
+
+CREATE TRIGGER update_detection_sessions_updated_at
+    AFTER UPDATE ON detection_sessions
+    FOR EACH ROW
+BEGIN
+    UPDATE detection_sessions SET updated_at = strftime('%Y-%m-%d %H:%M:%f000+00:00', 'now') WHERE id = NEW.id;
+END;
+
+-- Create triggers for age calculation
+CREATE TRIGGER insert_patient_age
+    AFTER INSERT ON patients
+    FOR EACH ROW
+BEGIN
+    UPDATE patients
+    SET age = CAST(strftime('%Y', 'now') AS INTEGER) - CAST(strftime('%Y', NEW.date_of_birth) AS INTEGER)
+        - (strftime('%m-%d', 'now') < strftime('%m-%d', NEW.date_of_birth))
+    WHERE id = NEW.id;
+END;
+
+CREATE TRIGGER update_patient_age
+    AFTER UPDATE OF date_of_birth ON patients
+    FOR EACH ROW
+BEGIN
+    UPDATE patients
+    SET age = CAST(strftime('%Y', 'now') AS INTEGER) - CAST(strftime('%Y', NEW.date_of_birth) AS INTEGER)
+        - (strftime('%m-%d', 'now') < strftime('%m-%d', NEW.date_of_birth))
+    WHERE id = NEW.id;
+END;
+
+-- Create triggers for per-patient detection trends; a patient's series is rebuilt from
+-- its sessions, which is cheap at the size of a single clinic
+CREATE TRIGGER insert_patient_detection_trend
+    AFTER INSERT ON detection_sessions
+    FOR EACH ROW
+    WHEN NEW.detection_result IS NOT NULL
+BEGIN
+    INSERT OR IGNORE INTO patient_detection_trends (patient_id, user_id) VALUES (NEW.patient_id, NEW.user_id);
+    UPDATE patient_detection_trends
+    SET points = (
+            SELECT json_group_array(json(point))
+            FROM (SELECT point FROM detection_trend_points WHERE patient_id = NEW.patient_id ORDER BY detection_date)
+        ),
+        user_id = NEW.user_id,
+        updated_at = strftime('%Y-%m-%d %H:%M:%f000+00:00', 'now')
+    WHERE patient_id = NEW.patient_id;
+END;
+
+CREATE TRIGGER update_patient_detection_trend
+    AFTER UPDATE OF detection_result, detection_date, patient_id ON detection_sessions
+    FOR EACH ROW
+BEGIN
+    INSERT OR IGNORE INTO patient_detection_trends (patient_id, user_id)
+    SELECT NEW.patient_id, NEW.user_id WHERE NEW.detection_result IS NOT NULL;
+    UPDATE patient_detection_trends
+    SET points = (
+            SELECT json_group_array(json(point))
+            FROM (SELECT point FROM detection_trend_points WHERE patient_id = patient_detection_trends.patient_id ORDER BY detection_date)
+        ),
+        updated_at = strftime('%Y-%m-%d %H:%M:%f000+00:00', 'now')
+    WHERE patient_id IN (OLD.patient_id, NEW.patient_id);
+END;
+
+CREATE TRIGGER delete_patient_detection_trend
+    AFTER DELETE ON detection_sessions
+    FOR EACH ROW
+    WHEN OLD.detection_result IS NOT NULL
+BEGIN
+    UPDATE patient_detection_trends
+    SET points = (
+            SELECT json_group_array(json(point))
+            FROM (SELECT point FROM detection_trend_points WHERE patient_id = OLD.patient_id ORDER BY detection_date)
+        ),
+        updated_at = strftime('%Y-%m-%d %H:%M:%f000+00:00', 'now')
+    WHERE patient_id = OLD.patient_id;
+END;
+
+-- Create triggers for detection rollup deltas; one cheap insert per write
+CREATE TRIGGER insert_detection_rollup_delta
+    AFTER INSERT ON detection_sessions
+    FOR EACH ROW
+    WHEN NEW.detection_result IS NOT NULL
+BEGIN
+    INSERT INTO detection_rollup_deltas (user_id, detection_date, detection, sessions, confidence)
+    VALUES (
+        NEW.user_id,
+        NEW.detection_date,
+        json_extract(NEW.detection_result, '$.detection'),
+        1,
+        CASE WHEN json_type(NEW.detection_result, '$.confidence') IN ('integer', 'real')
+            THEN json_extract(NEW.detection_result, '$.confidence') END
+    );
+END;
+
+CREATE TRIGGER update_detection_rollup_delta
+    AFTER UPDATE OF detection_result, detection_date, user_id ON detection_sessions
+    FOR EACH ROW
+BEGIN
+    INSERT INTO detection_rollup_deltas (user_id, detection_date, detection, sessions, confidence)
+    SELECT
+        OLD.user_id,
+        OLD.detection_date,
+        json_extract(OLD.detection_result, '$.detection'),
+        -1,
+        CASE WHEN json_type(OLD.detection_result, '$.confidence') IN ('integer', 'real')
+            THEN json_extract(OLD.detection_result, '$.confidence') END
+    WHERE OLD.detection_result IS NOT NULL;
+    INSERT INTO detection_rollup_deltas (user_id, detection_date, detection, sessions, confidence)
+    SELECT
+        NEW.user_id,
+        NEW.detection_date,
+        json_extract(NEW.detection_result, '$.detection'),
+        1,
+        CASE WHEN json_type(NEW.detection_result, '$.confidence') IN ('integer', 'real')
+            THEN json_extract(NEW.detection_result, '$.confidence') END
+    WHERE NEW.detection_result IS NOT NULL;
+END;
+
+CREATE TRIGGER delete_detection_rollup_delta
+    AFTER DELETE ON detection_sessions
+    FOR EACH ROW
+    WHEN OLD.detection_result IS NOT NULL
+BEGIN
+    INSERT INTO detection_rollup_deltas (user_id, detection_date, detection, sessions, confidence)
+    VALUES (
+        OLD.user_id,
+        OLD.detection_date,
+        json_extract(OLD.detection_result, '$.detection'),
+        -1,
+        CASE WHEN json_type(OLD.detection_result, '$.confidence') IN ('integer', 'real')
+            THEN json_extract(OLD.detection_result, '$.confidence') END
+    );
+END;
+
+-- Create triggers that keep the audit log append-only
+CREATE TRIGGER reject_audit_log_update
+    BEFORE UPDATE ON audit_log
+BEGIN
+    SELECT RAISE(ABORT, 'audit_log is append-only');
+END;
+
+CREATE TRIGGER reject_audit_log_delete
+    BEFORE DELETE ON audit_log
+BEGIN
+    SELECT RAISE(ABORT, 'audit_log is append-only');
+END;
+
+-- Create indices for performance
+CREATE INDEX idx_patients_name ON patients(name);
+CREATE INDEX idx_patients_user_created ON patients(user_id, created_at DESC);
+CREATE INDEX idx_detection_sessions_patient_user_date ON detection_sessions(patient_id, user_id, detection_date DESC);
+CREATE INDEX idx_detection_sessions_user ON detection_sessions(user_id);
+CREATE INDEX idx_detection_sessions_date ON detection_sessions(detection_date);
+CREATE INDEX idx_detection_image_features_created ON detection_image_features(created_at);
+CREATE INDEX idx_detection_images_session_created ON detection_images(detection_session_id, created_at DESC);
+CREATE INDEX idx_idempotency_keys_expires ON idempotency_keys (expires_at);
+CREATE INDEX idx_audit_log_entity ON audit_log (entity, entity_id, occurred_at);
+CREATE INDEX idx_detection_images_path ON detection_images (image_path);  -- Storage reconciler order
+
+-- Insert default admin user (password should be properly hashed in production)
+INSERT INTO users (username, password_hash)
+VALUES ('admin_user', 'admin123user')
+ON CONFLICT (username) DO NOTHING;
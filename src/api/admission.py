@@ -0,0 +1,196 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from config import (
+    ADMISSION_BURST,
+    ADMISSION_CLIENT_HEADER,
+    ADMISSION_MAX_CLIENTS,
+    ADMISSION_MAX_CONCURRENT,
+    ADMISSION_MAX_QUEUE,
+    ADMISSION_MAX_WAIT_SECONDS,
+    ADMISSION_PATHS,
+    ADMISSION_RATE_PER_SECOND,
+)
+
+metrics_router = APIRouter()
+
+
+class AdmissionRejected(Exception):
+    """A request was turned away; status_code is 429 (client over its rate) or 503 (server full)."""
+
+    def __init__(self, reason, status_code, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.status_code = status_code
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class RateLimiter:
+    """Token bucket per client; the least recently seen clients are forgotten beyond max_clients."""
+
+    def __init__(self, rate, burst, max_clients):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()  # client -> (tokens, updated)
+
+    def check(self, client):
+        """Take a token for client, or raise AdmissionRejected with the time until one is available."""
+        if self.rate <= 0:
+            return  # Rate limiting disabled
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(client, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        if tokens < 1:
+            self._buckets[client] = (tokens, now)
+            raise AdmissionRejected("rate_limited", 429, (1 - tokens) / self.rate)
+        self._buckets[client] = (tokens - 1, now)
+        if len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+
+    @property
+    def clients(self):
+        return len(self._buckets)
+
+
+class ConcurrencyLimiter:
+    """
+    At most max_concurrent requests run at once; up to max_queue more wait in
+    FIFO order for at most max_wait seconds. Beyond that requests are
+    rejected immediately instead of piling up.
+    """
+
+    def __init__(self, max_concurrent, max_queue, max_wait):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.active = 0
+        self._waiters = deque()
+        self._service_seconds = 1.0  # Moving average of request duration, used for Retry-After
+
+    @property
+    def queued(self):
+        return len(self._waiters)
+
+    def _retry_after(self):
+        # Time for the current queue to drain through the available slots
+        return self._service_seconds * (self.queued + 1) / self.max_concurrent
+
+    async def acquire(self):
+        if self.active < self.max_concurrent and not self._waiters:
+            self.active += 1
+            return 0.0
+        if len(self._waiters) >= self.max_queue:
+            raise AdmissionRejected("queue_full", 503, self._retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(waiter, self.max_wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            elif waiter.done() and not waiter.cancelled():
+                self.release()  # The slot was handed over as the wait ended; pass it on
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            raise AdmissionRejected("queue_timeout", 503, self._retry_after())
+        return time.monotonic() - started
+
+    def release(self, duration=None):
+        if duration is not None:
+            self._service_seconds = 0.9 * self._service_seconds + 0.1 * duration
+        # Hand the slot straight to the oldest waiter so new arrivals cannot overtake the queue
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+
+class AdmissionMetrics:
+    def __init__(self):
+        self.admitted = 0
+        self.rejected = {"rate_limited": 0, "queue_full": 0, "queue_timeout": 0}
+        self.wait_seconds_sum = 0.0
+        self.wait_seconds_max = 0.0
+
+
+rate_limiter = RateLimiter(ADMISSION_RATE_PER_SECOND, ADMISSION_BURST, ADMISSION_MAX_CLIENTS)
+concurrency_limiter = ConcurrencyLimiter(ADMISSION_MAX_CONCURRENT, ADMISSION_MAX_QUEUE, ADMISSION_MAX_WAIT_SECONDS)
+metrics = AdmissionMetrics()
+
+
+def is_admission_controlled(path):
+    return any(path.startswith(prefix) for prefix in ADMISSION_PATHS)
+
+
+def client_key(request):
+    """Identify the client a request is rate limited as."""
+    if ADMISSION_CLIENT_HEADER and request.headers.get(ADMISSION_CLIENT_HEADER):
+        return request.headers[ADMISSION_CLIENT_HEADER]
+    return request.client.host if request.client else "unknown"
+
+
+@asynccontextmanager
+async def admit(request):
+    """
+    Hold a concurrency slot for the duration of a request.
+
+    Raises:
+        AdmissionRejected: The client is over its rate limit, or the wait queue is full or too slow
+    """
+    try:
+        rate_limiter.check(client_key(request))
+        waited = await concurrency_limiter.acquire()
+    except AdmissionRejected as e:
+        metrics.rejected[e.reason] += 1
+        raise
+    metrics.admitted += 1
+    metrics.wait_seconds_sum += waited
+    metrics.wait_seconds_max = max(metrics.wait_seconds_max, waited)
+
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        concurrency_limiter.release(time.monotonic() - started)
+
+
+@metrics_router.get("/api/metrics")
+def get_metrics():
+    """Admission control limits and counters of this worker, in Prometheus text format."""
+    lines = [
+        "# TYPE detection_api_admission_limit gauge",
+        f'detection_api_admission_limit{{limit="rate_per_second"}} {rate_limiter.rate}',
+        f'detection_api_admission_limit{{limit="burst"}} {rate_limiter.burst}',
+        f'detection_api_admission_limit{{limit="max_concurrent"}} {concurrency_limiter.max_concurrent}',
+        f'detection_api_admission_limit{{limit="max_queue"}} {concurrency_limiter.max_queue}',
+        f'detection_api_admission_limit{{limit="max_wait_seconds"}} {concurrency_limiter.max_wait}',
+        "# TYPE detection_api_admission_in_flight gauge",
+        f"detection_api_admission_in_flight {concurrency_limiter.active}",
+        "# TYPE detection_api_admission_queued gauge",
+        f"detection_api_admission_queued {concurrency_limiter.queued}",
+        "# TYPE detection_api_admission_clients gauge",
+        f"detection_api_admission_clients {rate_limiter.clients}",
+        "# TYPE detection_api_admission_admitted_total counter",
+        f"detection_api_admission_admitted_total {metrics.admitted}",
+        "# TYPE detection_api_admission_rejected_total counter",
+        *(
+            f'detection_api_admission_rejected_total{{reason="{reason}"}} {count}'
+            for reason, count in metrics.rejected.items()
+        ),
+        "# TYPE detection_api_admission_wait_seconds_sum counter",
+        f"detection_api_admission_wait_seconds_sum {metrics.wait_seconds_sum:.6f}",
+        "# TYPE detection_api_admission_wait_seconds_max gauge",
+        f"detection_api_admission_wait_seconds_max {metrics.wait_seconds_max:.6f}",
+    ]
+    return PlainTextResponse("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
@@ -1,62 +1,200 @@
-from fastapi import FastAPI, File, UploadFile, Form
-from typing import List
+from fastapi import FastAPI, File, UploadFile, Form, Header, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from typing import List, Optional
 from loguru import logger
-import json
+import asyncio
 import os
+import time
+import uuid
 from datetime import datetime
-from src.services.detection import create_detection_session
-from src.services.patient import get_patient_full_details
-from config import USER_ID
+from src.services.detection import PatientNotFound, create_detection_session_for_patient
+from src.services.idempotency import (
+    IdempotencyClaimLost,
+    claim_idempotency_key,
+    get_idempotency_key,
+    release_idempotency_key,
+    request_fingerprint,
+)
+from src.api.admission import AdmissionRejected, admit, is_admission_controlled, metrics_router
+from src.api.export import export_router
+from src.api.images import images_router
+from src.api.reports import reports_router
+from src.api.scan import scan_router
+from src.utils.detection_result import DetectionResult
+from src.utils.tracing import format_traceparent, parse_traceparent, span
+from config import IDEMPOTENCY_WAIT_SECONDS, IMAGE_UPLOAD_DIR, get_user_id
 
 detection_api = FastAPI()
+detection_api.include_router(export_router)
+detection_api.include_router(images_router)
+detection_api.include_router(metrics_router)
+detection_api.include_router(reports_router)
+detection_api.include_router(scan_router)
 
-UPLOAD_DIR = "local_files/images"
+UPLOAD_DIR = IMAGE_UPLOAD_DIR
+
+# Registered before trace_requests, so it runs inside the request span and rejections are traced
+@detection_api.middleware("http")
+async def admission_control(request: Request, call_next):
+    """Rate limit uploads per client and cap how many run at once; excess load is rejected fast."""
+    if not is_admission_controlled(request.url.path):
+        return await call_next(request)
+    try:
+        async with admit(request):
+            return await call_next(request)
+    except AdmissionRejected as e:
+        logger.warning(f"Rejected {request.method} {request.url.path}: {e.reason}")
+        return JSONResponse(
+            {"error": "Too many requests" if e.status_code == 429 else "Server busy", "reason": e.reason},
+            status_code=e.status_code,
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+@detection_api.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Open a server span per request, continuing the caller's traceparent if any."""
+    parent = parse_traceparent(request.headers.get("traceparent"))
+    with span(
+        "http.request",
+        parent=parent,
+        method=request.method,
+        route=request.url.path,
+    ) as request_span:
+        response = await call_next(request)
+        if request_span:
+            request_span.set_attribute("status_code", response.status_code)
+            response.headers["traceparent"] = format_traceparent(request_span)
+        return response
+
+IDEMPOTENCY_POLL_SECONDS = 0.25
+
+async def _replay_idempotent(key, request_hash, existing):
+    """Answer a retry from the stored result, waiting briefly if the first request is still running."""
+    deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+    while True:
+        if existing and existing['request_hash'] != request_hash:
+            return JSONResponse({"error": "Idempotency-Key was already used for a different request"}, status_code=422)
+        if existing and existing['detection_session_id']:
+            return JSONResponse(
+                {"message": "Detection session created", "session_id": str(existing['detection_session_id'])},
+                headers={"Idempotent-Replayed": "true"},
+            )
+        # No row: the first request failed and gave the key up, so retrying will redo it
+        if not existing or time.monotonic() >= deadline:
+            return JSONResponse(
+                {"error": "A request with this Idempotency-Key is still in progress"},
+                status_code=409,
+                headers={"Retry-After": "1"},
+            )
+        await asyncio.sleep(IDEMPOTENCY_POLL_SECONDS)
+        existing = await run_in_threadpool(lambda: get_idempotency_key(get_user_id(), key))
 
 @detection_api.post("/api/detection/{patient_id}")
 async def create_detection(
     patient_id: str,
     images: List[UploadFile] = File(...),
-    detection_result: str = Form(...)
+    detection_result: str = Form(...),
+    idempotency_key: Optional[str] = Header(None, max_length=255)
 ):
+    """
+    Create a detection session from a device upload.
+
+    With an Idempotency-Key header, the first request's result is recorded
+    and retries with the same key (concurrent or later, until the key
+    expires) get it back without writing the images or the session again.
+
+    Database calls, hashing and file writes run in the thread pool, so a slow
+    one never stalls the event loop (and the admission control running on it).
+    """
+    uploads = [(image.filename, await image.read()) for image in images]
+    claim_token = None
+    if idempotency_key:
+        # The image bytes are part of the fingerprint: a reused key with other images is rejected
+        request_hash = await run_in_threadpool(
+            request_fingerprint, patient_id, detection_result, *[part for upload in uploads for part in upload]
+        )
+        claim = await run_in_threadpool(
+            lambda: claim_idempotency_key(get_user_id(), idempotency_key, request_hash)
+        )
+        if claim is None:
+            return {"error": "Failed to check idempotency key"}
+        if not claim['claimed']:
+            return await _replay_idempotent(idempotency_key, request_hash, claim)
+        claim_token = claim['claim_token']
+
+    response = await _create_detection(patient_id, uploads, detection_result, idempotency_key, claim_token)
+    if idempotency_key and "session_id" not in response:
+        await run_in_threadpool(lambda: release_idempotency_key(get_user_id(), idempotency_key, claim_token))
+    return response
+
+async def _create_detection(patient_id, uploads, detection_result, idempotency_key=None, claim_token=None):
+    """
+    Validate the detection result, then save the images and create the session.
+
+    Args:
+        uploads: (filename, content) pairs of the uploaded images
+    """
     try:
-        # Get patient UUID using patient_id first
-        patient = get_patient_full_details(patient_id, user_id=USER_ID)
-        if not patient:
-            return {"error": "Patient not found"}
-        
-        patient_uuid = patient['id']  # Get UUID from patient details
-        
-        # Save uploaded images
-        saved_image_paths = []
-        for image in images:
+        # Rejected before any image is written; probabilities must use known DETECTION_CLASSES
+        detection_data = DetectionResult.model_validate_json(detection_result)
+    except Exception as e:
+        logger.error(f"API Error: {str(e)}")
+        return {"error": str(e)}
+    return await run_in_threadpool(
+        _save_detection, patient_id, uploads, detection_data, idempotency_key, claim_token
+    )
+
+def _save_detection(patient_id, uploads, detection_data, idempotency_key, claim_token):
+    """Write the uploaded images and create their session; blocking, so run in the thread pool."""
+    saved_image_paths = []
+    try:
+        # Save uploaded images; the patient is resolved by the insert itself
+        for filename, content in uploads:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"{patient_uuid}_{timestamp}_{image.filename}"  # Use UUID in filename
-            filepath = os.path.join(UPLOAD_DIR, filename)
+            # Unique per upload: cleanup after a failure must never remove another request's file
+            filepath = os.path.join(UPLOAD_DIR, f"{patient_id}_{timestamp}_{uuid.uuid4().hex}_{filename}")
             
-            with open(filepath, "wb") as f:
-                content = await image.read()
-                f.write(content)
+            with span("file.write", path=filepath, size=len(content)):
+                with open(filepath, "wb") as f:
+                    f.write(content)
             saved_image_paths.append(filepath)
-
-        detection_data = json.loads(detection_result)
         
         session_data = {
             "detection_images": saved_image_paths,
-            "detection_result": json.dumps(detection_data),
+            "detection_result": detection_data,
             "detection_date": datetime.now()
         }
 
-        # Pass UUID instead of patient_id
-        result = create_detection_session(
-            patient_id=patient_uuid,  # Use UUID here
-            user_id=USER_ID,
-            session_data=session_data
+        result = create_detection_session_for_patient(
+            patient_code=patient_id,
+            user_id=get_user_id(),
+            session_data=session_data,
+            idempotency_key=idempotency_key,
+            claim_token=claim_token
         )
         if not result:
-            {"error": "Failed to create detection session"}
+            _remove_files(saved_image_paths)
+            return {"error": "Failed to create detection session"}
 
         return {"message": "Detection session created", "session_id": result["id"]}
 
+    except PatientNotFound:
+        # Found out by the insert itself, after the images were written
+        _remove_files(saved_image_paths)
+        return {"error": "Patient not found"}
+    except IdempotencyClaimLost:
+        # Took longer than IDEMPOTENCY_LOCK_SECONDS and a retry now owns the key; it creates the session
+        _remove_files(saved_image_paths)
+        return {"error": "Idempotency-Key was taken over by a retry of this request"}
     except Exception as e:
         logger.error(f"API Error: {str(e)}")
-        return {"error": str(e)}
\ No newline at end of file
+        _remove_files(saved_image_paths)
+        return {"error": str(e)}
+
+def _remove_files(paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,63 @@
+import json
+import os
+import re
+
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse, StreamingResponse
+from loguru import logger
+
+from config import get_user_id
+from src.services.patient import get_patient_full_details
+from src.utils.image_files import resolve_image_path
+from src.utils.zip_stream import stream_zip
+
+export_router = APIRouter()
+
+
+def _record_members(patient):
+    """Archive members of a patient record: the JSON summary first, then every original image."""
+    images = []
+    for session in patient['detection_sessions']:
+        session_dir = f"sessions/{session['detection_date']:%Y-%m-%d}_{str(session['id'])[:8]}"
+        session['detection_images'] = [
+            dict(image, archive_path=f"{session_dir}/{index + 1:03d}_{os.path.basename(image['image_path'])}")
+            for index, image in enumerate(session['detection_images'])
+        ]
+        images.extend(session['detection_images'])
+
+    summary = json.dumps(patient, indent=2, default=str, ensure_ascii=False).encode()
+    yield "record.json", summary, True
+
+    for image in images:
+        try:
+            path = resolve_image_path(image['image_path'])
+        except OSError as e:
+            logger.warning(f"Skipping missing image {image['image_path']} in export: {e}")
+            continue
+        if os.path.exists(path):
+            yield image['archive_path'], path, False
+        else:
+            logger.warning(f"Skipping missing image {image['image_path']} in export")
+
+
+@export_router.get("/api/patients/{patient_id}/export")
+def export_patient_record(patient_id: str):
+    """
+    Download a patient's complete record as a zip archive.
+
+    The archive holds record.json (details, sessions, results) and the
+    original images per session. It is streamed as it is built, reading
+    images in chunks, so neither the archive nor any image is held in memory.
+    """
+    patient = get_patient_full_details(patient_id, user_id=get_user_id())
+    if not patient:
+        return JSONResponse({"error": "Patient not found"}, status_code=404)
+
+    filename = re.sub(r"[^A-Za-z0-9_-]+", "_", f"{patient['patient_id']}_{patient['name']}") + ".zip"
+    # No span around the body: Starlette advances the generator from worker threads,
+    # and a span's context cannot be entered and left on different threads
+    return StreamingResponse(
+        stream_zip(_record_members(patient)),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -0,0 +1,96 @@
+import os
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import APIRouter, Request
+from fastapi.responses import FileResponse, JSONResponse, Response
+
+from config import get_user_id
+from src.services.detection import get_detection_image
+from src.utils.image_files import file_version, get_derivative, image_url, resolve_image_path
+from src.utils.tracing import span
+
+images_router = APIRouter()
+
+# URLs that carry the file version never change content, so browsers may keep them
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+
+def is_not_modified(request, etag, mtime):
+    """Evaluate If-None-Match / If-Modified-Since against the current file."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+        return etag in tags or "*" in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+@images_router.get("/api/images/{image_id}")
+def get_image(image_id: str, request: Request, v: Optional[str] = None, w: Optional[int] = None):
+    """
+    Serve a detection image, or a resized derivative when `w` is given.
+
+    Responses carry ETag/Last-Modified and answer conditional requests with 304.
+    Range requests are handled by FileResponse. When `v` matches the current
+    file version the URL is content-addressed and cached as immutable.
+    """
+    image = get_detection_image(image_id, get_user_id())
+    if not image or not os.path.exists(image['image_path']):
+        return JSONResponse({"error": "Image not found"}, status_code=404)
+
+    version = file_version(os.stat(image['image_path']))
+    # Cold images are served from the rehydration cache; hot paths pass through unchanged
+    path = resolve_image_path(image['image_path'])
+    if w:
+        with span("image.derivative", path=path, width=w):
+            path = get_derivative(path, w)
+
+    stat_result = os.stat(path)
+    etag = f'"{file_version(stat_result)}"'
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(stat_result.st_mtime, usegmt=True),
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL if v == version else REVALIDATE_CACHE_CONTROL,
+    }
+
+    if is_not_modified(request, etag, stat_result.st_mtime):
+        return Response(status_code=304, headers=headers)
+
+    return FileResponse(path, headers=headers, stat_result=stat_result)
+
+
+@images_router.get("/api/images/{image_id}/similar")
+def get_similar_images(image_id: str, k: int = 5, scope: str = "all"):
+    """
+    Find past images that look like this one.
+
+    `scope=patient` restricts the search to the same patient to follow a
+    lesion over time; the default searches all of the doctor's patients.
+    """
+    from src.services.similarity import find_similar_images
+
+    if scope not in ("all", "patient"):
+        return JSONResponse({"error": "scope must be 'all' or 'patient'"}, status_code=400)
+
+    matches = find_similar_images(image_id, get_user_id(), k=max(1, min(k, 50)), same_patient=scope == "patient")
+    return [
+        {
+            "image_id": str(m['id']),
+            "image_url": image_url(m, width=320),
+            "detection_session_id": str(m['detection_session_id']),
+            "detection_date": m['detection_date'].isoformat() if m['detection_date'] else None,
+            "patient_id": m['patient_id'],
+            "patient_name": m['patient_name'],
+            "similarity": round(m['similarity'], 4),
+            "phash_distance": m['phash_distance'],
+        }
+        for m in matches
+    ]
@@ -0,0 +1,32 @@
+from fastapi import APIRouter
+from fastapi.responses import FileResponse, JSONResponse
+from loguru import logger
+
+from config import get_user_id
+from src.services.reports import get_report
+
+reports_router = APIRouter()
+
+
+@reports_router.get("/api/sessions/{session_id}/report")
+def get_session_report(session_id: str):
+    """
+    Serve a detection session's PDF report.
+
+    Reports are rendered in the background when a session is created or
+    edited; if the current version is not cached yet, it is rendered now.
+    """
+    try:
+        path = get_report(session_id, get_user_id())
+    except Exception as e:
+        logger.error(f"API Error: {str(e)}")
+        return JSONResponse({"error": "Failed to render report"}, status_code=500)
+    if not path:
+        return JSONResponse({"error": "Session not found"}, status_code=404)
+
+    return FileResponse(
+        path,
+        media_type="application/pdf",
+        filename=f"session_report_{session_id[:8]}.pdf",
+        content_disposition_type="inline",
+    )
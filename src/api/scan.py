@@ -0,0 +1,50 @@
+from typing import List
+
+from fastapi import APIRouter, File, UploadFile
+from loguru import logger
+
+from config import get_user_id
+from src.services.patient import get_patients_by_patient_ids
+from src.utils.qr_code import batch_decode_qr
+from src.utils.tracing import span
+
+scan_router = APIRouter()
+
+
+@scan_router.post("/api/scan")
+def scan_patient_qr(images: List[UploadFile] = File(...)):
+    """
+    Decode patient QR codes from uploaded photos and resolve them to patients.
+
+    Every image may contain several codes; all decoded identifiers are
+    resolved together in a single query.
+    """
+    try:
+        contents = [image.file.read() for image in images]
+        with span("qr.batch_decode", images=len(contents)):
+            decoded = batch_decode_qr(contents)
+
+        codes = list(dict.fromkeys(code for texts in decoded for code in texts))
+        patients = get_patients_by_patient_ids(codes, get_user_id())
+
+        return {
+            "images": [
+                {"filename": image.filename, "codes": texts}
+                for image, texts in zip(images, decoded)
+            ],
+            "patients": [
+                {
+                    "id": str(p["id"]),
+                    "patient_id": p["patient_id"],
+                    "name": p["name"],
+                    "sex": p["sex"],
+                    "age": p["age"],
+                }
+                for p in patients
+            ],
+            "unknown_codes": sorted(set(codes) - {p["patient_id"] for p in patients}),
+        }
+
+    except Exception as e:
+        logger.error(f"API Error: {str(e)}")
+        return {"error": str(e)}
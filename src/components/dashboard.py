@@ -0,0 +1,74 @@
+from datetime import date, timedelta
+
+import pandas as pd
+import streamlit as st
+
+from src.services.rollups import get_detection_rollups, get_rollup_backlog
+from src.utils.tracing import traced
+
+
+@traced()
+def render_dashboard():
+    """Clinic dashboard of detections per label, period and doctor, read from rollup tables."""
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        date_range = st.date_input(
+            "Detection date",
+            value=(date.today() - timedelta(days=89), date.today()),
+            max_value=date.today(),
+        )
+    with col2:
+        grain = st.radio("Group by", ["day", "week"], index=1, horizontal=True)
+
+    if not isinstance(date_range, tuple) or len(date_range) != 2:
+        st.info("Select a start and end date")
+        return
+    start_date, end_date = date_range
+
+    rows = get_detection_rollups(start_date, end_date, grain)
+    if not rows:
+        st.info("No detections in this period")
+        return
+
+    data = pd.DataFrame(rows)
+    for column in ('sessions', 'confidence_sum', 'confidence_count'):
+        data[column] = data[column].astype(float)
+
+    confidence_count = data['confidence_count'].sum()
+    metric_cols = st.columns(3)
+    metric_cols[0].metric("Detections", f"{int(data['sessions'].sum()):,}")
+    metric_cols[1].metric("Labels", data['detection'].nunique())
+    metric_cols[2].metric(
+        "Average confidence",
+        f"{data['confidence_sum'].sum() / confidence_count:.2f}" if confidence_count else "-",
+    )
+
+    st.markdown(f"#### Detections per label per {grain}")
+    per_label = data.pivot_table(index='period', columns='detection', values='sessions', aggfunc='sum', fill_value=0)
+    st.bar_chart(per_label)
+
+    st.markdown("#### Per doctor")
+    per_doctor = data.groupby(['username', 'detection'], as_index=False)[
+        ['sessions', 'confidence_sum', 'confidence_count']
+    ].sum()
+    per_doctor['avg_confidence'] = per_doctor['confidence_sum'] / per_doctor['confidence_count'].where(
+        per_doctor['confidence_count'] > 0
+    )
+    st.dataframe(
+        per_doctor[['username', 'detection', 'sessions', 'avg_confidence']].rename(columns={
+            'username': 'Doctor',
+            'detection': 'Label',
+            'sessions': 'Detections',
+            'avg_confidence': 'Average confidence',
+        }),
+        hide_index=True,
+        use_container_width=True,
+        column_config={
+            'Detections': st.column_config.NumberColumn(format="%d"),
+            'Average confidence': st.column_config.NumberColumn(format="%.2f"),
+        },
+    )
+
+    backlog = get_rollup_backlog()
+    if backlog:
+        st.caption(f"{backlog:,} recent changes are not yet included; the rollup job folds them in shortly.")
@@ -3,7 +3,9 @@
 import streamlit as st
 from src.services.authentication import verify_credentials
 from src.utils.session import set_authenticated
+from src.utils.tracing import traced
 
+@traced()
 def render_login():
     """Render the login form and handle login logic."""
     st.title("Login")
@@ -1,13 +1,28 @@
 from datetime import datetime
+from itertools import groupby
+from urllib.parse import quote
 from loguru import logger
-import os
+import pandas as pd
 import streamlit as st
 
-from src.services.patient import get_patient_full_details, update_patient_details, delete_patient
-from src.services.detection import update_detection_session, delete_detection_session
+from src.services.patient import get_patient_basic_details, update_patient_details, delete_patient
+from src.services.detection import (
+    update_detection_session,
+    delete_detection_session,
+    get_detection_sessions_page,
+    get_detection_session_images,
+    get_detection_result,
+    get_patient_detection_trend,
+)
+from src.services.qr import get_qr_png
 from src.utils.common import save_uploaded_file
-from config import USER_ID
+from src.utils.image_files import image_url
+from src.utils.tracing import traced
+from config import API_PUBLIC_URL, get_user_id
 
+SESSIONS_PAGE_SIZE = 10
+
+@traced()
 def render_patient_detail():
     """Render detailed patient information page."""
     # Add Font Awesome CSS
@@ -22,7 +37,9 @@ def render_patient_detail():
         st.error("No patient selected")
         return
     
-    patient = get_patient_full_details(patient_id, user_id=USER_ID)
+    # Only the patient's own record is loaded up front; sessions are paged and
+    # their images/results are fetched when opened
+    patient = get_patient_basic_details(patient_id, user_id=get_user_id())
     
     if not patient:
         st.error("Patient not found")
@@ -31,13 +48,20 @@ def render_patient_detail():
     # Add navigation/delete icons
     nav_container = st.container()
     with nav_container:
-        col1, col2, col3 = st.columns([1, 1, 20])
+        col1, col2, col3, col4 = st.columns([1, 1, 3, 17])
         with col1:
             if st.button("🔄", help="Refresh patient details"):
                 st.rerun()
         with col2:
             if st.button("🗑️", help="Delete patient"):
                 st.session_state.delete_confirmation = True
+        with col3:
+            # Streamed by the API straight to the browser, so large records never pass through Streamlit
+            st.link_button(
+                "📦 Export record",
+                f"{API_PUBLIC_URL}/api/patients/{quote(patient['patient_id'])}/export",
+                help="Download details, sessions and all images as a zip",
+            )
 
     # Handle delete confirmation
     if st.session_state.get('delete_confirmation', False):
@@ -46,7 +70,7 @@ def render_patient_detail():
             col1, col2 = st.columns(2)
             with col1:
                 if st.button("Yes, Delete", key="confirm_delete"):
-                    success = delete_patient(patient_id, USER_ID)
+                    success = delete_patient(patient_id, get_user_id())
                     if success:
                         st.success("Patient deleted successfully!")
                         st.session_state.delete_confirmation = False
@@ -80,21 +104,24 @@ def render_patient_detail():
     bottom_container = st.container()
     with bottom_container:
         st.markdown("### Detection Sessions")
+        render_detection_trend(patient)
         render_detection_sessions(patient)
         st.markdown('</div>', unsafe_allow_html=True)
 
+@traced()
 def render_patient_info(patient):
     """Display and allow editing of patient basic information."""
     col1, col2 = st.columns(2)
 
     with col1:
-        qr_code_path = f"local_files/qr_code/{patient['patient_id']}.png"
-        if os.path.exists(qr_code_path):
+        try:
+            qr_png = get_qr_png(patient['patient_id'])
             col1.markdown("<div style='text-align: center; margin-top: 30px;'>", unsafe_allow_html=True)
-            col1.image(qr_code_path, width=300)
+            col1.image(qr_png, width=300)
             col1.markdown("</div>", unsafe_allow_html=True)
-        else:
-            st.error("QR Code not found")
+        except Exception as e:
+            logger.error(f"Error loading QR code: {e}")
+            st.error("QR Code not available")
     
     with col2:
         name = st.text_input("Name", value=patient.get('name', ''))
@@ -120,7 +147,7 @@ def render_patient_info(patient):
         }
         
         updated_patient = update_patient_details(
-            user_id=USER_ID,
+            user_id=get_user_id(),
             patient_id=patient['id'],
             patient_data=update_data,
         )
@@ -130,6 +157,7 @@ def render_patient_info(patient):
         else:
             st.error("Failed to update patient information")
 
+@traced()
 def render_medical_history(patient):
     """Display and allow editing of patient medical history."""
     past_history = st.text_area(
@@ -154,7 +182,7 @@ def render_medical_history(patient):
         }
         
         updated_patient = update_patient_details(
-            user_id=USER_ID,
+            user_id=get_user_id(),
             patient_id=patient['id'],
             patient_data=update_data,
         )
@@ -164,14 +192,51 @@ def render_medical_history(patient):
         else:
             st.error("Failed to update medical history")
 
+@traced()
+def render_detection_trend(patient):
+    """Chart detection confidence and predicted class across the patient's visits."""
+    points = get_patient_detection_trend(patient['id'], get_user_id())
+    if len(points) < 2:
+        return
+
+    chart_data = pd.DataFrame({
+        'Date': [p['date'] for p in points],
+        'Confidence': [p['confidence'] for p in points],
+        'Detection': [p['detection'] or 'Unknown' for p in points],
+    })
+    st.line_chart(chart_data, x='Date', y='Confidence', color='Detection', height=220)
+
+    # Collapse consecutive visits with the same predicted class, e.g. "Eczema (3) → Psoriasis (1)"
+    history = " → ".join(
+        f"{detection} ({len(list(visits))})"
+        for detection, visits in groupby(chart_data['Detection'])
+    )
+    st.caption(f"Predicted class over {len(points)} visits: {history}")
+
+@traced()
 def render_detection_sessions(patient):
     """Display patient detection sessions in a table format with image previews."""
-    # Display existing detection sessions
-    detection_sessions = patient.get('detection_sessions', [])
+    page = st.session_state.get('sessions_page', 0)
+    detection_sessions, total_sessions = get_detection_sessions_page(
+        patient['id'],
+        get_user_id(),
+        limit=SESSIONS_PAGE_SIZE,
+        offset=page * SESSIONS_PAGE_SIZE,
+    )
     
-    if not detection_sessions:
+    if not total_sessions:
         st.info("No detection sessions found for this patient")
         return
+    
+    if not detection_sessions:
+        # The current page no longer exists, e.g. after deleting its last session
+        st.session_state['sessions_page'] = max(0, (total_sessions - 1) // SESSIONS_PAGE_SIZE)
+        st.rerun()
+    
+    # Galleries and result panels the user has opened, by session id
+    open_galleries = st.session_state.setdefault('open_galleries', set())
+    open_results = st.session_state.setdefault('open_results', set())
+    open_similar = st.session_state.setdefault('open_similar', set())
 
     # Rest of the display code remains the same...
     st.markdown("""
@@ -207,19 +272,31 @@ def render_detection_sessions(patient):
     
     # Display table rows
     for index, session in enumerate(detection_sessions):
-        detection_images = session.get('detection_images', [])
-        
         # Update columns to match header
         cols = st.columns([3, 1, 2, 3, 3, 0.5, 0.5])
         
         with cols[0]:
-            if detection_images:
-                if st.button(f"View {len(detection_images)} images", key=f"img_btn_{index}"):
-                    gallery_cols = st.columns(len(detection_images))
+            if session['image_count']:
+                gallery_open = session['id'] in open_galleries
+                label = "Hide images" if gallery_open else f"View {session['image_count']} images"
+                if st.button(label, key=f"img_btn_{session['id']}"):
+                    open_galleries.symmetric_difference_update({session['id']})
+                    st.rerun()
+                if gallery_open:
+                    detection_images = get_detection_session_images(session['id'], get_user_id())
+                    gallery_cols = st.columns(max(len(detection_images), 1))
                     for img_idx, img in enumerate(detection_images):
                         with gallery_cols[img_idx]:
                             st.write(f"Image {img_idx + 1}")
-                            st.image(img['image_path'], use_container_width=False)
+                            # Served by the API with caching headers, so repeat views are browser cache hits
+                            st.image(image_url(img), use_container_width=False)
+                            similar_open = img['id'] in open_similar
+                            if st.button("Hide similar" if similar_open else "Similar cases", key=f"similar_btn_{img['id']}"):
+                                open_similar.symmetric_difference_update({img['id']})
+                                st.rerun()
+                    for img in detection_images:
+                        if img['id'] in open_similar:
+                            render_similar_cases(img)
             else:
                 st.write("No images")
         
@@ -227,11 +304,17 @@ def render_detection_sessions(patient):
             date_str = session['detection_date']
             formatted_date = date_str.strftime('%Y-%m-%d')
             st.write(formatted_date)
+            st.link_button("📄 Report", f"{API_PUBLIC_URL}/api/sessions/{session['id']}/report")
         
         with cols[2]:
-            if session.get('detection_result'):
-                with st.expander("View Results"):
-                    st.json(session['detection_result'])
+            if session['has_detection_result']:
+                results_open = session['id'] in open_results
+                if st.button("Hide Results" if results_open else "View Results", key=f"result_btn_{session['id']}"):
+                    open_results.symmetric_difference_update({session['id']})
+                    st.rerun()
+                if results_open:
+                    detection_result = get_detection_result(session['id'], get_user_id())
+                    st.json(detection_result.model_dump(exclude_unset=True) if detection_result else {})
             else:
                 st.write("No results yet")
         
@@ -250,10 +333,26 @@ def render_detection_sessions(patient):
             if st.button("🗑️", key=f"delete_session_{session['id']}", help="Delete session"):
                 st.session_state["deleted_session"] = session['id']
 
+    # Pagination
+    page_count = (total_sessions + SESSIONS_PAGE_SIZE - 1) // SESSIONS_PAGE_SIZE
+    if page_count > 1:
+        col1, col2, col3 = st.columns([1, 2, 1])
+        with col1:
+            if st.button("◀ Newer", key="sessions_prev", disabled=page == 0):
+                st.session_state['sessions_page'] = page - 1
+                st.rerun()
+        with col2:
+            st.write(f"Page {page + 1} of {page_count} ({total_sessions} sessions)")
+        with col3:
+            if st.button("Older ▶", key="sessions_next", disabled=page >= page_count - 1):
+                st.session_state['sessions_page'] = page + 1
+                st.rerun()
+
     # Edit Dialog
     edited_session = st.session_state.get("edited_session", None)
     if edited_session:
         logger.debug(f"Edited session: {edited_session}")
+        editing = next((ds for ds in detection_sessions if ds['id'] == edited_session), {})
         with st.container():
             st.markdown("### Edit Session Details")
             
@@ -261,7 +360,7 @@ def render_detection_sessions(patient):
             with col1:
                 temp_diagnostic = st.text_area(
                     "Diagnostic Result",
-                    value=detection_sessions[st.session_state["edited_session_index"]].get('diagnostic_result', ''),
+                    value=editing.get('diagnostic_result', ''),
                     height=150,
                     key=f"edit_diagnostic_{edited_session}"
                 )
@@ -269,7 +368,7 @@ def render_detection_sessions(patient):
             with col2:
                 temp_followup = st.text_area(
                     "Follow-up Plan",
-                    value=detection_sessions[st.session_state["edited_session_index"]].get('follow_up_plan', ''),
+                    value=editing.get('follow_up_plan', ''),
                     height=150,
                     key=f"edit_followup_{edited_session}"
                 )
@@ -281,7 +380,7 @@ def render_detection_sessions(patient):
             col1, col2, col3 = st.columns([0.6, 0.8, 10])
             with col1:
                 if st.button("Save", key=f"save_edit_{edited_session}"):
-                    update_detection_session(edited_session, USER_ID, updated_data)
+                    update_detection_session(edited_session, get_user_id(), updated_data)
                     st.session_state["edited_session"] = None
                     st.rerun()
             
@@ -300,7 +399,7 @@ def render_detection_sessions(patient):
             col1, col2, col3 = st.columns([0.6, 0.8, 10])
             with col1:
                 if st.button("Yes", key=f"confirm_delete_session_{session['id']}"):
-                    delete_detection_session(deleted_session, USER_ID)
+                    delete_detection_session(deleted_session, get_user_id())
                     st.session_state[f"deleted_session"] = None
                     st.rerun()
             
@@ -311,6 +410,32 @@ def render_detection_sessions(patient):
         
     st.markdown("---")
 
+@traced()
+def render_similar_cases(image):
+    """Show past images that look like the given one, from this patient or all patients."""
+    from src.services.similarity import find_similar_images
+
+    scope = st.radio(
+        "Search in",
+        ["All patients", "This patient"],
+        horizontal=True,
+        key=f"similar_scope_{image['id']}",
+    )
+    matches = find_similar_images(image['id'], get_user_id(), k=5, same_patient=scope == "This patient")
+    if not matches:
+        st.caption("No similar images found yet. New images are indexed in the background.")
+        return
+
+    match_cols = st.columns(len(matches))
+    for col, match in zip(match_cols, matches):
+        with col:
+            st.image(image_url(match, width=320), use_container_width=True)
+            st.caption(
+                f"{match['patient_name']} ({match['patient_id']})  \n"
+                f"{match['detection_date'].strftime('%Y-%m-%d')} · similarity {match['similarity']:.2f}"
+            )
+
+
 def get_avatar_html(sex):
     """Generate avatar HTML based on sex."""
     avatar_html = '<div class="avatar-wrapper"><div class="avatar-container '
@@ -4,10 +4,12 @@ import streamlit as st
 
 from src.services.patient import create_patient
 from src.utils.validators import validate_phone_number, validate_required_fields
-from src.utils.common import generate_patient_id
-from src.utils.qr_code import generate_qr
-from config import USER_ID
+from src.services.patient_id import allocate_patient_id
+from src.services.qr import schedule_qr
+from src.utils.tracing import traced
+from config import get_user_id
 
+@traced()
 def render_patient_form():
     """Render the new patient creation form."""
     # Add Font Awesome CSS for icons
@@ -128,7 +130,7 @@ def render_patient_form():
             # Prepare patient data
             patient_data = {
                 'name': name,
-                'patient_id': generate_patient_id(),
+                'patient_id': allocate_patient_id(),
                 'date_of_birth': dob,
                 'sex': sex,
                 'phone': phone,
@@ -139,11 +141,12 @@ def render_patient_form():
             
             try:
                 # Create new patient
-                new_patient = create_patient(patient_data, user_id=USER_ID)
+                new_patient = create_patient(patient_data, user_id=get_user_id())
                 
                 if new_patient:
                     st.success("Patient created successfully!")
-                    generate_qr(new_patient['patient_id'], f"local_files/qr_code/{new_patient['patient_id']}.png")
+                    # Rendered in the background; the detail page generates it on demand if not ready
+                    schedule_qr(new_patient['patient_id'])
                     # Reset form data
                     st.session_state.form_data = {
                         'name': '',
@@ -3,10 +3,13 @@ import pandas as pd
 from datetime import datetime
 from loguru import logger
 
-from src.services.patient import get_all_patients
+from src.services.patient import get_all_patients, get_patients_by_patient_ids
 from src.utils.common import format_datetime
-from config import USER_ID
+from src.utils.qr_code import batch_decode_qr
+from src.utils.tracing import traced
+from config import get_user_id
 
+@traced()
 def render_patient_list():
     """Render the patient list table component."""
     # Create header with title and New Patient button on the same line
@@ -18,12 +21,14 @@ def render_patient_list():
             st.session_state.current_page = "new_patient"
             st.rerun()
 
+    render_qr_scan()
+
     # Add some spacing
     st.write("")
 
     # Fetch patients data
-    logger.debug(f"USER_ID: {USER_ID}")
-    patients = get_all_patients(user_id=USER_ID)
+    logger.debug(f"USER_ID: {get_user_id()}")
+    patients = get_all_patients(user_id=get_user_id())
     if not patients:
         st.info("No patients found. Create a new patient to get started.")
         return
@@ -67,4 +72,35 @@ def render_patient_list():
             col_index += 1
 
     # Add some spacing at the bottom
-    st.write("")
\ No newline at end of file
+    st.write("")
+
+@traced()
+def render_qr_scan():
+    """Open a patient record by scanning the QR code on their wristband."""
+    with st.expander("📷 Scan patient QR code"):
+        photos = st.file_uploader(
+            "Upload wristband photos",
+            type=["png", "jpg", "jpeg"],
+            accept_multiple_files=True,
+            key="qr_scan_photos",
+        )
+        if not photos:
+            return
+
+        decoded = batch_decode_qr([photo.getvalue() for photo in photos])
+        codes = list(dict.fromkeys(code for texts in decoded for code in texts))
+        if not codes:
+            st.warning("No QR code found in the uploaded photos")
+            return
+
+        patients = get_patients_by_patient_ids(codes, get_user_id())
+        if not patients:
+            st.error(f"No patient found for: {', '.join(codes)}")
+            return
+
+        for patient in patients:
+            if st.button(f"Open {patient['name']} ({patient['patient_id']})", key=f"scan_open_{patient['id']}"):
+                st.session_state.current_page = "patient_detail"
+                st.session_state.selected_patient_id = patient['patient_id']
+                st.session_state.selected_patient_name = patient['name']
+                st.rerun()
@@ -0,0 +1,220 @@
+import atexit
+import json
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+
+from loguru import logger
+from psycopg2.extras import execute_values
+
+from config import (
+    AUDIT_BATCH_SIZE,
+    AUDIT_ENABLED,
+    AUDIT_ENQUEUE_TIMEOUT_SECONDS,
+    AUDIT_FLUSH_INTERVAL_SECONDS,
+    AUDIT_QUEUE_SIZE,
+    AUDIT_SHUTDOWN_TIMEOUT_SECONDS,
+)
+from src.services.storage import connect, is_sqlite
+from src.utils.tracing import TracedCursor
+
+# Bumped by every write, so it would turn each update into a "change"
+IGNORED_FIELDS = {"updated_at"}
+
+_enabled = AUDIT_ENABLED
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def _diff(before, after):
+    """Reduce two row snapshots to the fields that changed, as (before, after) dicts."""
+    keys = (before.keys() | after.keys()) - IGNORED_FIELDS
+    changed = sorted(k for k in keys if before.get(k) != after.get(k))
+    return {k: before.get(k) for k in changed}, {k: after.get(k) for k in changed}
+
+
+def _to_rows(entries):
+    """Turn queued entries into audit_log rows; updates that changed nothing are dropped."""
+    rows = []
+    for occurred_at, user_id, action, entity, entity_id, before, after in entries:
+        if action == "update":
+            before, after = _diff(before or {}, after or {})
+            if not after and not before:
+                continue
+        rows.append((
+            occurred_at,
+            user_id,
+            action,
+            entity,
+            entity_id,
+            json.dumps(before, default=str) if before is not None else None,
+            json.dumps(after, default=str) if after is not None else None,
+        ))
+    return rows
+
+
+def _insert_entries(entries):
+    """Write entries to audit_log in a single INSERT."""
+    rows = _to_rows(entries)
+    if not rows:
+        return
+    conn = None
+    cur = None
+    try:
+        conn = connect()
+        cur = conn.cursor(cursor_factory=TracedCursor)
+        if is_sqlite():
+            # executemany reuses one prepared statement in-process, the embedded equivalent of a batch
+            cur.executemany("""
+                INSERT INTO audit_log (occurred_at, user_id, action, entity, entity_id, before, after)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+            """, rows)
+        else:
+            execute_values(cur, """
+                INSERT INTO audit_log (occurred_at, user_id, action, entity, entity_id, before, after)
+                VALUES %s
+            """, rows, page_size=len(rows))
+        conn.commit()
+    except Exception:
+        if conn:
+            conn.rollback()
+        raise
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            conn.close()
+
+
+class AuditLogWriter:
+    """
+    Buffer audit entries in a bounded queue and write them from a background thread.
+
+    Entries are written in batches of up to batch_size, at the latest after
+    interval seconds. When the queue is full, record() waits up to
+    enqueue_timeout for room and then writes the entry itself, so a stalled
+    writer slows edits down instead of losing entries. Queued entries are
+    written before the process exits.
+    """
+
+    def __init__(self, batch_size=AUDIT_BATCH_SIZE, interval=AUDIT_FLUSH_INTERVAL_SECONDS,
+                 queue_size=AUDIT_QUEUE_SIZE, enqueue_timeout=AUDIT_ENQUEUE_TIMEOUT_SECONDS):
+        self.batch_size = batch_size
+        self.interval = interval
+        self.enqueue_timeout = enqueue_timeout
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="audit-writer")
+        self._thread.start()
+        atexit.register(self.close)
+
+    def record(self, entry):
+        try:
+            self._queue.put(entry, timeout=self.enqueue_timeout)
+        except queue.Full:
+            logger.warning("Audit queue full, writing entry inline")
+            try:
+                _insert_entries([entry])
+            except Exception as e:
+                logger.error(f"Error writing audit entry {entry}: {e}")
+
+    def _next_batch(self):
+        try:
+            batch = [self._queue.get(timeout=self.interval)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        attempt = 0
+        while True:
+            try:
+                _insert_entries(batch)
+                return
+            except Exception as e:
+                attempt += 1
+                # Keep retrying while running (the full queue slows writers down meanwhile),
+                # but give up after a few attempts once the process is exiting
+                if self._stopping.is_set() and attempt >= 3:
+                    for entry in batch:
+                        logger.error(f"Audit entry not written: {entry}")
+                    return
+                logger.warning(f"Error writing {len(batch)} audit entries (attempt {attempt}): {e}")
+                time.sleep(min(2 ** attempt, 30))
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch:
+                self._write(batch)
+                for _ in batch:
+                    self._queue.task_done()
+            elif self._stopping.is_set():
+                return
+
+    def flush(self):
+        """Block until every entry queued so far is written."""
+        self._queue.join()
+
+    def close(self, timeout=AUDIT_SHUTDOWN_TIMEOUT_SECONDS):
+        """Write the remaining entries and stop the background thread."""
+        self._stopping.set()
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.error(f"Audit writer did not finish within {timeout}s; {self._queue.qsize()} entries pending")
+
+
+def _get_writer():
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = AuditLogWriter()
+    return _writer
+
+
+def record_change(user_id, action, entity, entity_id, before=None, after=None):
+    """
+    Queue an audit entry for a committed clinical write.
+
+    Call after the transaction commits. Diffing and writing happen in the
+    background, so this only copies the row snapshots.
+
+    Args:
+        user_id: UUID of the doctor who made the change
+        action (str): 'update' or 'delete'
+        entity (str): 'patient' or 'detection_session'
+        entity_id: UUID of the changed row
+        before (dict): Row before the change
+        after (dict): Row after the change (None for deletes)
+    """
+    if not _enabled:
+        return
+    entry = (
+        datetime.now(timezone.utc),
+        user_id,
+        action,
+        entity,
+        entity_id,
+        dict(before) if before is not None else None,
+        dict(after) if after is not None else None,
+    )
+    _get_writer().record(entry)
+
+
+def flush_audit_log():
+    """Block until every queued audit entry is written."""
+    if _writer is not None:
+        _writer.flush()
+
+
+def set_audit_enabled(enabled):
+    """Turn auditing on or off for this process (used to measure its overhead)."""
+    global _enabled
+    _enabled = enabled
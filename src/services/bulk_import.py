@@ -0,0 +1,287 @@
+import csv
+import hashlib
+import io
+import json
+import os
+import tempfile
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+
+import psycopg2
+from loguru import logger
+
+from config import DATABASE_URL, IMAGE_UPLOAD_DIR
+from src.services.patient_id import allocate_patient_ids
+from src.services.qr import generate_qr_codes
+from src.utils.tracing import TracedCursor
+
+IMPORT_DIR = os.path.join(IMAGE_UPLOAD_DIR, "imported")
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".bmp", ".tif", ".tiff"}
+PATIENT_FIELDS = (
+    "name", "sex", "date_of_birth", "phone", "address",
+    "past_medical_history", "present_illness_history",
+)
+SESSION_FIELDS = ("detection_date", "diagnostic_result", "follow_up_plan")
+
+
+class ManifestError(ValueError):
+    """The import manifest is malformed; raised before anything is written."""
+
+
+def _image_files(spec, images_root):
+    """Expand a manifest image entry (files and/or directories, ';'-separated) into image paths."""
+    entries = spec if isinstance(spec, list) else [p for p in (spec or "").split(";") if p.strip()]
+    paths = []
+    for entry in entries:
+        path = os.path.join(images_root, entry.strip())
+        if os.path.isdir(path):
+            paths.extend(sorted(
+                os.path.join(root, name)
+                for root, _, names in os.walk(path)
+                for name in names
+                if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+            ))
+        else:
+            paths.append(path)
+    return paths
+
+
+def _parse_patient(record, where):
+    patient = {field: (record.get(field) or None) for field in PATIENT_FIELDS}
+    if not patient["name"]:
+        raise ManifestError(f"{where}: name is required")
+    sex = (patient["sex"] or "Other").strip().capitalize()
+    if sex not in ("Male", "Female", "Other"):
+        raise ManifestError(f"{where}: sex must be Male, Female or Other, got {patient['sex']!r}")
+    patient["sex"] = sex
+    try:
+        patient["date_of_birth"] = date.fromisoformat(str(patient["date_of_birth"]))
+    except ValueError:
+        raise ManifestError(f"{where}: date_of_birth must be YYYY-MM-DD, got {patient['date_of_birth']!r}")
+    return patient
+
+
+def _parse_session(record, images_root, where):
+    session = {field: (record.get(field) or None) for field in SESSION_FIELDS}
+    try:
+        session["detection_date"] = (
+            datetime.fromisoformat(str(session["detection_date"])) if session["detection_date"] else datetime.now()
+        )
+    except ValueError:
+        raise ManifestError(f"{where}: detection_date must be ISO 8601, got {session['detection_date']!r}")
+    session["images"] = _image_files(record.get("images"), images_root)
+    return session
+
+
+def load_manifest(path, images_root):
+    """
+    Read and validate an import manifest.
+
+    JSON manifests are a list of patients, each with an optional "sessions"
+    list of {detection_date, diagnostic_result, follow_up_plan, images}.
+    CSV manifests have one row per session; rows sharing an external_id
+    (or, without one, the same name and date_of_birth) belong to one patient.
+    "images" lists files or directories relative to images_root, separated
+    by ';' in CSV.
+
+    Args:
+        path (str): Manifest file (.json or .csv)
+        images_root (str): Directory image entries are relative to
+
+    Returns:
+        tuple: (list of patients with a 'sessions' list, manifest SHA-256)
+    """
+    with open(path, "rb") as f:
+        raw = f.read()
+    digest = hashlib.sha256(raw).hexdigest()
+
+    patients = []
+    if path.lower().endswith(".json"):
+        for index, record in enumerate(json.loads(raw)):
+            where = f"patient #{index + 1}"
+            patient = _parse_patient(record, where)
+            patient["sessions"] = [
+                _parse_session(session, images_root, f"{where} session #{n + 1}")
+                for n, session in enumerate(record.get("sessions", []))
+            ]
+            patients.append(patient)
+    else:
+        by_key = {}
+        for line, record in enumerate(csv.DictReader(io.StringIO(raw.decode("utf-8-sig"))), start=2):
+            where = f"line {line}"
+            key = record.get("external_id") or (record.get("name"), record.get("date_of_birth"))
+            if key not in by_key:
+                patient = _parse_patient(record, where)
+                patient["sessions"] = []
+                by_key[key] = patient
+                patients.append(patient)
+            if record.get("images") or record.get("detection_date") or record.get("diagnostic_result"):
+                by_key[key]["sessions"].append(_parse_session(record, images_root, where))
+
+    return patients, digest
+
+
+def copy_image(source_path):
+    """
+    Hash an image and copy it into the content-addressed import directory.
+
+    Runs in a worker process. Identical files are stored once, and re-running
+    an interrupted import finds its earlier copies already in place.
+
+    Returns:
+        tuple: (source path, stored path, size), or (source path, None, error) on failure
+    """
+    try:
+        digest = hashlib.sha256()
+        with open(source_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        digest = digest.hexdigest()
+        extension = os.path.splitext(source_path)[1].lower()
+        target = os.path.join(IMPORT_DIR, digest[:2], f"{digest}{extension}")
+        if not os.path.exists(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target), suffix=".tmp")
+            with os.fdopen(fd, "wb") as out, open(source_path, "rb") as f:
+                while chunk := f.read(1024 * 1024):
+                    out.write(chunk)
+            os.replace(tmp_path, target)
+        return source_path, target, os.path.getsize(target)
+    except OSError as e:
+        return source_path, None, str(e)
+
+
+def _copy_rows(cur, table, columns, rows):
+    """Load rows with COPY ... FROM STDIN (CSV), the fastest bulk path into Postgres."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(["\\N" if value is None else value for value in row])
+    buffer.seek(0)
+    cur.copy_expert(
+        f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+        buffer,
+    )
+
+
+def completed_batches(import_id):
+    """Batch numbers of an import that were already committed."""
+    conn = psycopg2.connect(DATABASE_URL)
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT batch_no FROM import_batches WHERE import_id = %s", (import_id,))
+            return {row[0] for row in cur.fetchall()}
+    finally:
+        conn.close()
+
+
+def _write_batch(import_id, batch_no, user_id, patients, stored_paths):
+    """
+    Insert one batch of patients, sessions and images plus its checkpoint, atomically.
+
+    Returns:
+        tuple: (patients, sessions, images) inserted
+    """
+    patient_ids = allocate_patient_ids(len(patients))
+    patient_rows, session_rows, image_rows = [], [], []
+    for patient, patient_code in zip(patients, patient_ids):
+        patient["patient_id"] = patient_code
+        patient_uuid = uuid.uuid4()
+        patient_rows.append((patient_uuid, user_id, patient_code, *(patient[f] for f in PATIENT_FIELDS)))
+        for session in patient["sessions"]:
+            session_uuid = uuid.uuid4()
+            session_rows.append((session_uuid, patient_uuid, user_id, *(session[f] for f in SESSION_FIELDS)))
+            image_rows.extend(
+                (session_uuid, stored_paths[path]) for path in session["images"] if path in stored_paths
+            )
+
+    conn = None
+    cur = None
+    try:
+        conn = psycopg2.connect(DATABASE_URL)
+        cur = conn.cursor(cursor_factory=TracedCursor)
+        # Claim the batch first: a concurrent run of the same import fails here instead of duplicating rows
+        cur.execute("""
+            INSERT INTO import_batches (import_id, batch_no, patients, sessions, images)
+            VALUES (%s, %s, %s, %s, %s)
+        """, (import_id, batch_no, len(patient_rows), len(session_rows), len(image_rows)))
+        _copy_rows(cur, "patients", ("id", "user_id", "patient_id") + PATIENT_FIELDS, patient_rows)
+        _copy_rows(cur, "detection_sessions", ("id", "patient_id", "user_id") + SESSION_FIELDS, session_rows)
+        _copy_rows(cur, "detection_images", ("detection_session_id", "image_path"), image_rows)
+        conn.commit()
+        return len(patient_rows), len(session_rows), len(image_rows)
+    except Exception:
+        if conn:
+            conn.rollback()
+        raise
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            conn.close()
+
+
+def run_import(patients, import_id, user_id, batch_size=500, workers=None, progress=None):
+    """
+    Import patients in checkpointed batches.
+
+    Images of a batch are hashed and copied by a process pool, then the
+    batch's rows are loaded with COPY in one transaction together with its
+    import_batches checkpoint. Batches already checkpointed are skipped, so an
+    interrupted import resumes where it stopped when re-run with the same
+    manifest. QR codes are generated after each batch commits.
+
+    Args:
+        patients (list): Output of load_manifest
+        import_id (str): Identifier of the import (the manifest hash)
+        user_id: UUID of the doctor the patients are assigned to
+        batch_size (int): Patients per transaction
+        workers (int): Worker processes for copying images and rendering QR codes
+        progress: Optional callable(batch_no, batch_stats, totals) called after each batch
+
+    Returns:
+        dict: Totals of patients, sessions, images, bytes, skipped batches, missing images and seconds
+    """
+    done = completed_batches(import_id)
+    totals = {"patients": 0, "sessions": 0, "images": 0, "bytes": 0,
+              "skipped_batches": 0, "missing_images": 0, "seconds": 0.0}
+    started = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for batch_no, start in enumerate(range(0, len(patients), batch_size)):
+            if batch_no in done:
+                totals["skipped_batches"] += 1
+                continue
+            batch = patients[start:start + batch_size]
+            batch_started = time.perf_counter()
+
+            sources = sorted({path for p in batch for s in p["sessions"] for path in s["images"]})
+            stored_paths = {}
+            copied_bytes = 0
+            for source, stored, detail in pool.map(copy_image, sources, chunksize=16):
+                if stored is None:
+                    logger.warning(f"Skipping image {source}: {detail}")
+                    totals["missing_images"] += 1
+                    continue
+                stored_paths[source] = stored
+                copied_bytes += detail
+
+            counts = _write_batch(import_id, batch_no, user_id, batch, stored_paths)
+            generate_qr_codes([p["patient_id"] for p in batch], workers=workers)
+
+            for key, value in zip(("patients", "sessions", "images"), counts):
+                totals[key] += value
+            totals["bytes"] += copied_bytes
+            totals["seconds"] = time.perf_counter() - started
+            if progress:
+                progress(batch_no, {
+                    "patients": counts[0],
+                    "images": counts[2],
+                    "bytes": copied_bytes,
+                    "seconds": time.perf_counter() - batch_started,
+                }, totals)
+
+    totals["seconds"] = time.perf_counter() - started
+    return totals
@@ -1,9 +1,75 @@
-import psycopg2
 from loguru import logger
-from psycopg2.extras import RealDictCursor
-from config import DATABASE_URL
+from src.services.audit import record_change
+from src.services.idempotency import IdempotencyClaimLost
+from src.services.storage import connect, is_sqlite
+from src.utils.common import parse_timestamps
+from src.utils.tracing import TracedCursor, traced
 from datetime import datetime
 
+class PatientNotFound(Exception):
+    """No patient with this identifier belongs to the doctor; nothing was written."""
+
+def _index_images(images):
+    """Queue feature extraction for similarity search once images are committed."""
+    # Imported here so numpy is only loaded once images are actually saved
+    from src.services.similarity import index_images_async
+    try:
+        index_images_async(images)
+    except Exception as e:
+        logger.warning(f"Error scheduling image feature extraction: {e}")
+
+def _schedule_report(detection_session_id, user_id):
+    """Queue the session's PDF report so it is ready before anyone asks for it."""
+    from src.services.reports import schedule_report
+    try:
+        schedule_report(detection_session_id, user_id)
+    except Exception as e:
+        logger.warning(f"Error scheduling session report: {e}")
+
+# SQLite counterpart of the new_images CTEs; the paths are bound as one JSON array
+_INSERT_IMAGES_SQLITE = """
+INSERT INTO detection_images (detection_session_id, image_path)
+SELECT %s, value FROM json_each(%s)
+RETURNING id, image_path, created_at
+"""
+
+def _update_detection_session_sqlite(cur, params):
+    """
+    The update_detection_session statement as separate statements, for SQLite.
+    
+    SQLite has no data-modifying CTEs; its statements are in-process calls
+    rather than round trips, so splitting them costs next to nothing.
+    """
+    cur.execute("SELECT * FROM detection_sessions WHERE id = %(id)s AND user_id = %(user_id)s FOR UPDATE", params)
+    audit_before = cur.fetchone()
+    if not audit_before:
+        return None
+    
+    cur.execute("""
+        UPDATE detection_sessions
+        SET 
+            diagnostic_result = COALESCE(%(diagnostic_result)s, diagnostic_result),
+            follow_up_plan = COALESCE(%(follow_up_plan)s, follow_up_plan)
+        WHERE id = %(id)s
+    """, params)
+    cur.execute(_INSERT_IMAGES_SQLITE, (params['id'], params['image_paths']))
+    new_images = cur.fetchall()
+    
+    cur.execute("SELECT * FROM detection_sessions WHERE id = %(id)s", params)
+    updated_session = cur.fetchone()
+    updated_session['audit_after'] = dict(updated_session)  # Copied before audit_before is attached
+    updated_session['audit_before'] = audit_before
+    updated_session['new_images'] = new_images
+    cur.execute("""
+        SELECT id, image_path, created_at
+        FROM detection_images
+        WHERE detection_session_id = %(id)s
+        ORDER BY created_at DESC
+    """, params)
+    updated_session['detection_images'] = cur.fetchall()
+    return updated_session
+
+@traced()
 def update_detection_session(detection_session_id, user_id, session_data):
     """
     Update detection session details.
@@ -25,70 +91,91 @@ def update_detection_session(detection_session_id, user_id, session_data):
     conn = None
     cur = None
     try:
-        conn = psycopg2.connect(DATABASE_URL)
-        cur = conn.cursor(cursor_factory=RealDictCursor)
+        conn = connect()
+        cur = conn.cursor(cursor_factory=TracedCursor)
         
-        # Start transaction
-        conn.autocommit = False
-        
-        # Update detection session details
+        # Update the session, add the new images and return the session with all of its
+        # images in one round trip. Images inserted by the statement are not visible to
+        # its own reads, so they are prepended to the existing ones (they are the newest).
+        # The locked pre-update row is returned for the audit log.
         query = """
-        UPDATE detection_sessions
-        SET 
-            diagnostic_result = COALESCE(%s, diagnostic_result),
-            follow_up_plan = COALESCE(%s, follow_up_plan),
-            updated_at = CURRENT_TIMESTAMP
-        WHERE id = %s AND user_id = %s
-        RETURNING *
-        """
-        
-        cur.execute(query, (
-            session_data.get('diagnostic_result'),
-            session_data.get('follow_up_plan'),
-            detection_session_id,
-            user_id
-        ))
-        
-        updated_session = cur.fetchone()
-        
-        # If new images are provided, add them to detection_images table
-        if session_data.get('detection_images'):
-            images_query = """
+        WITH previous AS (
+            SELECT * FROM detection_sessions
+            WHERE id = %(id)s AND user_id = %(user_id)s
+            FOR UPDATE
+        ),
+        updated AS (
+            UPDATE detection_sessions s
+            SET 
+                diagnostic_result = COALESCE(%(diagnostic_result)s, s.diagnostic_result),
+                follow_up_plan = COALESCE(%(follow_up_plan)s, s.follow_up_plan),
+                updated_at = CURRENT_TIMESTAMP
+            FROM previous
+            WHERE s.id = previous.id
+            RETURNING s.*, to_jsonb(previous) AS audit_before, to_jsonb(s) AS audit_after
+        ),
+        new_images AS (
             INSERT INTO detection_images (
                 detection_session_id,
                 image_path,
                 created_at
-            ) VALUES (%s, %s, CURRENT_TIMESTAMP)
+            )
+            SELECT u.id, t.image_path, CURRENT_TIMESTAMP
+            FROM updated u, unnest(%(image_paths)s::text[]) AS t (image_path)
             RETURNING id, image_path, created_at
-            """
-            
-            new_images = []
-            for image_path in session_data['detection_images']:
-                cur.execute(images_query, (detection_session_id, image_path))
-                new_images.append(cur.fetchone())
-            
-            # Add new images to the updated session data
-            if updated_session:
-                updated_session['detection_images'] = new_images
-        
-        # If update successful, fetch all images for this session
-        if updated_session:
-            images_query = """
-            SELECT 
-                id,
-                image_path,
-                created_at
-            FROM detection_images
-            WHERE detection_session_id = %s
-            ORDER BY created_at DESC
-            """
-            
-            cur.execute(images_query, (detection_session_id,))
-            updated_session['detection_images'] = cur.fetchall()
-        
-        # Commit transaction
+        ),
+        added AS (
+            SELECT COALESCE(jsonb_agg(jsonb_build_object(
+                'id', id,
+                'image_path', image_path,
+                'created_at', created_at
+            )), '[]') AS images
+            FROM new_images
+        )
+        SELECT 
+            u.*,
+            a.images AS new_images,
+            a.images || COALESCE((
+                SELECT jsonb_agg(jsonb_build_object(
+                    'id', i.id,
+                    'image_path', i.image_path,
+                    'created_at', i.created_at
+                ) ORDER BY i.created_at DESC)
+                FROM detection_images i
+                WHERE i.detection_session_id = u.id
+            ), '[]') AS detection_images
+        FROM updated u, added a
+        """
+        
+        params = {
+            'id': detection_session_id,
+            'user_id': user_id,
+            'diagnostic_result': session_data.get('diagnostic_result'),
+            'follow_up_plan': session_data.get('follow_up_plan'),
+            'image_paths': session_data.get('detection_images') or [],
+        }
+        if is_sqlite():
+            updated_session = _update_detection_session_sqlite(cur, params)
+        else:
+            cur.execute(query, params)
+            updated_session = cur.fetchone()
         conn.commit()
         
+        if not updated_session:
+            return None
+        
+        audit_before = updated_session.pop('audit_before')
+        audit_after = updated_session.pop('audit_after')
+        new_images = parse_timestamps(updated_session.pop('new_images'))
+        parse_timestamps(updated_session['detection_images'])
+        
+        if new_images:
+            _index_images(new_images)
+            audit_after['detection_images_added'] = [image['image_path'] for image in new_images]
+        record_change(user_id, "update", "detection_session", updated_session['id'],
+                      before=audit_before, after=audit_after)
+        _schedule_report(detection_session_id, user_id)
+        
         return updated_session
         
     except Exception as e:
@@ -102,82 +189,178 @@ def update_detection_session(detection_session_id, user_id, session_data):
         if conn:
             conn.close()
 
-def create_detection_session(patient_id, user_id, session_data):
-    """
-    Create a new detection session for a patient.
+# Creates the session, its images and the idempotency key link in one statement; the
+# patient is matched by {patient_column} and must belong to the doctor. With a key, the
+# session is only created while the request still holds the claim (its claim_token);
+# the row lock makes a concurrent takeover wait for this statement, or vice versa.
+# Always returns one row: the session columns are NULL when nothing was created.
+_CREATE_SESSION_QUERY = """
+WITH patient AS (
+    SELECT id FROM patients
+    WHERE {patient_column} = %(patient)s AND user_id = %(user_id)s
+),
+claim AS (
+    SELECT 1 FROM idempotency_keys
+    WHERE user_id = %(user_id)s AND idempotency_key = %(idempotency_key)s
+        AND claim_token = %(claim_token)s AND detection_session_id IS NULL
+    FOR UPDATE
+),
+new_session AS (
+    INSERT INTO detection_sessions (
+        patient_id,
+        user_id,
+        detection_result,
+        detection_probabilities,
+        diagnostic_result,
+        follow_up_plan,
+        detection_date,
+        created_at,
+        updated_at
+    )
+    SELECT p.id, %(user_id)s, %(detection_result)s::jsonb, %(detection_probabilities)s, %(diagnostic_result)s,
+           %(follow_up_plan)s, %(detection_date)s, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP
+    FROM patient p
+    WHERE %(idempotency_key)s IS NULL OR EXISTS (SELECT 1 FROM claim)
+    RETURNING *
+),
+new_images AS (
+    INSERT INTO detection_images (
+        detection_session_id,
+        image_path,
+        created_at
+    )
+    SELECT s.id, t.image_path, CURRENT_TIMESTAMP
+    FROM new_session s, unnest(%(image_paths)s::text[]) AS t (image_path)
+    RETURNING id, image_path, created_at
+),
+completed_key AS (
+    UPDATE idempotency_keys k
+    SET detection_session_id = s.id
+    FROM new_session s
+    WHERE k.user_id = %(user_id)s AND k.idempotency_key = %(idempotency_key)s
+        AND k.claim_token = %(claim_token)s
+)
+SELECT 
+    %(idempotency_key)s IS NULL OR EXISTS (SELECT 1 FROM claim) AS claim_held,
+    EXISTS (SELECT 1 FROM patient) AS patient_found,
+    s.*,
+    COALESCE((
+        SELECT jsonb_agg(jsonb_build_object(
+            'id', id,
+            'image_path', image_path,
+            'created_at', created_at
+        ))
+        FROM new_images
+    ), '[]') AS detection_images
+FROM (SELECT 1) AS one
+LEFT JOIN new_session s ON true
+"""
+
+def _create_detection_session_sqlite(cur, patient_column, params):
+    """The _CREATE_SESSION_QUERY statement as separate statements, for SQLite."""
+    cur.execute(f"""
+        SELECT id FROM patients
+        WHERE {patient_column} = %(patient)s AND user_id = %(user_id)s
+        FOR UPDATE
+    """, params)
+    patient = cur.fetchone()
+    if params['idempotency_key'] is not None:
+        # The write lock taken above keeps a takeover from slipping in after this check
+        cur.execute("""
+            SELECT 1 FROM idempotency_keys
+            WHERE user_id = %(user_id)s AND idempotency_key = %(idempotency_key)s
+                AND claim_token = %(claim_token)s AND detection_session_id IS NULL
+        """, params)
+        if not cur.fetchone():
+            raise IdempotencyClaimLost(params['idempotency_key'])
+    if not patient:
+        raise PatientNotFound(params['patient'])
     
-    Args:
-        patient_id: UUID of the patient
-        user_id: UUID of the doctor
-        session_data: Dictionary containing session details
-            {
-                'detection_result': dict,
-                'diagnostic_result': str,
-                'follow_up_plan': str,
-                'detection_date': datetime,
-                'detection_images': list  # List of image paths
-            }
-    Returns:
-        Newly created detection session data if successful, None otherwise
-    """
-    conn = None
-    cur = None
-    try:
-        conn = psycopg2.connect(DATABASE_URL)
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-        
-        # Start transaction
-        conn.autocommit = False
-        
-        # Create detection session
-        query = """
+    cur.execute("""
         INSERT INTO detection_sessions (
             patient_id,
             user_id,
             detection_result,
+            detection_probabilities,
             diagnostic_result,
             follow_up_plan,
-            detection_date,
-            created_at,
-            updated_at
-        ) VALUES (%s, %s, %s, %s, %s, %s, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
-        RETURNING *
-        """
+            detection_date
+        ) VALUES (
+            %(patient_id)s, %(user_id)s, json(%(detection_result)s), %(detection_probabilities)s,
+            %(diagnostic_result)s, %(follow_up_plan)s, %(detection_date)s
+        )
+        RETURNING id
+    """, dict(params, patient_id=patient['id']))
+    session_id = cur.fetchone()['id']
+    cur.execute(_INSERT_IMAGES_SQLITE, (session_id, params['image_paths']))
+    images = cur.fetchall()
+    cur.execute("""
+        UPDATE idempotency_keys
+        SET detection_session_id = %s
+        WHERE user_id = %s AND idempotency_key = %s AND claim_token = %s
+    """, (session_id, params['user_id'], params['idempotency_key'], params['claim_token']))
+    
+    cur.execute("SELECT * FROM detection_sessions WHERE id = %s", (session_id,))
+    new_session = cur.fetchone()
+    new_session['detection_images'] = images
+    return new_session
+
+def _create_detection_session(patient_column, patient, user_id, session_data, idempotency_key, claim_token):
+    # Imported here so pages that never write sessions do not load pydantic
+    from src.utils.detection_result import DetectionResult
+    
+    conn = None
+    cur = None
+    try:
+        detection_result = DetectionResult.parse(session_data.get('detection_result'))
+        summary, probabilities = detection_result.to_columns() if detection_result else (None, None)
         
-        cur.execute(query, (
-            patient_id,
-            user_id,
-            session_data.get('detection_result'),
-            session_data.get('diagnostic_result'),
-            session_data.get('follow_up_plan'),
-            session_data.get('detection_date', datetime.now())
-        ))
+        conn = connect()
+        cur = conn.cursor(cursor_factory=TracedCursor)
         
-        new_session = cur.fetchone()
+        params = {
+            'patient': patient,
+            'user_id': user_id,
+            'detection_result': summary,
+            'detection_probabilities': probabilities,
+            'diagnostic_result': session_data.get('diagnostic_result'),
+            'follow_up_plan': session_data.get('follow_up_plan'),
+            'detection_date': session_data.get('detection_date', datetime.now()),
+            'image_paths': session_data.get('detection_images') or [],
+            'idempotency_key': idempotency_key,
+            'claim_token': claim_token,
+        }
+        if is_sqlite():
+            new_session = _create_detection_session_sqlite(cur, patient_column, params)
+        else:
+            cur.execute(_CREATE_SESSION_QUERY.format(patient_column=patient_column), params)
+            new_session = cur.fetchone()
+            if not new_session.pop('claim_held'):
+                raise IdempotencyClaimLost(idempotency_key)
+            if not new_session.pop('patient_found'):
+                raise PatientNotFound(patient)
+        conn.commit()
         
-        # If images are provided, add them to detection_images table
         if session_data.get('detection_images'):
-            images_query = """
-            INSERT INTO detection_images (
-                detection_session_id,
-                image_path,
-                created_at
-            ) VALUES (%s, %s, CURRENT_TIMESTAMP)
-            RETURNING id, image_path, created_at
-            """
-            
-            new_images = []
-            for image_path in session_data['detection_images']:
-                cur.execute(images_query, (new_session['id'], image_path))
-                new_images.append(cur.fetchone())
-            
-            new_session['detection_images'] = new_images
-        
-        # Commit transaction
-        conn.commit()
+            new_session['detection_images'] = parse_timestamps(new_session['detection_images'])
+        else:
+            del new_session['detection_images']
+        
+        _index_images(new_session.get('detection_images'))
+        _schedule_report(new_session['id'], user_id)
         
         return new_session
         
+    except IdempotencyClaimLost:
+        logger.warning(f"Idempotency-Key {idempotency_key} was taken over; no session created")
+        if conn:
+            conn.rollback()
+        raise
+    except PatientNotFound:
+        logger.warning(f"Patient {patient} not found; no session created")
+        if conn:
+            conn.rollback()
+        raise
     except Exception as e:
         logger.error(f"Error creating detection session: {e}")
         if conn:
@@ -189,6 +372,56 @@ def create_detection_session(patient_id, user_id, session_data):
         if conn:
             conn.close()
 
+@traced()
+def create_detection_session(patient_id, user_id, session_data, idempotency_key=None, claim_token=None):
+    """
+    Create a new detection session for a patient.
+    
+    Args:
+        patient_id: UUID of the patient
+        user_id: UUID of the doctor
+        session_data: Dictionary containing session details
+            {
+                'detection_result': DetectionResult, dict or JSON str,  # Probabilities are stored apart
+                'diagnostic_result': str,
+                'follow_up_plan': str,
+                'detection_date': datetime,
+                'detection_images': list  # List of image paths
+            }
+        idempotency_key (str): Claimed Idempotency-Key to complete in the same
+            transaction, so a retry can never create the session twice
+        claim_token (str): claim_token returned when the key was claimed
+    Returns:
+        Newly created detection session data if successful, None otherwise
+    Raises:
+        PatientNotFound: The patient does not belong to the doctor
+        IdempotencyClaimLost: The claim was taken over by a retry; nothing was written
+    """
+    return _create_detection_session("id", patient_id, user_id, session_data, idempotency_key, claim_token)
+
+@traced()
+def create_detection_session_for_patient(patient_code, user_id, session_data, idempotency_key=None,
+                                         claim_token=None):
+    """
+    Create a new detection session for a patient given by business identifier.
+    
+    Same as create_detection_session, without a separate patient lookup.
+    
+    Args:
+        patient_code: Business identifier of the patient (e.g. 'P-20250216-00001')
+        user_id: UUID of the doctor
+        session_data: Dictionary containing session details (see create_detection_session)
+        idempotency_key (str): Claimed Idempotency-Key to complete in the same transaction
+        claim_token (str): claim_token returned when the key was claimed
+    Returns:
+        Newly created detection session data if successful, None otherwise
+    Raises:
+        PatientNotFound: No patient with this identifier belongs to the doctor
+        IdempotencyClaimLost: The claim was taken over by a retry; nothing was written
+    """
+    return _create_detection_session("patient_id", patient_code, user_id, session_data, idempotency_key, claim_token)
+
+@traced()
 def delete_detection_session(detection_session_id, user_id):
     """
     Delete a detection session from the database.
@@ -203,16 +436,30 @@ def delete_detection_session(detection_session_id, user_id):
     conn = None
     cur = None
     try:
-        conn = psycopg2.connect(DATABASE_URL)
-        cur = conn.cursor(cursor_factory=RealDictCursor)
+        conn = connect()
+        cur = conn.cursor(cursor_factory=TracedCursor)
         
         query = """
         DELETE FROM detection_sessions 
         WHERE id = %s AND user_id = %s
+        RETURNING to_jsonb(detection_sessions) AS audit_before
         """
+        if is_sqlite():
+            # No row-to-JSON in SQLite; the returned row itself is the snapshot
+            query = query.replace("to_jsonb(detection_sessions) AS audit_before", "*")
         
         cur.execute(query, (detection_session_id, user_id))
+        deleted = cur.fetchone()
         conn.commit()
+        
+        if deleted and is_sqlite():
+            deleted = {'audit_before': deleted}
+        
+        if deleted:
+            record_change(user_id, "delete", "detection_session", detection_session_id,
+                          before=deleted['audit_before'])
+        from src.services.reports import discard_reports
+        discard_reports(detection_session_id)
         return True
         
     except Exception as e:
@@ -224,4 +471,239 @@ def delete_detection_session(detection_session_id, user_id):
         if cur:
             cur.close()
         if conn:
-            conn.close()
\ No newline at end of file
+            conn.close()
+
+@traced()
+def get_detection_sessions_page(patient_id, user_id, limit, offset=0):
+    """
+    Retrieve one page of a patient's detection sessions, newest first.
+    
+    Images and detection_result are not loaded; each row only says how many
+    images it has and whether a result exists, so they can be fetched on demand.
+    
+    Args:
+        patient_id: UUID of the patient
+        user_id: UUID of the requesting doctor
+        limit: Maximum number of sessions to return
+        offset: Number of sessions to skip
+    
+    Returns:
+        tuple: (list of sessions, total number of sessions for the patient)
+    """
+    conn = None
+    cur = None
+    try:
+        conn = connect()
+        cur = conn.cursor(cursor_factory=TracedCursor)
+        
+        query = """
+        SELECT 
+            s.id,
+            s.detection_date,
+            s.detection_result IS NOT NULL AS has_detection_result,
+            s.diagnostic_result,
+            s.follow_up_plan,
+            s.created_at,
+            s.updated_at,
+            (
+                SELECT count(*)
+                FROM detection_images i
+                WHERE i.detection_session_id = s.id
+            ) AS image_count,
+            count(*) OVER () AS total_count
+        FROM detection_sessions s
+        WHERE s.patient_id = %s AND s.user_id = %s
+        ORDER BY s.detection_date DESC
+        LIMIT %s OFFSET %s
+        """
+        
+        cur.execute(query, (patient_id, user_id, limit, offset))
+        sessions = cur.fetchall()
+        total = sessions[0]['total_count'] if sessions else 0
+        for session in sessions:
+            del session['total_count']
+            session['has_detection_result'] = bool(session['has_detection_result'])  # 0/1 on SQLite
+        if not sessions and offset:
+            # Past the last page; the window count is unavailable without rows
+            cur.execute(
+                "SELECT count(*) AS total FROM detection_sessions WHERE patient_id = %s AND user_id = %s",
+                (patient_id, user_id)
+            )
+            total = cur.fetchone()['total']
+        return sessions, total
+        
+    except Exception as e:
+        logger.error(f"Error fetching detection sessions page: {e}")
+        return [], 0
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            conn.close()
+
+@traced()
+def get_detection_session_images(detection_session_id, user_id):
+    """
+    Retrieve the images of one detection session.
+    
+    Args:
+        detection_session_id: UUID of the detection session
+        user_id: UUID of the requesting doctor
+    
+    Returns:
+        List of images, newest first
+    """
+    conn = None
+    cur = None
+    try:
+        conn = connect()
+        cur = conn.cursor(cursor_factory=TracedCursor)
+        
+        query = """
+        SELECT 
+            i.id,
+            i.image_path,
+            i.created_at
+        FROM detection_images i
+        JOIN detection_sessions s ON s.id = i.detection_session_id
+        WHERE i.detection_session_id = %s AND s.user_id = %s
+        ORDER BY i.created_at DESC
+        """
+        
+        cur.execute(query, (detection_session_id, user_id))
+        return cur.fetchall()
+        
+    except Exception as e:
+        logger.error(f"Error fetching detection session images: {e}")
+        return []
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            conn.close()
+
+@traced()
+def get_detection_result(detection_session_id, user_id):
+    """
+    Retrieve the detection result of one detection session.
+    
+    Args:
+        detection_session_id: UUID of the detection session
+        user_id: UUID of the requesting doctor
+    
+    Returns:
+        StoredDetectionResult, whose probabilities are decoded when first
+        accessed, or None if missing
+    """
+    from src.utils.detection_result import StoredDetectionResult
+    
+    conn = None
+    cur = None
+    try:
+        conn = connect()
+        cur = conn.cursor(cursor_factory=TracedCursor)
+        
+        query = """
+        SELECT detection_result, detection_probabilities
+        FROM detection_sessions
+        WHERE id = %s AND user_id = %s
+        """
+        
+        cur.execute(query, (detection_session_id, user_id))
+        row = cur.fetchone()
+        if not row:
+            return None
+        return StoredDetectionResult.from_columns(row['detection_result'], row['detection_probabilities'])
+        
+    except Exception as e:
+        logger.error(f"Error fetching detection result: {e}")
+        return None
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            conn.close()
+
+@traced()
+def get_detection_image(image_id, user_id):
+    """
+    Retrieve a single detection image owned by the doctor.
+    
+    Args:
+        image_id: UUID of the detection image
+        user_id: UUID of the requesting doctor
+    
+    Returns:
+        The image row (id, image_path, created_at), or None if not found
+    """
+    conn = None
+    cur = None
+    try:
+        conn = connect()
+        cur = conn.cursor(cursor_factory=TracedCursor)
+        
+        query = """
+        SELECT 
+            i.id,
+            i.image_path,
+            i.created_at
+        FROM detection_images i
+        JOIN detection_sessions s ON s.id = i.detection_session_id
+        WHERE i.id = %s AND s.user_id = %s
+        """
+        
+        cur.execute(query, (image_id, user_id))
+        return cur.fetchone()
+        
+    except Exception as e:
+        logger.error(f"Error fetching detection image: {e}")
+        return None
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            conn.close()
+
+@traced()
+def get_patient_detection_trend(patient_id, user_id):
+    """
+    Retrieve how a patient's detection results evolve across sessions.
+    
+    The series is precomputed by a trigger on detection_sessions, so this is
+    a single primary-key read regardless of the number of sessions.
+    
+    Args:
+        patient_id: UUID of the patient
+        user_id: UUID of the requesting doctor
+    
+    Returns:
+        List of points ordered by date:
+            {'session_id', 'date': datetime, 'detection': str, 'confidence': float}
+    """
+    conn = None
+    cur = None
+    try:
+        conn = connect()
+        cur = conn.cursor(cursor_factory=TracedCursor)
+        
+        query = """
+        SELECT points
+        FROM patient_detection_trends
+        WHERE patient_id = %s AND user_id = %s
+        """
+        
+        cur.execute(query, (patient_id, user_id))
+        row = cur.fetchone()
+        points = row['points'] if row else []
+        for point in points:
+            point['date'] = datetime.fromisoformat(point['date'])
+        return points
+        
+    except Exception as e:
+        logger.error(f"Error fetching detection trend: {e}")
+        return []
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            conn.close()
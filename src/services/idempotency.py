@@ -0,0 +1,227 @@
+import hashlib
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from loguru import logger
+
+from config import IDEMPOTENCY_LOCK_SECONDS, IDEMPOTENCY_TTL_HOURS
+from src.services.storage import connect, is_sqlite
+from src.utils.tracing import TracedCursor, traced
+
+
+class IdempotencyClaimLost(Exception):
+    """The request's claim on its key was taken over by a retry, so it must not write anything."""
+
+
+def request_fingerprint(*parts):
+    """
+    SHA-256 over the parts of a request that must match for a key to be replayed.
+
+    bytes parts (uploaded file contents) are hashed as they are, anything else
+    by its repr; every part is length-prefixed so parts cannot run together.
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        data = part if isinstance(part, bytes) else repr(part).encode()
+        digest.update(len(data).to_bytes(8, "big"))
+        digest.update(data)
+    return digest.hexdigest()
+
+
+@traced()
+def claim_idempotency_key(user_id, key, request_hash):
+    """
+    Claim an idempotency key for a new request.
+
+    A key is free when it was never used, has expired, or was claimed more
+    than IDEMPOTENCY_LOCK_SECONDS ago by a request that never finished.
+    Every claim gets a new claim_token; only the request holding the current
+    token can complete the key (see create_detection_session) or release it,
+    so a request whose stale claim was taken over can do neither.
+
+    Args:
+        user_id: UUID of the doctor
+        key (str): Client-supplied Idempotency-Key
+        request_hash (str): request_fingerprint of the request
+
+    Returns:
+        dict: {'claimed': True, 'claim_token': str} when the caller now owns the key, otherwise the
+        existing row ('request_hash', 'detection_session_id', ...) with 'claimed'
+        False; None on error
+    """
+    conn = None
+    cur = None
+    try:
+        conn = connect()
+        cur = conn.cursor(cursor_factory=TracedCursor)
+
+        query = """
+        INSERT INTO idempotency_keys (user_id, idempotency_key, request_hash, claim_token, claimed_at, expires_at)
+        VALUES (%(user_id)s, %(key)s, %(request_hash)s, %(claim_token)s, now(), now() + %(ttl_hours)s * interval '1 hour')
+        ON CONFLICT (user_id, idempotency_key) DO UPDATE
+        SET
+            request_hash = EXCLUDED.request_hash,
+            claim_token = EXCLUDED.claim_token,
+            detection_session_id = NULL,
+            claimed_at = EXCLUDED.claimed_at,
+            expires_at = EXCLUDED.expires_at
+        WHERE idempotency_keys.expires_at < now()
+            OR (idempotency_keys.detection_session_id IS NULL
+                AND idempotency_keys.claimed_at < now() - %(lock_seconds)s * interval '1 second')
+        RETURNING true AS claimed
+        """
+
+        params = {
+            "user_id": user_id,
+            "key": key,
+            "request_hash": request_hash,
+            "claim_token": str(uuid.uuid4()),
+            "ttl_hours": IDEMPOTENCY_TTL_HOURS,
+            "lock_seconds": IDEMPOTENCY_LOCK_SECONDS,
+        }
+        if is_sqlite():
+            # No interval arithmetic in SQLite; the times are computed here instead
+            query = """
+            INSERT INTO idempotency_keys (user_id, idempotency_key, request_hash, claim_token, claimed_at, expires_at)
+            VALUES (%(user_id)s, %(key)s, %(request_hash)s, %(claim_token)s, %(now)s, %(expires_at)s)
+            ON CONFLICT (user_id, idempotency_key) DO UPDATE
+            SET
+                request_hash = excluded.request_hash,
+                claim_token = excluded.claim_token,
+                detection_session_id = NULL,
+                claimed_at = excluded.claimed_at,
+                expires_at = excluded.expires_at
+            WHERE idempotency_keys.expires_at < %(now)s
+                OR (idempotency_keys.detection_session_id IS NULL
+                    AND idempotency_keys.claimed_at < %(stale_before)s)
+            RETURNING true AS claimed
+            """
+            now = datetime.now(timezone.utc)
+            params.update(
+                now=now,
+                expires_at=now + timedelta(hours=IDEMPOTENCY_TTL_HOURS),
+                stale_before=now - timedelta(seconds=IDEMPOTENCY_LOCK_SECONDS),
+            )
+        cur.execute(query, params)
+        claimed = cur.fetchone()
+        conn.commit()
+        if claimed:
+            return {"claimed": True, "claim_token": params["claim_token"]}
+
+        existing = get_idempotency_key(user_id, key)
+        return dict(existing, claimed=False) if existing else None
+
+    except Exception as e:
+        logger.error(f"Error claiming idempotency key: {e}")
+        if conn:
+            conn.rollback()
+        return None
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            conn.close()
+
+
+@traced()
+def get_idempotency_key(user_id, key):
+    """
+    Fetch the current state of an idempotency key.
+
+    Returns:
+        dict: 'request_hash', 'detection_session_id', 'claimed_at', 'expires_at', or None
+    """
+    conn = None
+    cur = None
+    try:
+        conn = connect()
+        cur = conn.cursor(cursor_factory=TracedCursor)
+
+        query = """
+        SELECT request_hash, detection_session_id, claimed_at, expires_at
+        FROM idempotency_keys
+        WHERE user_id = %s AND idempotency_key = %s
+        """
+
+        cur.execute(query, (user_id, key))
+        return cur.fetchone()
+
+    except Exception as e:
+        logger.error(f"Error fetching idempotency key: {e}")
+        return None
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            conn.close()
+
+
+@traced()
+def release_idempotency_key(user_id, key, claim_token):
+    """
+    Give up an unfinished claim so a retry can redo the request.
+
+    Only the claim identified by claim_token is released; if a retry has
+    taken the key over since, its claim is left alone.
+    """
+    conn = None
+    cur = None
+    try:
+        conn = connect()
+        cur = conn.cursor(cursor_factory=TracedCursor)
+
+        query = """
+        DELETE FROM idempotency_keys
+        WHERE user_id = %s AND idempotency_key = %s AND claim_token = %s AND detection_session_id IS NULL
+        """
+
+        cur.execute(query, (user_id, key, claim_token))
+        conn.commit()
+
+    except Exception as e:
+        logger.error(f"Error releasing idempotency key: {e}")
+        if conn:
+            conn.rollback()
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            conn.close()
+
+
+def purge_expired_idempotency_keys(batch_size=10000):
+    """
+    Delete expired keys in batches.
+
+    Returns:
+        int: Number of keys deleted
+    """
+    query = """
+    DELETE FROM idempotency_keys
+    WHERE ctid = ANY(ARRAY(
+        SELECT ctid FROM idempotency_keys WHERE expires_at < now() LIMIT %s
+    ))
+    """
+    params = (batch_size,)
+    if is_sqlite():
+        query = """
+        DELETE FROM idempotency_keys
+        WHERE rowid IN (
+            SELECT rowid FROM idempotency_keys WHERE expires_at < %s LIMIT %s
+        )
+        """
+        params = (datetime.now(timezone.utc), batch_size)
+
+    deleted = 0
+    conn = connect()
+    try:
+        while True:
+            with conn.cursor() as cur:
+                cur.execute(query, params)
+                count = cur.rowcount
+            conn.commit()
+            deleted += count
+            if count < batch_size:
+                return deleted
+    finally:
+        conn.close()
@@ -0,0 +1,185 @@
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+
+import psycopg2
+from loguru import logger
+from psycopg2.extras import RealDictCursor, execute_values
+
+from config import DATABASE_URL, IMAGE_COLD_DIR, IMAGE_COLD_QUALITY, IMAGE_TIER_AFTER_DAYS
+from src.utils.tracing import TracedCursor
+
+
+def cold_image_path(image_id, created_at):
+    """Cold storage location of an image, grouped by month so directories stay small."""
+    return os.path.join(IMAGE_COLD_DIR, created_at.strftime("%Y"), created_at.strftime("%m"), f"{image_id}.webp")
+
+
+def iter_tier_candidates(cutoff, limit=None, batch_size=1000):
+    """
+    Stream hot image files whose every referencing row is older than cutoff.
+
+    One file can back several detection_images rows (uploads with the same
+    name), so files are selected per path: a file still referenced by a
+    recent row stays hot.
+
+    Yields:
+        dict: {'image_path', 'image_id', 'created_at'} with the newest row's id and date
+    """
+    conn = psycopg2.connect(DATABASE_URL)
+    try:
+        with conn.cursor(name="tier_candidates", cursor_factory=RealDictCursor) as cur:
+            cur.itersize = batch_size
+            cur.execute("""
+                SELECT
+                    image_path,
+                    (array_agg(id ORDER BY created_at DESC))[1] AS image_id,
+                    max(created_at) AS created_at
+                FROM detection_images
+                WHERE left(image_path, length(%(cold_prefix)s)) <> %(cold_prefix)s
+                GROUP BY image_path
+                HAVING max(created_at) < %(cutoff)s
+                ORDER BY max(created_at)
+                LIMIT %(limit)s
+            """, {"cold_prefix": os.path.normpath(IMAGE_COLD_DIR) + os.sep, "cutoff": cutoff, "limit": limit})
+            for row in cur:
+                yield dict(row)
+    finally:
+        conn.close()
+
+
+def recompress(args):
+    """
+    Write a WebP copy of a hot image into cold storage.
+
+    Runs in a worker process. The copy is written under a temporary name and
+    renamed, so a crash never leaves a truncated cold file behind.
+
+    Returns:
+        tuple: (source path, cold path, source bytes, cold bytes), or (source path, None, error) on failure
+    """
+    source_path, target_path, quality = args
+    from PIL import Image
+
+    try:
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        with Image.open(source_path) as img:
+            if img.mode not in ("RGB", "RGBA"):
+                img = img.convert("RGB")
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target_path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                img.save(f, format="WEBP", quality=quality, method=6)
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, target_path)
+        return source_path, target_path, os.path.getsize(source_path), os.path.getsize(target_path)
+    except Exception as e:
+        return source_path, None, str(e)
+
+
+def _repoint_images(moves):
+    """
+    Point detection_images rows at their cold copies.
+
+    Args:
+        moves: List of (hot path, cold path)
+
+    Returns:
+        int: Number of rows updated
+    """
+    conn = None
+    cur = None
+    try:
+        conn = psycopg2.connect(DATABASE_URL)
+        cur = conn.cursor(cursor_factory=TracedCursor)
+        execute_values(cur, """
+            UPDATE detection_images AS i
+            SET image_path = m.cold_path
+            FROM (VALUES %s) AS m (hot_path, cold_path)
+            WHERE i.image_path = m.hot_path
+        """, moves, page_size=len(moves))
+        updated = cur.rowcount
+        conn.commit()
+        return updated
+    except Exception as e:
+        logger.error(f"Error repointing tiered images: {e}")
+        if conn:
+            conn.rollback()
+        return None
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            conn.close()
+
+
+def tier_old_images(older_than_days=IMAGE_TIER_AFTER_DAYS, quality=IMAGE_COLD_QUALITY,
+                    workers=None, batch_size=200, limit=None, dry_run=False):
+    """
+    Move images older than the cutoff to cold storage as WebP.
+
+    Files are recompressed in worker processes; each batch is repointed in
+    one transaction and the hot originals are deleted only after it commits.
+    A crash in between leaves at most an unreferenced copy, never a row
+    pointing at a missing file.
+
+    Args:
+        older_than_days (int): Age after which images are tiered
+        quality (int): WebP quality
+        workers (int): Worker processes (default: CPU count)
+        batch_size (int): Files repointed per transaction
+        limit (int): Maximum number of files to tier in this run
+        dry_run (bool): Only report candidates
+
+    Returns:
+        dict: files, rows, bytes_before, bytes_after, failed
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(days=older_than_days)
+    stats = {"files": 0, "rows": 0, "bytes_before": 0, "bytes_after": 0, "failed": 0}
+    candidates = iter_tier_candidates(cutoff, limit)
+
+    if dry_run:
+        for candidate in candidates:
+            stats["files"] += 1
+            stats["bytes_before"] += os.path.getsize(candidate['image_path']) if os.path.exists(candidate['image_path']) else 0
+        return stats
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Executor.map submits everything at once, so feed it one batch at a time
+        while True:
+            chunk = list(islice(candidates, batch_size))
+            if not chunk:
+                break
+            jobs = [(c['image_path'], cold_image_path(c['image_id'], c['created_at']), quality) for c in chunk]
+            batch = []
+            for result in pool.map(recompress, jobs, chunksize=8):
+                if result[1] is None:
+                    logger.warning(f"Error recompressing {result[0]}: {result[2]}")
+                    stats["failed"] += 1
+                else:
+                    batch.append(result)
+            if batch:
+                _commit_batch(batch, stats)
+    return stats
+
+
+def _commit_batch(batch, stats):
+    updated = _repoint_images([(source, target) for source, target, _, _ in batch])
+    if updated is None:
+        # Rows still point at the hot files; drop the cold copies so nothing dangles
+        for _, target, _, _ in batch:
+            os.remove(target)
+        stats["failed"] += len(batch)
+        return
+
+    for source, _, before, after in batch:
+        try:
+            os.remove(source)
+        except FileNotFoundError:
+            pass
+        stats["bytes_before"] += before
+        stats["bytes_after"] += after
+    stats["files"] += len(batch)
+    stats["rows"] += updated
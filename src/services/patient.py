@@ -1,9 +1,11 @@
-import psycopg2
-from psycopg2.extras import RealDictCursor
 from loguru import logger
 
-from config import DATABASE_URL
+from src.services.audit import record_change
+from src.services.storage import connect, is_sqlite
+from src.utils.common import parse_timestamps
+from src.utils.tracing import TracedCursor, traced
 
+@traced()
 def get_all_patients(user_id):
     """
     Retrieve all patients for a specific doctor from the database.
@@ -16,8 +18,8 @@ def get_all_patients(user_id):
     conn = None
     cur = None
     try:
-        conn = psycopg2.connect(DATABASE_URL)
-        cur = conn.cursor(cursor_factory=RealDictCursor)
+        conn = connect()
+        cur = conn.cursor(cursor_factory=TracedCursor)
         
         query = """
             SELECT 
@@ -47,6 +49,7 @@ def get_all_patients(user_id):
         if conn:
             conn.close()
 
+@traced()
 def create_patient(patient_data, user_id):
     """
     Create a new patient record in the database.
@@ -58,8 +61,8 @@ def create_patient(patient_data, user_id):
     conn = None
     cur = None
     try:
-        conn = psycopg2.connect(DATABASE_URL)
-        cur = conn.cursor(cursor_factory=RealDictCursor)
+        conn = connect()
+        cur = conn.cursor(cursor_factory=TracedCursor)
         
         query = """
             INSERT INTO patients (
@@ -67,8 +70,10 @@ def create_patient(patient_data, user_id):
                 phone, address, past_medical_history, present_illness_history
             ) VALUES (
                 %s, %s, %s, %s, %s, %s, %s, %s, %s
-            ) RETURNING *
+            )
         """
+        if not is_sqlite():
+            query += " RETURNING *"
         logger.debug(f"Creating patient with data: {patient_data}")
         
         cur.execute(query, (
@@ -82,6 +87,9 @@ def create_patient(patient_data, user_id):
             patient_data.get('past_medical_history', ''),
             patient_data.get('present_illness_history', '')
         ))
+        if is_sqlite():
+            # RETURNING would not include the age set by the insert trigger
+            cur.execute("SELECT * FROM patients WHERE patient_id = %s", (patient_data['patient_id'],))
         
         new_patient = cur.fetchone()
         conn.commit()
@@ -98,6 +106,7 @@ def create_patient(patient_data, user_id):
         if conn:
             conn.close()
 
+@traced()
 def delete_patient(patient_id, user_id):
     """
     Delete a patient record from the database.
@@ -112,16 +121,50 @@ def delete_patient(patient_id, user_id):
     conn = None
     cur = None
     try:
-        conn = psycopg2.connect(DATABASE_URL)
-        cur = conn.cursor(cursor_factory=RealDictCursor)
+        conn = connect()
+        cur = conn.cursor(cursor_factory=TracedCursor)
         
-        query = """
-        DELETE FROM patients 
-        WHERE patient_id = %s AND user_id = %s
-        """
-        
-        cur.execute(query, (patient_id, user_id))
+        if is_sqlite():
+            # The cascade returns nothing, so the sessions are read (under the write lock) first
+            cur.execute("""
+            SELECT s.id
+            FROM detection_sessions s
+            JOIN patients p ON p.id = s.patient_id
+            WHERE p.patient_id = %s AND p.user_id = %s
+            FOR UPDATE
+            """, (patient_id, user_id))
+            session_ids = [row['id'] for row in cur.fetchall()]
+            # No row-to-JSON in SQLite; the returned row itself is the snapshot
+            cur.execute("""
+            DELETE FROM patients 
+            WHERE patient_id = %s AND user_id = %s
+            RETURNING *
+            """, (patient_id, user_id))
+            deleted = cur.fetchone()
+            if deleted:
+                deleted = {'audit_before': deleted, 'session_ids': session_ids}
+        else:
+            # The sessions CTE sees the rows before the cascade removes them
+            cur.execute("""
+            WITH sessions AS (
+                SELECT s.id
+                FROM detection_sessions s
+                JOIN patients p ON p.id = s.patient_id
+                WHERE p.patient_id = %(patient_id)s AND p.user_id = %(user_id)s
+            )
+            DELETE FROM patients 
+            WHERE patient_id = %(patient_id)s AND user_id = %(user_id)s
+            RETURNING to_jsonb(patients) AS audit_before, ARRAY(SELECT id::text FROM sessions) AS session_ids
+            """, {"patient_id": patient_id, "user_id": user_id})
+            deleted = cur.fetchone()
         conn.commit()
+        
+        if deleted:
+            record_change(user_id, "delete", "patient", deleted['audit_before']['id'], before=deleted['audit_before'])
+            # Their sessions went with the patient (ON DELETE CASCADE), so do their reports
+            from src.services.reports import discard_reports
+            for session_id in deleted['session_ids']:
+                discard_reports(session_id)
         return True
         
     except Exception as e:
@@ -135,6 +178,58 @@ def delete_patient(patient_id, user_id):
         if conn:
             conn.close()
 
+_PATIENT_DETAILS_QUERY = """
+SELECT 
+    p.id,
+    p.patient_id,
+    p.name,
+    p.sex,
+    p.age,
+    p.date_of_birth AS dob,
+    p.phone,
+    p.address,
+    p.past_medical_history,
+    p.present_illness_history,
+    p.created_at,
+    p.updated_at
+FROM patients p
+WHERE p.id = %s AND p.user_id = %s
+"""
+
+def _fetch_detection_sessions(cur, patient_uuid, user_id):
+    """Fetch a patient's detection sessions, newest first, each with its detection images."""
+    sessions_query = """
+    SELECT 
+        id,
+        detection_date,
+        detection_result,
+        diagnostic_result,
+        follow_up_plan,
+        created_at,
+        updated_at
+    FROM detection_sessions
+    WHERE patient_id = %s AND user_id = %s
+    ORDER BY detection_date DESC
+    """
+    cur.execute(sessions_query, (patient_uuid, user_id))
+    sessions = cur.fetchall()
+    
+    # Fetch detection images for each session
+    for session in sessions:
+        images_query = """
+        SELECT 
+            id,
+            image_path,
+            created_at
+        FROM detection_images
+        WHERE detection_session_id = %s
+        """
+        cur.execute(images_query, (session['id'],))
+        session['detection_images'] = cur.fetchall()
+    
+    return sessions
+
+@traced()
 def get_patient_full_details(patient_id, user_id):
     """
     Retrieve comprehensive patient information including:
@@ -149,8 +244,8 @@ def get_patient_full_details(patient_id, user_id):
     conn = None
     cur = None
     try:
-        conn = psycopg2.connect(DATABASE_URL)
-        cur = conn.cursor(cursor_factory=RealDictCursor)
+        conn = connect()
+        cur = conn.cursor(cursor_factory=TracedCursor)
         
         # First, get the patient's UUID using the business identifier
         id_query = """
@@ -167,6 +262,39 @@ def get_patient_full_details(patient_id, user_id):
         patient_uuid = patient_uuid_record['id']
         
         # Fetch patient basic details
+        cur.execute(_PATIENT_DETAILS_QUERY, (patient_uuid, user_id))
+        patient_details = cur.fetchone()
+        
+        if not patient_details:
+            return None
+        
+        patient_details['detection_sessions'] = _fetch_detection_sessions(cur, patient_uuid, user_id)
+        return patient_details
+    
+    except Exception as e:
+        logger.error(f"Error fetching patient full details: {e}")
+        return None
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            conn.close()
+
+@traced()
+def get_patient_basic_details(patient_id, user_id):
+    """
+    Retrieve only the patient's own record, without sessions or images.
+    
+    Args:
+        patient_id: Business identifier of the patient (e.g., 'PT250216513')
+        user_id: UUID of the requesting doctor
+    """
+    conn = None
+    cur = None
+    try:
+        conn = connect()
+        cur = conn.cursor(cursor_factory=TracedCursor)
+        
         query = """
         SELECT 
             p.id,
@@ -182,48 +310,13 @@ def get_patient_full_details(patient_id, user_id):
             p.created_at,
             p.updated_at
         FROM patients p
-        WHERE p.id = %s AND p.user_id = %s
-        """
-        cur.execute(query, (patient_uuid, user_id))
-        patient_details = cur.fetchone()
-        
-        if not patient_details:
-            return None
-        
-        # Fetch detection sessions using patient UUID
-        sessions_query = """
-        SELECT 
-            id,
-            detection_date,
-            detection_result,
-            diagnostic_result,
-            follow_up_plan,
-            created_at,
-            updated_at
-        FROM detection_sessions
-        WHERE patient_id = %s AND user_id = %s
-        ORDER BY detection_date DESC
+        WHERE p.patient_id = %s AND p.user_id = %s
         """
-        cur.execute(sessions_query, (patient_uuid, user_id))
-        patient_details['detection_sessions'] = cur.fetchall()
-        
-        # Fetch detection images for each session
-        for session in patient_details['detection_sessions']:
-            images_query = """
-            SELECT 
-                id,
-                image_path,
-                created_at
-            FROM detection_images
-            WHERE detection_session_id = %s
-            """
-            cur.execute(images_query, (session['id'],))
-            session['detection_images'] = cur.fetchall()
-        
-        return patient_details
+        cur.execute(query, (patient_id, user_id))
+        return cur.fetchone()
     
     except Exception as e:
-        logger.error(f"Error fetching patient full details: {e}")
+        logger.error(f"Error fetching patient basic details: {e}")
         return None
     finally:
         if cur:
@@ -231,23 +324,65 @@ def get_patient_full_details(patient_id, user_id):
         if conn:
             conn.close()
 
-def update_patient_details(patient_id, user_id, patient_data):
+@traced()
+def get_patients_by_patient_ids(patient_ids, user_id):
     """
-    Update patient details.
+    Resolve many patient business identifiers in one query.
     
     Args:
-        patient_id: UUID of the patient
-        user_id: UUID of the doctor updating the patient
-        patient_data: Dictionary containing patient details
+        patient_ids: List of business identifiers (e.g. decoded from QR codes)
+        user_id: UUID of the requesting doctor
+    
+    Returns:
+        List of matching patients with their basic information
     """
+    if not patient_ids:
+        return []
+    
     conn = None
     cur = None
     try:
-        conn = psycopg2.connect(DATABASE_URL)
-        cur = conn.cursor(cursor_factory=RealDictCursor)
+        conn = connect()
+        cur = conn.cursor(cursor_factory=TracedCursor)
         
-        # Update patient details
         query = """
+        SELECT 
+            id,
+            patient_id,
+            name,
+            sex,
+            age
+        FROM patients
+        WHERE patient_id = ANY(%s) AND user_id = %s
+        """
+        if is_sqlite():
+            # The list is bound as one JSON array parameter
+            query = query.replace("= ANY(%s)", "IN (SELECT value FROM json_each(%s))")
+        cur.execute(query, (list(patient_ids), user_id))
+        return cur.fetchall()
+    
+    except Exception as e:
+        logger.error(f"Error fetching patients by patient ids: {e}")
+        return []
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            conn.close()
+
+def _update_patient_details_sqlite(cur, patient_id, user_id, values):
+    """
+    The update_patient_details statement as separate statements, for SQLite.
+    
+    SQLite has no data-modifying CTEs; its statements are in-process calls
+    rather than round trips, so splitting them costs next to nothing.
+    """
+    cur.execute("SELECT * FROM patients WHERE id = %s AND user_id = %s FOR UPDATE", (patient_id, user_id))
+    audit_before = cur.fetchone()
+    if not audit_before:
+        return None
+    
+    cur.execute("""
         UPDATE patients
         SET 
             name = %s,
@@ -256,13 +391,102 @@ def update_patient_details(patient_id, user_id, patient_data):
             phone = %s,
             address = %s,
             past_medical_history = %s,
-            present_illness_history = %s,
-            updated_at = CURRENT_TIMESTAMP
-        WHERE id = %s AND user_id = %s
-        RETURNING *
+            present_illness_history = %s
+        WHERE id = %s
+    """, (*values, patient_id))
+    
+    cur.execute("SELECT * FROM patients WHERE id = %s", (patient_id,))
+    audit_after = cur.fetchone()
+    cur.execute(_PATIENT_DETAILS_QUERY, (patient_id, user_id))
+    updated_patient = cur.fetchone()
+    updated_patient['audit_before'] = audit_before
+    updated_patient['audit_after'] = audit_after
+    updated_patient['detection_sessions'] = _fetch_detection_sessions(cur, patient_id, user_id)
+    return updated_patient
+
+@traced()
+def update_patient_details(patient_id, user_id, patient_data):
+    """
+    Update patient details.
+    
+    Args:
+        patient_id: UUID of the patient
+        user_id: UUID of the doctor updating the patient
+        patient_data: Dictionary containing patient details
+
+    Returns:
+        dict: The updated patient in the get_patient_full_details shape, or None
+    """
+    conn = None
+    cur = None
+    try:
+        conn = connect()
+        cur = conn.cursor(cursor_factory=TracedCursor)
+        
+        # Update the patient and return it in the get_patient_full_details shape in one
+        # round trip; the locked pre-update row is returned for the audit log
+        query = """
+        WITH previous AS (
+            SELECT * FROM patients
+            WHERE id = %s AND user_id = %s
+            FOR UPDATE
+        ),
+        updated AS (
+            UPDATE patients p
+            SET 
+                name = %s,
+                sex = %s,
+                date_of_birth = %s,
+                phone = %s,
+                address = %s,
+                past_medical_history = %s,
+                present_illness_history = %s,
+                updated_at = CURRENT_TIMESTAMP
+            FROM previous
+            WHERE p.id = previous.id
+            RETURNING p.*, to_jsonb(previous) AS audit_before, to_jsonb(p) AS audit_after
+        )
+        SELECT 
+            u.id,
+            u.patient_id,
+            u.name,
+            u.sex,
+            u.age,
+            u.date_of_birth AS dob,
+            u.phone,
+            u.address,
+            u.past_medical_history,
+            u.present_illness_history,
+            u.created_at,
+            u.updated_at,
+            u.audit_before,
+            u.audit_after,
+            COALESCE((
+                SELECT json_agg(json_build_object(
+                    'id', s.id,
+                    'detection_date', s.detection_date,
+                    'detection_result', s.detection_result,
+                    'diagnostic_result', s.diagnostic_result,
+                    'follow_up_plan', s.follow_up_plan,
+                    'created_at', s.created_at,
+                    'updated_at', s.updated_at,
+                    'detection_images', COALESCE((
+                        SELECT json_agg(json_build_object(
+                            'id', i.id,
+                            'image_path', i.image_path,
+                            'created_at', i.created_at
+                        ) ORDER BY i.created_at DESC)
+                        FROM detection_images i
+                        WHERE i.detection_session_id = s.id
+                    ), '[]')
+                ) ORDER BY s.detection_date DESC)
+                FROM detection_sessions s
+                WHERE s.patient_id = u.id AND s.user_id = u.user_id
+            ), '[]') AS detection_sessions
+        FROM updated u
         """
         
-        cur.execute(query, (
+        values = (
             patient_data['name'],
             patient_data['sex'],
             patient_data['date_of_birth'],
@@ -270,16 +494,24 @@ def update_patient_details(patient_id, user_id, patient_data):
             patient_data.get('address', ''),
             patient_data.get('past_medical_history', ''),
             patient_data.get('present_illness_history', ''),
-            patient_id,
-            user_id
-        ))
-        
-        updated_patient = cur.fetchone()
+        )
+        if is_sqlite():
+            updated_patient = _update_patient_details_sqlite(cur, patient_id, user_id, values)
+        else:
+            cur.execute(query, (patient_id, user_id, *values))
+            updated_patient = cur.fetchone()
         conn.commit()
         
-        if updated_patient:
-            return get_patient_full_details(updated_patient['patient_id'], user_id)
-        return None
+        if not updated_patient:
+            return None
+        
+        record_change(
+            user_id, "update", "patient", updated_patient['id'],
+            before=updated_patient.pop('audit_before'), after=updated_patient.pop('audit_after'),
+        )
+        for session in parse_timestamps(updated_patient['detection_sessions'], ("detection_date", "created_at", "updated_at")):
+            parse_timestamps(session['detection_images'])
+        return updated_patient
         
     except Exception as e:
         logger.error(f"Error updating patient details: {e}")
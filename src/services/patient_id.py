@@ -0,0 +1,126 @@
+import os
+import threading
+
+from src.services.storage import connect, is_sqlite
+from src.utils.common import format_patient_id
+from src.utils.tracing import TracedCursor, traced
+
+_lock = threading.Lock()
+_next = 0
+_limit = 0  # Exclusive end of the block reserved by this process
+
+
+def _reset_after_fork():
+    # A forked child must never reuse the parent's reserved block
+    global _lock, _next, _limit
+    _lock = threading.Lock()
+    _next = _limit = 0
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _reserve_blocks(count):
+    """
+    Reserve `count` blocks of numbers from patient_id_seq.
+
+    Every nextval of the sequence advances by its INCREMENT BY, so the value
+    returned starts a block of that many numbers owned by the caller alone.
+
+    Returns:
+        list: (start, end) half-open ranges
+    """
+    conn = None
+    cur = None
+    try:
+        conn = connect()
+        cur = conn.cursor(cursor_factory=TracedCursor)
+        if is_sqlite():
+            # The sequences table stands in for the sequence; the update takes the write lock
+            cur.execute("""
+            UPDATE sequences SET next_value = next_value + %s * increment_by
+            WHERE name = 'patient_id_seq'
+            RETURNING next_value, increment_by AS size
+            """, (count,))
+            row = cur.fetchone()
+            if not row:
+                raise RuntimeError("patient_id_seq is missing from the sequences table")
+            first = row['next_value'] - count * row['size']
+            blocks = [(start, start + row['size']) for start in range(first, row['next_value'], row['size'])]
+        else:
+            # regclass resolves the sequence through search_path exactly as nextval does
+            query = """
+            SELECT nextval('patient_id_seq') AS start, s.seqincrement AS size
+            FROM generate_series(1, %s), pg_sequence s
+            WHERE s.seqrelid = 'patient_id_seq'::regclass
+            """
+            cur.execute(query, (count,))
+            blocks = [(row['start'], row['start'] + row['size']) for row in cur.fetchall()]
+            if len(blocks) != count:
+                raise RuntimeError(f"Reserved {len(blocks)} of {count} patient_id_seq blocks")
+        conn.commit()
+        return blocks
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            conn.close()
+
+
+@traced()
+def allocate_patient_id():
+    """
+    Allocate a unique patient number in format P-YYYYMMDD-XXXXX.
+
+    Numbers come from a block pre-reserved by this process, so the database is
+    only contacted once per block and concurrent creations never collide.
+    The sequence never repeats a number, so neither do identifiers; the
+    suffix grows past 5 digits once 100,000 numbers have been reserved in
+    total (blocks a process did not use up are skipped, not reused).
+
+    Returns:
+        str: The new patient number
+    """
+    global _next, _limit
+    with _lock:
+        if _next >= _limit:
+            _next, _limit = _reserve_blocks(1)[0]
+        number = _next
+        _next += 1
+    return format_patient_id(number)
+
+
+@traced()
+def allocate_patient_ids(count):
+    """
+    Allocate many unique patient numbers at once, e.g. for bulk imports.
+
+    Args:
+        count (int): Number of identifiers needed
+
+    Returns:
+        list: The new patient numbers
+    """
+    global _next, _limit
+    numbers = []
+    with _lock:
+        take = min(count, _limit - _next)
+        numbers.extend(range(_next, _next + take))
+        _next += take
+
+    missing = count - len(numbers)
+    if missing:
+        blocks = _reserve_blocks(1)
+        block_size = blocks[0][1] - blocks[0][0]
+        if missing > block_size:
+            blocks += _reserve_blocks(-(-missing // block_size) - 1)
+        for start, end in blocks:
+            numbers.extend(range(start, end))
+        with _lock:
+            # Keep the unused tail of the last block for later single allocations
+            leftover = numbers[count:]
+            if leftover and _next >= _limit:
+                _next, _limit = leftover[0], leftover[-1] + 1
+        numbers = numbers[:count]
+
+    return [format_patient_id(number) for number in numbers]
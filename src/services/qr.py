@@ -0,0 +1,117 @@
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from loguru import logger
+
+from config import QR_CACHE_SIZE, QR_CODE_DIR
+from src.utils.qr_code import generate_qr_png
+from src.utils.tracing import span
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+# Background generation for newly created patients; kept small so it never
+# competes with request handling for CPU
+_background = ThreadPoolExecutor(max_workers=2, thread_name_prefix="qr-generate")
+
+
+def qr_code_path(patient_id):
+    """Path of the QR code PNG for a patient business identifier."""
+    return os.path.join(QR_CODE_DIR, f"{patient_id}.png")
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _remember(patient_id, png):
+    with _cache_lock:
+        _cache[patient_id] = png
+        _cache.move_to_end(patient_id)
+        while len(_cache) > QR_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def get_qr_png(patient_id):
+    """
+    Get the QR code PNG of a patient, generating it on first view.
+
+    Lookup order: in-memory LRU cache, the PNG on disk, then a fresh render
+    that is written to disk for the next process.
+
+    Args:
+        patient_id: Business identifier of the patient
+
+    Returns:
+        bytes: The PNG image
+    """
+    with _cache_lock:
+        png = _cache.get(patient_id)
+        if png is not None:
+            _cache.move_to_end(patient_id)
+            return png
+
+    path = qr_code_path(patient_id)
+    try:
+        with span("file.read", kind="qr_code", path=path):
+            with open(path, "rb") as f:
+                png = f.read()
+    except FileNotFoundError:
+        with span("qr.generate", patient_id=patient_id):
+            png = generate_qr_png(patient_id)
+        try:
+            _write_atomic(path, png)
+        except OSError as e:
+            logger.warning(f"Error saving QR code {path}: {e}")
+
+    _remember(patient_id, png)
+    return png
+
+
+def schedule_qr(patient_id):
+    """Render and store a patient's QR code in the background, without blocking the caller."""
+    def log_failure(future):
+        if future.exception():
+            logger.error(f"Error generating QR code for {patient_id}: {future.exception()}")
+
+    future = _background.submit(get_qr_png, patient_id)
+    future.add_done_callback(log_failure)
+    return future
+
+
+def _write_qr_file(args):
+    patient_id, overwrite = args
+    path = qr_code_path(patient_id)
+    if not overwrite and os.path.exists(path):
+        return 0
+    _write_atomic(path, generate_qr_png(patient_id))
+    return 1
+
+
+def generate_qr_codes(patient_ids, workers=None, overwrite=False, chunksize=64):
+    """
+    Generate QR code PNGs for many patients in parallel worker processes.
+
+    Args:
+        patient_ids: Iterable of patient business identifiers
+        workers (int): Worker processes (default: CPU count)
+        overwrite (bool): Re-render codes that already exist on disk
+        chunksize (int): Patients handed to a worker at a time
+
+    Returns:
+        int: Number of PNGs written
+    """
+    os.makedirs(QR_CODE_DIR, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return sum(pool.map(
+            _write_qr_file,
+            ((patient_id, overwrite) for patient_id in patient_ids),
+            chunksize=chunksize,
+        ))
@@ -0,0 +1,227 @@
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from loguru import logger
+
+from config import REPORT_DIR, REPORT_WORKERS
+from src.services.storage import connect, is_sqlite
+from src.utils.detection_result import decode_probabilities
+from src.utils.image_files import resolve_image_path
+from src.utils.pdf_report import render_session_report
+from src.utils.tracing import TracedCursor, span, traced
+
+# Pillow releases the GIL while decoding, resizing and encoding images, so
+# threads render in parallel without the start-up cost of worker processes
+_pool = ThreadPoolExecutor(max_workers=REPORT_WORKERS, thread_name_prefix="report-render")
+_pending = {}  # Report path -> Future, so a report is never rendered twice at once
+_pending_lock = threading.Lock()
+
+
+def report_path(session_id, updated_at):
+    """
+    Cache location of a session report.
+
+    The path includes the report's updated_at (the later of the session's
+    and the patient's), so editing either makes the old report unreachable;
+    superseded files are removed after the next render.
+    """
+    return os.path.join(REPORT_DIR, str(session_id), f"{updated_at.timestamp() * 1e6:.0f}.pdf")
+
+
+@traced()
+def get_report_data(session_id, user_id):
+    """
+    Fetch everything a session report shows in one query.
+
+    Returns:
+        dict: Session and patient fields plus 'image_paths', or None if not found;
+        'updated_at' is the later of the session's and the patient's, as the
+        report shows both
+    """
+    conn = None
+    cur = None
+    try:
+        conn = connect()
+        cur = conn.cursor(cursor_factory=TracedCursor)
+
+        if is_sqlite():
+            # Timestamps are stored in one fixed-width UTC format, so max() compares them correctly
+            updated_at = 'max(s.updated_at, p.updated_at) AS "updated_at [TIMESTAMPTZ]"'
+            # SQLite has no arrays; the paths are aggregated to a JSON array instead
+            image_paths = """(
+                SELECT json_group_array(image_path) FROM (
+                    SELECT i.image_path
+                    FROM detection_images i
+                    WHERE i.detection_session_id = s.id
+                    ORDER BY i.created_at DESC
+                )
+            ) AS "image_paths [JSONB]"
+            """
+        else:
+            updated_at = "GREATEST(s.updated_at, p.updated_at) AS updated_at"
+            image_paths = """ARRAY(
+                SELECT i.image_path
+                FROM detection_images i
+                WHERE i.detection_session_id = s.id
+                ORDER BY i.created_at DESC
+            ) AS image_paths"""
+
+        query = f"""
+        SELECT
+            s.id,
+            s.detection_date,
+            s.detection_result,
+            s.detection_probabilities,
+            s.diagnostic_result,
+            s.follow_up_plan,
+            {updated_at},
+            p.patient_id,
+            p.name,
+            p.sex,
+            p.age,
+            p.date_of_birth,
+            {image_paths}
+        FROM detection_sessions s
+        JOIN patients p ON p.id = s.patient_id
+        WHERE s.id = %s AND s.user_id = %s
+        """
+
+        cur.execute(query, (session_id, user_id))
+        return cur.fetchone()
+
+    except Exception as e:
+        logger.error(f"Error fetching report data: {e}")
+        return None
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            conn.close()
+
+
+def _session_exists(session_id):
+    """Whether a detection session still exists; errors count as yes, so a report is never lost to them."""
+    conn = None
+    cur = None
+    try:
+        conn = connect()
+        cur = conn.cursor(cursor_factory=TracedCursor)
+        cur.execute("SELECT 1 FROM detection_sessions WHERE id = %s", (session_id,))
+        return cur.fetchone() is not None
+    except Exception as e:
+        logger.error(f"Error checking detection session: {e}")
+        return True
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            conn.close()
+
+
+def _render(data, path):
+    """
+    Render a report to path (atomically) and drop the session's superseded reports.
+
+    Returns:
+        str: path, or None if the session was deleted while rendering
+    """
+    with span("report.render", session_id=str(data['id']), images=len(data['image_paths'])):
+        data = dict(data, image_paths=[resolve_image_path(p) for p in data['image_paths']])
+        # Decoded only here, so checking for a cached report never touches the vector
+        if data['detection_probabilities'] is not None and data['detection_result']:
+            data['detection_result'] = dict(
+                data['detection_result'], probabilities=decode_probabilities(data['detection_probabilities'])
+            )
+        pdf = render_session_report(data)
+
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(pdf)
+    # discard_reports may have run during the render; publishing now would leave a report behind
+    if not _session_exists(data['id']):
+        os.remove(tmp_path)
+        shutil.rmtree(directory, ignore_errors=True)
+        return None
+    os.replace(tmp_path, path)
+
+    for name in os.listdir(directory):
+        if os.path.join(directory, name) != path and name.endswith(".pdf"):
+            try:
+                os.remove(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
+    return path
+
+
+def _submit(data):
+    path = report_path(data['id'], data['updated_at'])
+    with _pending_lock:
+        future = _pending.get(path)
+        created = future is None
+        if created:
+            future = _pool.submit(_render, data, path)
+            _pending[path] = future
+
+    def forget(done):
+        with _pending_lock:
+            _pending.pop(path, None)
+        if done.exception():
+            logger.error(f"Error rendering report for session {data['id']}: {done.exception()}")
+
+    # Outside the lock: the callback runs immediately if the render already finished
+    if created:
+        future.add_done_callback(forget)
+    return path, future
+
+
+def _refresh_report(session_id, user_id):
+    data = get_report_data(session_id, user_id)
+    if data and not os.path.exists(report_path(data['id'], data['updated_at'])):
+        _submit(data)
+
+
+def schedule_report(session_id, user_id):
+    """Render a session's report in the background unless the current version is cached."""
+    _pool.submit(_refresh_report, session_id, user_id)
+
+
+@traced()
+def get_report(session_id, user_id, wait=True):
+    """
+    Path of the up-to-date PDF report of a session.
+
+    Cached reports are returned immediately. Otherwise the report is
+    rendered (joining a render already in progress) when wait is true.
+
+    Args:
+        session_id: UUID of the detection session
+        user_id: UUID of the requesting doctor
+        wait (bool): Block until a missing report is rendered
+
+    Returns:
+        str: Path of the PDF, or None if the session does not exist or the
+        report is not ready and wait is false
+
+    Raises:
+        Exception: The render failed (it is also logged)
+    """
+    data = get_report_data(session_id, user_id)
+    if not data:
+        return None
+    path = report_path(data['id'], data['updated_at'])
+    if os.path.exists(path):
+        return path
+    _, future = _submit(data)
+    if not wait:
+        return None
+    return future.result()
+
+
+def discard_reports(session_id):
+    """Remove all cached reports of a deleted session."""
+    shutil.rmtree(os.path.join(REPORT_DIR, str(session_id)), ignore_errors=True)
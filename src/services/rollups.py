@@ -0,0 +1,218 @@
+from loguru import logger
+
+from config import ROLLUP_BATCH_SIZE, ROLLUP_TIMEZONE
+from src.services.storage import connect, is_sqlite
+from src.utils.tracing import TracedCursor, traced
+
+ROLLUP_GRAINS = ("day", "week")
+
+
+def _apply_rollup_deltas_sqlite(cur, batch_size, timezone):
+    """
+    The apply_rollup_deltas statement as separate statements, for SQLite.
+    
+    The transaction holds the database write lock from its first statement,
+    so concurrent jobs cannot fold the same batch and SKIP LOCKED is not needed.
+    """
+    cur.execute("""
+        SELECT max(id) AS last_id, count(*) AS folded
+        FROM (SELECT id FROM detection_rollup_deltas ORDER BY id LIMIT %s)
+        FOR UPDATE
+    """, (batch_size,))
+    batch = cur.fetchone()
+    if not batch['folded']:
+        return 0
+
+    cur.execute("""
+        INSERT INTO detection_daily_rollups AS r (
+            day, user_id, detection, sessions, confidence_sum, confidence_count
+        )
+        SELECT
+            date_in_timezone(detection_date, %s),
+            user_id,
+            COALESCE(detection, 'Unknown'),
+            SUM(sessions),
+            COALESCE(SUM(sessions * confidence), 0),
+            COALESCE(SUM(sessions) FILTER (WHERE confidence IS NOT NULL), 0)
+        FROM detection_rollup_deltas
+        WHERE id <= %s
+        GROUP BY 1, 2, 3
+        ON CONFLICT (day, user_id, detection) DO UPDATE
+        SET sessions = r.sessions + excluded.sessions,
+            confidence_sum = r.confidence_sum + excluded.confidence_sum,
+            confidence_count = r.confidence_count + excluded.confidence_count
+    """, (timezone, batch['last_id']))
+    cur.execute("DELETE FROM detection_rollup_deltas WHERE id <= %s", (batch['last_id'],))
+    return batch['folded']
+
+
+@traced()
+def apply_rollup_deltas(batch_size=ROLLUP_BATCH_SIZE, timezone=ROLLUP_TIMEZONE):
+    """
+    Fold one batch of queued detection changes into the daily rollups.
+
+    The batch is removed from the queue and added to the rollups in a single
+    statement, so every change is counted exactly once even if several jobs
+    run at the same time (SKIP LOCKED hands them disjoint batches).
+
+    Args:
+        batch_size (int): Maximum number of queued changes to fold
+        timezone (str): Timezone whose calendar days the rollups use
+
+    Returns:
+        int: Number of changes folded, or None on error
+    """
+    conn = None
+    cur = None
+    try:
+        conn = connect()
+        cur = conn.cursor(cursor_factory=TracedCursor)
+
+        query = """
+        WITH batch AS (
+            DELETE FROM detection_rollup_deltas
+            WHERE id IN (
+                SELECT id FROM detection_rollup_deltas
+                ORDER BY id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING *
+        ), folded AS (
+            INSERT INTO detection_daily_rollups AS r (
+                day, user_id, detection, sessions, confidence_sum, confidence_count
+            )
+            SELECT
+                (detection_date AT TIME ZONE %s)::date,
+                user_id,
+                COALESCE(detection, 'Unknown'),
+                SUM(sessions),
+                COALESCE(SUM(sessions * confidence), 0),
+                COALESCE(SUM(sessions) FILTER (WHERE confidence IS NOT NULL), 0)
+            FROM batch
+            GROUP BY 1, 2, 3
+            ON CONFLICT (day, user_id, detection) DO UPDATE
+            SET sessions = r.sessions + EXCLUDED.sessions,
+                confidence_sum = r.confidence_sum + EXCLUDED.confidence_sum,
+                confidence_count = r.confidence_count + EXCLUDED.confidence_count
+        )
+        SELECT count(*) AS folded FROM batch
+        """
+
+        if is_sqlite():
+            folded = _apply_rollup_deltas_sqlite(cur, batch_size, timezone)
+        else:
+            cur.execute(query, (batch_size, timezone))
+            folded = cur.fetchone()['folded']
+        conn.commit()
+        return folded
+
+    except Exception as e:
+        logger.error(f"Error applying rollup deltas: {e}")
+        if conn:
+            conn.rollback()
+        return None
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            conn.close()
+
+
+def refresh_rollups(batch_size=ROLLUP_BATCH_SIZE, timezone=ROLLUP_TIMEZONE):
+    """
+    Drain the change queue in batches.
+
+    Returns:
+        int: Total number of changes folded
+    """
+    total = 0
+    while True:
+        folded = apply_rollup_deltas(batch_size, timezone)
+        if not folded:
+            return total
+        total += folded
+        if folded < batch_size:
+            return total
+
+
+@traced()
+def get_detection_rollups(start_date, end_date, grain="day"):
+    """
+    Retrieve detection counts and average confidence per label and doctor.
+
+    Reads only the rollup rows of the requested days, so the cost does not
+    depend on how much history the clinic has.
+
+    Args:
+        start_date (date): First day, inclusive
+        end_date (date): Last day, inclusive
+        grain (str): 'day' or 'week'
+
+    Returns:
+        List of {'period', 'username', 'detection', 'sessions', 'confidence_sum', 'confidence_count'};
+        sums are returned instead of averages so callers can re-aggregate exactly
+    """
+    if grain not in ROLLUP_GRAINS:
+        raise ValueError(f"grain must be one of {ROLLUP_GRAINS}")
+
+    conn = None
+    cur = None
+    try:
+        conn = connect()
+        cur = conn.cursor(cursor_factory=TracedCursor)
+
+        query = """
+        SELECT
+            date_trunc(%s, r.day)::date AS period,
+            u.username,
+            r.detection,
+            SUM(r.sessions) AS sessions,
+            SUM(r.confidence_sum) AS confidence_sum,
+            SUM(r.confidence_count) AS confidence_count
+        FROM detection_daily_rollups r
+        JOIN users u ON u.user_id = r.user_id
+        WHERE r.day BETWEEN %s AND %s
+        GROUP BY 1, 2, 3
+        HAVING SUM(r.sessions) <> 0
+        ORDER BY 1, 2, 3
+        """
+
+        params = (grain, start_date, end_date)
+        if is_sqlite():
+            # Weeks start on Monday, as with date_trunc
+            period = "date(r.day, '-6 days', 'weekday 1')" if grain == "week" else "r.day"
+            query = query.replace("date_trunc(%s, r.day)::date AS period", f'{period} AS "period [DATE]"')
+            params = (start_date, end_date)
+
+        cur.execute(query, params)
+        return cur.fetchall()
+
+    except Exception as e:
+        logger.error(f"Error fetching detection rollups: {e}")
+        return []
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            conn.close()
+
+
+@traced()
+def get_rollup_backlog():
+    """Number of detection changes not yet folded into the rollups."""
+    conn = None
+    cur = None
+    try:
+        conn = connect()
+        cur = conn.cursor(cursor_factory=TracedCursor)
+        cur.execute("SELECT count(*) AS pending FROM detection_rollup_deltas")
+        return cur.fetchone()['pending']
+    except Exception as e:
+        logger.error(f"Error fetching rollup backlog: {e}")
+        return None
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            conn.close()
@@ -0,0 +1,229 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from loguru import logger
+from psycopg2.extras import execute_values
+
+from config import SIMILARITY_REFRESH_SECONDS
+from src.services.storage import connect, is_sqlite
+from src.utils.image_features import EMBEDDING_DIM, extract_features, hamming_distance
+from src.utils.image_files import resolve_image_path
+from src.utils.tracing import TracedCursor, traced
+from src.utils.vector_index import VectorIndex
+
+# Rows committed slightly out of created_at order are caught by re-reading this window
+REFRESH_OVERLAP = timedelta(seconds=60)
+
+_background = ThreadPoolExecutor(max_workers=2, thread_name_prefix="image-features")
+
+_indexes = {}  # user_id -> _DoctorIndex
+_indexes_lock = threading.Lock()
+
+
+class _DoctorIndex:
+    """Vector index over one doctor's images, refreshed incrementally from the database."""
+
+    def __init__(self):
+        self.index = VectorIndex(EMBEDDING_DIM)
+        self.image_ids = set()
+        self.patient_groups = {}  # patient UUID -> small int used as index group
+        self.loaded_until = datetime(1970, 1, 1, tzinfo=timezone.utc)  # datetime.min would overflow minus REFRESH_OVERLAP
+        self.checked_at = 0.0
+        self.lock = threading.Lock()
+
+
+def encode_embedding(vector):
+    """Store embeddings as float16 to halve their size; similarity is unaffected at this precision."""
+    return np.asarray(vector, dtype=np.float16).tobytes()
+
+
+def decode_embedding(data):
+    return np.frombuffer(bytes(data), dtype=np.float16).astype(np.float32)
+
+
+@traced()
+def store_image_features(images):
+    """
+    Compute and store the perceptual hash and embedding of detection images.
+
+    Args:
+        images: List of detection_images rows with 'id' and 'image_path'
+
+    Returns:
+        int: Number of images whose features were stored
+    """
+    rows = []
+    for image in images:
+        try:
+            phash, vector = extract_features(resolve_image_path(image['image_path']))
+        except Exception as e:
+            logger.warning(f"Error extracting features from {image['image_path']}: {e}")
+            continue
+        rows.append((image['id'], phash, encode_embedding(vector)))
+    if not rows:
+        return 0
+
+    conn = None
+    cur = None
+    try:
+        conn = connect()
+        cur = conn.cursor(cursor_factory=TracedCursor)
+        if is_sqlite():
+            cur.executemany("""
+                INSERT INTO detection_image_features (image_id, phash, embedding)
+                VALUES (%s, %s, %s)
+                ON CONFLICT (image_id) DO NOTHING
+            """, rows)
+        else:
+            execute_values(cur, """
+                INSERT INTO detection_image_features (image_id, phash, embedding)
+                VALUES %s
+                ON CONFLICT (image_id) DO NOTHING
+            """, rows)
+        conn.commit()
+        return len(rows)
+    except Exception as e:
+        logger.error(f"Error storing image features: {e}")
+        if conn:
+            conn.rollback()
+        return 0
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            conn.close()
+
+
+def index_images_async(images):
+    """Extract features for newly ingested images in the background."""
+    images = [{'id': img['id'], 'image_path': img['image_path']} for img in images or []]
+    if images:
+        _background.submit(store_image_features, images)
+
+
+def _refresh(entry, user_id):
+    """Load features stored since the last refresh into the doctor's index."""
+    conn = connect()
+    try:
+        with conn.cursor(name="similarity_refresh") as cur:
+            cur.itersize = 20000
+            cur.execute("""
+                SELECT f.image_id, f.embedding, s.patient_id, f.created_at
+                FROM detection_image_features f
+                JOIN detection_images i ON i.id = f.image_id
+                JOIN detection_sessions s ON s.id = i.detection_session_id
+                WHERE s.user_id = %s AND f.created_at > %s
+                ORDER BY f.created_at
+            """, (user_id, entry.loaded_until - REFRESH_OVERLAP))
+
+            ids, vectors, groups = [], [], []
+            for image_id, embedding, patient_id, created_at in cur:
+                entry.loaded_until = max(entry.loaded_until, created_at)
+                if image_id in entry.image_ids:
+                    continue
+                entry.image_ids.add(image_id)
+                ids.append(image_id)
+                vectors.append(decode_embedding(embedding))
+                groups.append(entry.patient_groups.setdefault(patient_id, len(entry.patient_groups)))
+
+            if ids:
+                entry.index.add(ids, np.vstack(vectors), groups)
+                logger.debug(f"Similarity index for {user_id}: +{len(ids)} images, {len(entry.index)} total")
+    finally:
+        conn.close()
+
+
+def get_similarity_index(user_id):
+    """Return the doctor's index, picking up new features at most every SIMILARITY_REFRESH_SECONDS."""
+    with _indexes_lock:
+        entry = _indexes.setdefault(str(user_id), _DoctorIndex())
+    with entry.lock:
+        if time.monotonic() - entry.checked_at > SIMILARITY_REFRESH_SECONDS:
+            _refresh(entry, user_id)
+            entry.checked_at = time.monotonic()
+    return entry
+
+
+@traced()
+def find_similar_images(image_id, user_id, k=5, same_patient=False):
+    """
+    Find the images most similar to a detection image.
+
+    Args:
+        image_id: UUID of the query image
+        user_id: UUID of the requesting doctor
+        k (int): Number of results
+        same_patient (bool): Only search the query image's patient (progression over time)
+
+    Returns:
+        List of similar images with patient and session details, most similar first
+    """
+    conn = None
+    cur = None
+    try:
+        conn = connect()
+        cur = conn.cursor(cursor_factory=TracedCursor)
+
+        cur.execute("""
+            SELECT f.embedding, f.phash, s.patient_id
+            FROM detection_image_features f
+            JOIN detection_images i ON i.id = f.image_id
+            JOIN detection_sessions s ON s.id = i.detection_session_id
+            WHERE f.image_id = %s AND s.user_id = %s
+        """, (image_id, user_id))
+        source = cur.fetchone()
+        if not source:
+            return []
+
+        entry = get_similarity_index(user_id)
+        group = entry.patient_groups.get(source['patient_id']) if same_patient else None
+        if same_patient and group is None:
+            return []
+        matches = entry.index.search(
+            decode_embedding(source['embedding']), k=k, group=group, exclude={str(image_id)}
+        )
+        if not matches:
+            return []
+
+        # Deleted images drop out here even if the in-memory index still holds them
+        query = """
+            SELECT
+                i.id,
+                i.image_path,
+                f.phash,
+                s.id AS detection_session_id,
+                s.detection_date,
+                p.patient_id,
+                p.name AS patient_name
+            FROM detection_images i
+            JOIN detection_image_features f ON f.image_id = i.id
+            JOIN detection_sessions s ON s.id = i.detection_session_id
+            JOIN patients p ON p.id = s.patient_id
+            WHERE i.id = ANY(%s::uuid[]) AND s.user_id = %s
+        """
+        if is_sqlite():
+            # The ids are bound as one JSON array parameter
+            query = query.replace("= ANY(%s::uuid[])", "IN (SELECT value FROM json_each(%s))")
+        cur.execute(query, ([str(m) for m, _ in matches], user_id))
+        details = {str(row['id']): row for row in cur.fetchall()}
+
+        results = []
+        for match_id, score in matches:
+            row = details.get(str(match_id))
+            if row:
+                row['similarity'] = score
+                row['phash_distance'] = hamming_distance(row['phash'], source['phash'])
+                results.append(row)
+        return results
+
+    except Exception as e:
+        logger.error(f"Error finding similar images: {e}")
+        return []
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            conn.close()
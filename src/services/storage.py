@@ -0,0 +1,278 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+from datetime import date, datetime, timezone
+from functools import lru_cache
+from itertools import islice
+from uuid import UUID
+from zoneinfo import ZoneInfo
+
+import psycopg2
+from loguru import logger
+
+from config import DATABASE_URL, SQLITE_BUSY_TIMEOUT_SECONDS, SQLITE_PATH, STORAGE_BACKEND
+from src.utils.tracing import TracedCursor, query_span
+
+SQLITE_SCHEMA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "schema_sqlite.sql")
+
+# Timestamps are stored as UTC text in one fixed-width format, so they sort and compare as text
+SQLITE_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S.%f+00:00"
+
+_PLACEHOLDER = re.compile(r"%\((\w+)\)s|%s|%%")
+_FOR_UPDATE = re.compile(r"\s+FOR\s+UPDATE\s*$", re.IGNORECASE)
+_WRITE_STATEMENTS = ("INSERT", "UPDATE", "DELETE", "REPLACE")
+
+
+def _adapt_timestamp(value):
+    # Naive datetimes are local time, as PostgreSQL reads them for timestamptz columns
+    return value.astimezone(timezone.utc).strftime(SQLITE_TIMESTAMP_FORMAT)
+
+
+def _date_in_timezone(value, tz):
+    """SQL function date_in_timezone(timestamp, tz): the calendar day of a stored timestamp in tz."""
+    if value is None:
+        return None
+    return datetime.fromisoformat(value).astimezone(ZoneInfo(tz)).date().isoformat()
+
+
+# Declared column types (PARSE_DECLTYPES) or "name [TYPE]" aliases (PARSE_COLNAMES)
+# select the conversion back, so rows look the same as psycopg2's
+sqlite3.register_adapter(datetime, _adapt_timestamp)
+sqlite3.register_adapter(date, date.isoformat)
+sqlite3.register_adapter(UUID, str)
+sqlite3.register_adapter(dict, json.dumps)
+sqlite3.register_adapter(list, json.dumps)
+sqlite3.register_converter("TIMESTAMPTZ", lambda value: datetime.fromisoformat(value.decode()))
+sqlite3.register_converter("DATE", lambda value: date.fromisoformat(value.decode()))
+sqlite3.register_converter("JSONB", json.loads)
+sqlite3.register_converter("BOOLEAN", lambda value: value == b"1")
+
+
+@lru_cache(maxsize=1024)
+def _translate(query, has_params):
+    """
+    Rewrite a psycopg2 statement for sqlite3.
+
+    Returns:
+        tuple: (statement, whether it needs the write lock)
+    """
+    lock = bool(_FOR_UPDATE.search(query))
+    if lock:
+        query = _FOR_UPDATE.sub("", query)
+    if has_params:
+        # psycopg2 only interprets placeholders (and %% escapes) when parameters are passed
+        query = _PLACEHOLDER.sub(
+            lambda m: f":{m.group(1)}" if m.group(1) else ("?" if m.group(0) == "%s" else "%"),
+            query,
+        )
+    first_word = query.lstrip().split(None, 1)[0].upper() if query.strip() else ""
+    return query, lock or first_word in _WRITE_STATEMENTS
+
+
+class SqliteCursor:
+    """sqlite3 cursor with the psycopg2 cursor interface used by the services."""
+
+    def __init__(self, connection, dict_rows=False, traced=False):
+        self.connection = connection
+        self.itersize = 2000  # Accepted for named-cursor callers; sqlite3 always steps lazily
+        self._cursor = connection._conn.cursor()
+        self._dict_rows = dict_rows
+        self._traced = traced
+        self._columns = None
+        self._rows = None  # Buffered RETURNING rows of a write, see _execute
+
+    def execute(self, query, vars=None):
+        if not self._traced:
+            return self._execute(query, vars)
+        with query_span(query, vars):
+            return self._execute(query, vars)
+
+    def _execute(self, query, vars):
+        statement, write = _translate(query, vars is not None)
+        self.connection._begin(write)
+        self._cursor.execute(statement, () if vars is None else vars)
+        self._columns = [column[0] for column in self._cursor.description or ()]
+        # A write with RETURNING is read to the end at once, as a half-read one would block COMMIT
+        self._rows = iter(self._cursor.fetchall()) if write and self._columns else None
+
+    def executemany(self, query, vars_list):
+        statement, write = _translate(query, True)
+        self.connection._begin(write)
+        self._cursor.executemany(statement, vars_list)
+
+    def _row(self, row):
+        if row is None or not self._dict_rows:
+            return row
+        return dict(zip(self._columns, row))
+
+    def _source(self):
+        return self._cursor if self._rows is None else self._rows
+
+    def fetchone(self):
+        return self._row(next(self._source(), None))
+
+    def fetchmany(self, size=None):
+        return [self._row(row) for row in islice(self._source(), size or self.itersize)]
+
+    def fetchall(self):
+        return [self._row(row) for row in self._source()]
+
+    def __iter__(self):
+        for row in self._source():
+            yield self._row(row)
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def close(self):
+        self._cursor.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class SqliteConnection:
+    """
+    sqlite3 connection with the psycopg2 connection interface used by the services.
+
+    As with psycopg2, the first statement opens a transaction that lasts until
+    commit() or rollback(). Transactions that write take the database write
+    lock up front (BEGIN IMMEDIATE), and a SELECT ... FOR UPDATE does the same,
+    SQLite's counterpart of a row lock; read-only transactions only see a
+    snapshot and never block writers.
+    """
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(
+            path,
+            timeout=SQLITE_BUSY_TIMEOUT_SECONDS,
+            detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES,
+            isolation_level=None,  # Transactions are managed by _begin/commit/rollback
+            check_same_thread=False,
+        )
+        self._conn.execute("PRAGMA foreign_keys = ON")
+        self._conn.create_function("date_in_timezone", 2, _date_in_timezone, deterministic=True)
+
+    def _begin(self, write):
+        if not self._conn.in_transaction:
+            self._conn.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+
+    def cursor(self, name=None, cursor_factory=None):
+        """Like psycopg2: rows are dicts when a cursor_factory is given, TracedCursor adds spans."""
+        traced = cursor_factory is not None and issubclass(cursor_factory, TracedCursor)
+        return SqliteCursor(self, dict_rows=cursor_factory is not None, traced=traced)
+
+    def commit(self):
+        if self._conn.in_transaction:
+            self._conn.execute("COMMIT")
+
+    def rollback(self):
+        if self._conn.in_transaction:
+            self._conn.execute("ROLLBACK")
+
+    def close(self):
+        self.rollback()
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Same as psycopg2: end the transaction, keep the connection open
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+
+
+class PostgresBackend:
+    name = "postgres"
+
+    def connect(self):
+        return psycopg2.connect(DATABASE_URL)
+
+
+class SqliteBackend:
+    """Embedded database file; the schema is created on first use, so nothing has to be set up."""
+
+    name = "sqlite"
+
+    def __init__(self, path):
+        self.path = path
+        self._schema_ready = False
+        self._lock = threading.Lock()
+
+    def connect(self):
+        if not self._schema_ready:
+            with self._lock:
+                if not self._schema_ready:
+                    self._create_schema()
+                    self._schema_ready = True
+        return SqliteConnection(self.path)
+
+    def _create_schema(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = SqliteConnection(self.path)
+        try:
+            raw = conn._conn
+            raw.execute("PRAGMA journal_mode = WAL")  # Persistent; readers and the writer stop blocking each other
+
+            def schema_exists():
+                return raw.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'users'").fetchone()
+
+            if schema_exists():
+                return
+            with open(SQLITE_SCHEMA) as f:
+                script = f.read()
+            try:
+                raw.executescript(f"BEGIN IMMEDIATE;\n{script}\nCOMMIT;")
+                logger.info(f"Created SQLite database {self.path}")
+            except sqlite3.OperationalError:
+                # Another process created the schema at the same time
+                conn.rollback()
+                if not schema_exists():
+                    raise
+        finally:
+            conn.close()
+
+
+def _create_backend():
+    if STORAGE_BACKEND == "postgres":
+        return PostgresBackend()
+    if STORAGE_BACKEND == "sqlite":
+        return SqliteBackend(SQLITE_PATH)
+    raise ValueError(f"Unknown STORAGE_BACKEND {STORAGE_BACKEND!r}; expected 'postgres' or 'sqlite'")
+
+
+backend = _create_backend()
+
+
+def connect():
+    """
+    Open a connection to the configured storage backend.
+
+    Both backends accept psycopg2-style statements and parameters and return
+    dict rows from conn.cursor(cursor_factory=TracedCursor); services branch
+    on is_sqlite() only where the SQL itself differs.
+    """
+    return backend.connect()
+
+
+def is_sqlite():
+    return backend.name == "sqlite"
+
+
+def require_postgres(feature):
+    """Fail clearly when an operations tool that relies on PostgreSQL runs against SQLite."""
+    if is_sqlite():
+        raise SystemExit(f"{feature} needs the PostgreSQL storage backend (STORAGE_BACKEND=postgres)")
@@ -0,0 +1,243 @@
+import os
+import shutil
+import time
+
+import psycopg2
+from loguru import logger
+
+from config import (
+    DATABASE_URL,
+    IMAGE_COLD_DIR,
+    IMAGE_UPLOAD_DIR,
+    QR_CODE_DIR,
+    REPORT_DIR,
+    STORAGE_GC_GRACE_HOURS,
+    STORAGE_QUARANTINE_DIR,
+)
+from src.utils.tracing import TracedCursor
+
+# Each root is reconciled against the paths the database expects in it, streamed
+# in the same byte order the filesystem walk produces. The recheck query
+# confirms a batch of orphans right before they are removed.
+IMAGE_QUERIES = {
+    "references": """
+        SELECT DISTINCT image_path COLLATE "C" AS path
+        FROM detection_images
+        WHERE image_path COLLATE "C" >= %(prefix)s AND image_path COLLATE "C" < %(prefix_end)s
+        ORDER BY 1
+    """,
+    "recheck": """
+        SELECT image_path AS path FROM detection_images WHERE image_path = ANY(%(paths)s)
+    """,
+}
+QR_CODE_QUERIES = {
+    "references": """
+        SELECT (%(prefix)s || patient_id || '.png') COLLATE "C" AS path
+        FROM patients
+        ORDER BY 1
+    """,
+    "recheck": """
+        SELECT %(prefix)s || patient_id || '.png' AS path
+        FROM patients
+        WHERE patient_id = ANY(
+            SELECT substr(p, length(%(prefix)s) + 1, length(p) - length(%(prefix)s) - 4)
+            FROM unnest(%(paths)s::text[]) p
+        )
+    """,
+}
+# Only the current report of each session is referenced (see reports.report_path);
+# reports are a cache, so sessions without one are not counted as missing
+REPORT_PATH = """
+    %(prefix)s || s.id || '/' || (extract(epoch FROM GREATEST(s.updated_at, p.updated_at)) * 1000000)::bigint || '.pdf'
+"""
+REPORT_QUERIES = {
+    "references": f"""
+        SELECT ({REPORT_PATH}) COLLATE "C" AS path
+        FROM detection_sessions s
+        JOIN patients p ON p.id = s.patient_id
+        ORDER BY 1
+    """,
+    "recheck": f"""
+        SELECT {REPORT_PATH} AS path
+        FROM detection_sessions s
+        JOIN patients p ON p.id = s.patient_id
+        WHERE s.id::text = ANY(
+            SELECT split_part(substr(r, length(%(prefix)s) + 1), '/', 1)
+            FROM unnest(%(paths)s::text[]) r
+        )
+    """,
+    "cache": True,
+}
+
+
+def storage_roots():
+    """(name, directory, queries) of every directory the reconciler manages."""
+    return [
+        ("images", IMAGE_UPLOAD_DIR, IMAGE_QUERIES),
+        ("cold_images", IMAGE_COLD_DIR, IMAGE_QUERIES),
+        ("qr_codes", QR_CODE_DIR, QR_CODE_QUERIES),
+        ("reports", REPORT_DIR, REPORT_QUERIES),
+    ]
+
+
+def _query_params(directory, **extra):
+    prefix = os.path.normpath(directory) + os.sep
+    # prefix_end is the next string after every path starting with prefix
+    return {"prefix": prefix, "prefix_end": prefix[:-1] + chr(ord(prefix[-1]) + 1), **extra}
+
+
+def iter_files_sorted(directory):
+    """
+    Yield (path, stat) for every file under directory, in byte order of the path.
+
+    Only one directory listing is held per level. Subdirectories sort as
+    "name/", which makes the walk order equal to plain string order of the
+    full paths.
+    """
+    try:
+        entries = list(os.scandir(directory))
+    except FileNotFoundError:
+        return
+    entries.sort(key=lambda e: e.name + "/" if e.is_dir(follow_symlinks=False) else e.name)
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            yield from iter_files_sorted(entry.path)
+        elif entry.is_file(follow_symlinks=False):
+            yield entry.path, entry.stat(follow_symlinks=False)
+
+
+def iter_referenced_paths(query, directory, batch_size=5000):
+    """Stream the paths the database references under directory, in byte order."""
+    conn = psycopg2.connect(DATABASE_URL)
+    try:
+        with conn.cursor(name="gc_references") as cur:
+            cur.itersize = batch_size
+            cur.execute(query, _query_params(directory))
+            for (path,) in cur:
+                yield path
+    finally:
+        conn.close()
+
+
+def find_orphans(directory, query, grace_seconds):
+    """
+    Merge-join the sorted file walk with the sorted database references.
+
+    Yields:
+        tuple: ('orphan', path, size) for unreferenced files older than the
+        grace period, ('recent', path, size) for unreferenced newer files and
+        ('missing', path, 0) for referenced paths that have no file
+    """
+    files = iter_files_sorted(os.path.normpath(directory))
+    references = iter_referenced_paths(query, directory)
+    cutoff = time.time() - grace_seconds
+
+    file_entry = next(files, None)
+    reference = next(references, None)
+    while file_entry is not None:
+        path, stat_result = file_entry
+        if reference is None or path < reference:
+            # Files of failed uploads are written before their rows, hence the grace period
+            kind = "orphan" if stat_result.st_mtime < cutoff else "recent"
+            yield kind, path, stat_result.st_size
+            file_entry = next(files, None)
+        elif path == reference:
+            file_entry = next(files, None)
+            reference = next(references, None)
+        else:
+            yield "missing", reference, 0
+            reference = next(references, None)
+    while reference is not None:
+        yield "missing", reference, 0
+        reference = next(references, None)
+
+
+def _still_unreferenced(query, directory, paths):
+    """Re-check a batch against the database right before acting on it."""
+    conn = None
+    cur = None
+    try:
+        conn = psycopg2.connect(DATABASE_URL)
+        cur = conn.cursor(cursor_factory=TracedCursor)
+        cur.execute(query, _query_params(directory, paths=paths))
+        referenced = {row['path'] for row in cur.fetchall()}
+        return [path for path in paths if path not in referenced]
+    finally:
+        if cur:
+            cur.close()
+        if conn:
+            conn.close()
+
+
+def _dispose(path, mode, name, directory):
+    if mode == "delete":
+        os.remove(path)
+    else:
+        target = os.path.join(STORAGE_QUARANTINE_DIR, name, os.path.relpath(path, directory))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.move(path, target)
+
+
+def reconcile_storage(mode="report", grace_hours=STORAGE_GC_GRACE_HOURS, batch_size=100,
+                      max_per_second=50, roots=None):
+    """
+    Find files no database row references and report, quarantine or delete them.
+
+    Args:
+        mode (str): 'report' (no changes), 'quarantine' (move to STORAGE_QUARANTINE_DIR) or 'delete'
+        grace_hours (int): Files modified more recently are left alone
+        batch_size (int): Orphans handled per batch; each batch is re-checked against the database
+        max_per_second (float): Upper bound on files removed per second, to spare disk I/O
+        roots: Subset of storage_roots() names to process (default: all)
+
+    Returns:
+        dict: root name -> {'orphans', 'orphan_bytes', 'reclaimed', 'reclaimed_bytes', 'recent', 'missing'}
+    """
+    if mode not in ("report", "quarantine", "delete"):
+        raise ValueError("mode must be 'report', 'quarantine' or 'delete'")
+
+    report = {}
+    for name, directory, queries in storage_roots():
+        if roots and name not in roots:
+            continue
+        stats = {"orphans": 0, "orphan_bytes": 0, "reclaimed": 0, "reclaimed_bytes": 0, "recent": 0, "missing": 0}
+        report[name] = stats
+
+        def flush(batch):
+            started = time.monotonic()
+            sizes = dict(batch)
+            for path in _still_unreferenced(queries["recheck"], directory, list(sizes)):
+                try:
+                    _dispose(path, mode, name, directory)
+                except FileNotFoundError:
+                    continue
+                except OSError as e:
+                    logger.warning(f"Error removing orphan {path}: {e}")
+                    continue
+                stats["reclaimed"] += 1
+                stats["reclaimed_bytes"] += sizes[path]
+            # Rate limit: a batch never completes faster than batch_size / max_per_second
+            remaining = len(batch) / max_per_second - (time.monotonic() - started)
+            if remaining > 0:
+                time.sleep(remaining)
+
+        batch = []
+        for kind, path, size in find_orphans(directory, queries["references"], grace_hours * 3600):
+            if kind == "missing" and queries.get("cache"):
+                continue
+            if kind != "orphan":
+                stats[kind] += 1
+                continue
+            stats["orphans"] += 1
+            stats["orphan_bytes"] += size
+            if mode == "report":
+                continue
+            batch.append((path, size))
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+        if batch:
+            flush(batch)
+
+        logger.info(f"Storage reconcile {name}: {stats}")
+    return report
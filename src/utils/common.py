@@ -3,6 +3,8 @@ import os
 import uuid
 from datetime import datetime
 
+from config import IMAGE_UPLOAD_DIR
+
 
 def format_datetime(dt):
     """Format datetime object to string."""
@@ -12,16 +14,40 @@ def format_datetime(dt):
         dt = datetime.fromisoformat(dt.replace('Z', '+00:00'))
     return dt.strftime("%Y-%m-%d %H:%M")
 
-def generate_patient_id():
-    """Generate a unique patient number in format P-YYYYMMDD-XXXXX"""
-    now = datetime.now()
-    timestamp = now.strftime('%Y%m%d')
-    unique_suffix = now.microsecond % 100000
-    return f"P-{timestamp}-{unique_suffix:05d}"
+def parse_timestamps(records, fields=("created_at", "updated_at")):
+    """
+    Turn ISO timestamps of rows built with json_agg back into datetimes, in place.
+
+    Args:
+        records (list): Dicts decoded from a JSON column
+        fields (tuple): Keys holding timestamps
+
+    Returns:
+        list: The same records
+    """
+    for record in records:
+        for field in fields:
+            if isinstance(record.get(field), str):
+                record[field] = datetime.fromisoformat(record[field])
+    return records
+
+def format_patient_id(number, day=None):
+    """
+    Format an allocated number as a patient number P-YYYYMMDD-XXXXX
+    
+    The number is used whole (at least 5 digits, more once the sequence
+    passes 99,999), so identifiers stay unique whatever the date part.
+    
+    Args:
+        number (int): Unique number from the patient_id allocator
+        day (date): Date part of the identifier (default: today)
+    """
+    day = day or datetime.now()
+    return f"P-{day.strftime('%Y%m%d')}-{number:05d}"
 
 def save_uploaded_file(uploaded_file):
     """
-    Save an uploaded file to local_files/upload_images directory
+    Save an uploaded file to the IMAGE_UPLOAD_DIR directory
     
     Args:
         uploaded_file: UploadedFile object from Streamlit
@@ -30,7 +56,7 @@ def save_uploaded_file(uploaded_file):
         str: Path where the file was saved
     """
     # Create directory if it doesn't exist
-    upload_dir = os.path.join('local_files', 'images')
+    upload_dir = IMAGE_UPLOAD_DIR
     os.makedirs(upload_dir, exist_ok=True)
     
     # Full path where file will be saved
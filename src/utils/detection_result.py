@@ -0,0 +1,136 @@
+import json
+from functools import cached_property
+from typing import Any, Dict, Optional
+
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr, computed_field, field_validator
+
+from config import DETECTION_CLASSES
+
+# Little-endian float16: 2 bytes per class, about 3 significant digits
+PROBABILITY_DTYPE = "<f2"
+
+
+def encode_probabilities(probabilities):
+    """
+    Pack per-class probabilities into a float16 vector in DETECTION_CLASSES order.
+
+    Classes without a probability are stored as 0.
+
+    Returns:
+        bytes: Value for detection_sessions.detection_probabilities
+    """
+    # Imported here so list views, which never decode vectors, do not load numpy
+    import numpy as np
+
+    return np.asarray(
+        [probabilities.get(label, 0.0) for label in DETECTION_CLASSES], dtype=PROBABILITY_DTYPE
+    ).tobytes()
+
+
+def decode_probabilities(data):
+    """
+    Unpack a vector written by encode_probabilities.
+
+    Vectors stored before classes were appended are shorter; they only
+    cover the classes known at the time.
+
+    Returns:
+        dict: label -> probability, most likely first
+    """
+    import numpy as np
+
+    values = np.frombuffer(bytes(data), dtype=PROBABILITY_DTYPE)
+    pairs = sorted(zip(DETECTION_CLASSES, values.tolist()), key=lambda pair: pair[1], reverse=True)
+    return {label: round(value, 4) for label, value in pairs}
+
+
+class DetectionSummary(BaseModel):
+    """The queryable part of an uploaded detection result, stored in detection_sessions.detection_result."""
+
+    # Other fields a device sends are kept in the summary as they are
+    model_config = ConfigDict(extra="allow")
+
+    detection: str
+    confidence: float = Field(ge=0, le=1)
+
+
+class DetectionResult(DetectionSummary):
+    """A detection result as sent by a device, optionally with the full class distribution."""
+
+    probabilities: Optional[Dict[str, float]] = None
+
+    @field_validator("probabilities")
+    @classmethod
+    def _known_classes(cls, value):
+        unknown = set(value or ()) - set(DETECTION_CLASSES)
+        if unknown:
+            raise ValueError(f"unknown classes {sorted(unknown)}; add them to DETECTION_CLASSES")
+        return value
+
+    @classmethod
+    def parse(cls, value):
+        """Accept a DetectionResult, a dict or a JSON string; None stays None."""
+        if value is None or isinstance(value, cls):
+            return value
+        if isinstance(value, (str, bytes)):
+            return cls.model_validate_json(value)
+        return cls.model_validate(value)
+
+    def to_columns(self):
+        """
+        Split into the detection_sessions columns.
+
+        Returns:
+            tuple: (detection_result JSON, detection_probabilities bytes or None)
+        """
+        summary = self.model_dump_json(exclude={"probabilities"})
+        vector = encode_probabilities(self.probabilities) if self.probabilities else None
+        return summary, vector
+
+
+class StoredDetectionResult(BaseModel):
+    """
+    A detection result read back; the probability vector is decoded on first access.
+
+    Only uploads are validated (DetectionResult). Rows stored before that may
+    hold any JSON, so nothing is required or range-checked here.
+    """
+
+    model_config = ConfigDict(extra="allow")
+
+    detection: Optional[Any] = None
+    confidence: Optional[Any] = None
+
+    _vector: Optional[bytes] = PrivateAttr(default=None)
+    _inline_probabilities: Optional[Any] = PrivateAttr(default=None)
+
+    @classmethod
+    def from_columns(cls, summary, vector):
+        """
+        Args:
+            summary: detection_result as returned by the driver (dict, or JSON text)
+            vector: detection_probabilities, or None
+
+        Returns:
+            StoredDetectionResult, or None if the session has no result
+        """
+        if summary is None:
+            return None
+        if isinstance(summary, (str, bytes)):
+            summary = json.loads(summary)
+        if not isinstance(summary, dict):
+            summary = {"value": summary}  # A bare JSON value, as older devices could store
+        summary = dict(summary)
+        # Distributions stored inside the JSON before they had their own column
+        inline_probabilities = summary.pop("probabilities", None)
+        result = cls.model_validate(summary)
+        result._vector = vector
+        result._inline_probabilities = inline_probabilities
+        return result
+
+    @computed_field
+    @cached_property
+    def probabilities(self) -> Optional[Any]:
+        if self._vector is not None:
+            return decode_probabilities(self._vector)
+        return self._inline_probabilities
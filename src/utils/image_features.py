@@ -0,0 +1,92 @@
+import numpy as np
+
+EMBEDDING_DIM = 64
+
+_dct_matrix = None
+
+
+def _dct_32():
+    """Orthonormal DCT-II matrix for 32x32 blocks."""
+    global _dct_matrix
+    if _dct_matrix is None:
+        n = 32
+        k = np.arange(n)[:, None]
+        i = np.arange(n)[None, :]
+        m = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2 / n)
+        m[0] /= np.sqrt(2)
+        _dct_matrix = m
+    return _dct_matrix
+
+
+def perceptual_hash(image):
+    """
+    64-bit DCT perceptual hash (pHash) of a PIL image.
+
+    Returns:
+        int: Signed 64-bit integer, so it fits a BIGINT column
+    """
+    gray = np.asarray(image.convert("L").resize((32, 32)), dtype=np.float64)
+    dct = _dct_32() @ gray @ _dct_32().T
+    low = dct[:8, :8].flatten()
+    bits = low > np.median(low[1:])
+    value = int("".join("1" if b else "0" for b in bits), 2)
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def hamming_distance(hash_a, hash_b):
+    """Number of differing bits between two perceptual hashes."""
+    return bin((hash_a ^ hash_b) & ((1 << 64) - 1)).count("1")
+
+
+def _normalize(v):
+    norm = np.linalg.norm(v)
+    return v / norm if norm else v
+
+
+def embedding(image):
+    """
+    Compact 64-dimensional appearance embedding of a PIL image.
+
+    Concatenates a hue/saturation histogram (lesion colour), a 4x4 grid of
+    mean brightness (coarse layout) and a gradient-orientation histogram
+    (texture/border), each L2-normalised, then normalises the whole vector so
+    that a dot product is a cosine similarity.
+
+    Returns:
+        np.ndarray: float32 vector of length EMBEDDING_DIM
+    """
+    small = image.convert("RGB").resize((64, 64))
+    hsv = np.asarray(small.convert("HSV"), dtype=np.float32) / 255.0
+
+    color, _, _ = np.histogram2d(
+        hsv[..., 0].ravel(), hsv[..., 1].ravel(), bins=(8, 4), range=((0, 1), (0, 1))
+    )
+
+    gray = np.asarray(small.convert("L"), dtype=np.float32) / 255.0
+    layout = gray.reshape(4, 16, 4, 16).mean(axis=(1, 3))
+
+    gy, gx = np.gradient(gray)
+    magnitude = np.hypot(gx, gy)
+    orientation = np.arctan2(gy, gx)
+    texture, _ = np.histogram(orientation, bins=16, range=(-np.pi, np.pi), weights=magnitude)
+
+    vector = np.concatenate([
+        _normalize(color.ravel()),
+        _normalize(layout.ravel() - layout.mean()),
+        _normalize(texture),
+    ])
+    return _normalize(vector).astype(np.float32)
+
+
+def extract_features(image_path):
+    """
+    Compute the perceptual hash and embedding of an image file.
+
+    Returns:
+        tuple: (phash int, embedding float32 array)
+    """
+    from PIL import Image
+
+    with Image.open(image_path) as image:
+        image.draft("RGB", (256, 256))  # Let JPEG decode at reduced size
+        return perceptual_hash(image), embedding(image)
@@ -0,0 +1,164 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+
+from config import (
+    API_PUBLIC_URL,
+    IMAGE_COLD_DIR,
+    IMAGE_DERIVATIVE_WIDTHS,
+    IMAGE_DERIVATIVES_DIR,
+    IMAGE_REHYDRATE_CACHE_MB,
+    IMAGE_REHYDRATE_DIR,
+)
+from src.utils.tracing import span
+
+_COLD_PREFIX = os.path.normpath(IMAGE_COLD_DIR) + os.sep
+
+
+def file_version(stat_result):
+    """
+    Cheap version tag of a file, changing whenever it is rewritten.
+
+    Args:
+        stat_result: os.stat_result of the file
+
+    Returns:
+        str: Hex tag built from modification time and size
+    """
+    return f"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"
+
+
+def is_cold(image_path):
+    """Whether an image has been moved to cold storage (a string check, no filesystem access)."""
+    return os.path.normpath(image_path).startswith(_COLD_PREFIX)
+
+
+def resolve_image_path(image_path):
+    """
+    Local path to read an image from.
+
+    Hot images are returned unchanged. Cold images are copied into the
+    rehydration cache on first access and read from there afterwards; the
+    copy keeps the original modification time, so file versions, ETags and
+    derivative keys stay the same.
+
+    Args:
+        image_path (str): detection_images.image_path
+
+    Returns:
+        str: Readable local path
+    """
+    if not is_cold(image_path):
+        return image_path
+
+    cached_path = os.path.join(IMAGE_REHYDRATE_DIR, os.path.relpath(image_path, IMAGE_COLD_DIR))
+    try:
+        stat_result = os.stat(cached_path)
+        # Record the access for LRU eviction without touching the modification time
+        os.utime(cached_path, ns=(time.time_ns(), stat_result.st_mtime_ns))
+        return cached_path
+    except FileNotFoundError:
+        pass
+
+    with span("image.rehydrate", path=image_path):
+        os.makedirs(os.path.dirname(cached_path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cached_path), suffix=".tmp")
+        os.close(fd)
+        shutil.copy2(image_path, tmp_path)
+        os.replace(tmp_path, cached_path)
+    _evict_rehydrated(keep=cached_path)
+    return cached_path
+
+
+def _evict_rehydrated(keep=None):
+    """Remove least recently accessed rehydrated copies until the cache fits IMAGE_REHYDRATE_CACHE_MB."""
+    entries = []
+    total = 0
+    for root, _, files in os.walk(IMAGE_REHYDRATE_DIR):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                stat_result = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat_result.st_atime_ns, stat_result.st_size, path))
+            total += stat_result.st_size
+
+    limit = IMAGE_REHYDRATE_CACHE_MB * 1024 * 1024
+    for _, size, path in sorted(entries):
+        if total <= limit:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+            total -= size
+        except FileNotFoundError:
+            pass
+
+
+def nearest_derivative_width(width):
+    """Snap a requested width to the closest allowed derivative width, so the cache stays bounded."""
+    return min(IMAGE_DERIVATIVE_WIDTHS, key=lambda w: abs(w - width))
+
+
+def get_derivative(image_path, width):
+    """
+    Return the path of a resized copy of an image, creating it on first use.
+
+    Derivatives are content-addressed by the source path and version, so a
+    rewritten original never serves a stale derivative.
+
+    Args:
+        image_path (str): Path of the original image
+        width (int): Target width in pixels (snapped to IMAGE_DERIVATIVE_WIDTHS)
+
+    Returns:
+        str: Path of the derivative JPEG
+    """
+    width = nearest_derivative_width(width)
+    version = file_version(os.stat(image_path))
+    key = hashlib.sha256(f"{image_path}:{version}".encode()).hexdigest()[:32]
+    derivative_path = os.path.join(IMAGE_DERIVATIVES_DIR, f"{key}_w{width}.jpg")
+    if os.path.exists(derivative_path):
+        return derivative_path
+
+    from PIL import Image
+
+    os.makedirs(IMAGE_DERIVATIVES_DIR, exist_ok=True)
+    with Image.open(image_path) as img:
+        img = img.convert("RGB")
+        if img.width > width:
+            img.thumbnail((width, width * img.height // img.width))
+        # Write then rename, so concurrent requests never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=IMAGE_DERIVATIVES_DIR, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            img.save(f, format="JPEG", quality=85, optimize=True)
+    os.replace(tmp_path, derivative_path)
+    return derivative_path
+
+
+def image_url(image, width=None):
+    """
+    Build the browser URL of a detection image served by the API.
+
+    The URL carries the file version, so the response can be cached forever
+    and a changed file gets a new URL.
+
+    Args:
+        image (dict): detection_images row with 'id' and 'image_path'
+        width (int): Optional derivative width
+
+    Returns:
+        str: Absolute URL of the image
+    """
+    try:
+        version = file_version(os.stat(image['image_path']))
+    except OSError:
+        version = "missing"
+    url = f"{API_PUBLIC_URL}/api/images/{image['id']}?v={version}"
+    if width:
+        url += f"&w={nearest_derivative_width(width)}"
+    return url
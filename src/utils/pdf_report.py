@@ -0,0 +1,163 @@
+import io
+import json
+
+# A4 at 150 dpi
+PAGE_SIZE = (1240, 1754)
+MARGIN = 90
+LINE_SPACING = 1.35
+THUMBNAIL_SIZE = (510, 400)
+REPORT_TOP_CLASSES = 5  # Most likely classes listed when a result has probabilities
+
+
+def _font(size):
+    from PIL import ImageFont
+
+    return ImageFont.load_default(size=size)
+
+
+def _wrap(draw, text, font, width):
+    """Split text into lines that fit width pixels, keeping explicit line breaks."""
+    lines = []
+    for paragraph in str(text).splitlines() or [""]:
+        line = ""
+        for word in paragraph.split(" "):
+            candidate = f"{line} {word}" if line else word
+            if draw.textlength(candidate, font=font) <= width:
+                line = candidate
+            else:
+                if line:
+                    lines.append(line)
+                line = word
+        lines.append(line)
+    return lines
+
+
+def _format_detection_result(result):
+    if not result:
+        return "No detection result"
+    if isinstance(result, str):
+        result = json.loads(result)
+    if isinstance(result, dict) and "detection" in result:
+        text = str(result["detection"])
+        if isinstance(result.get("confidence"), (int, float)):
+            text += f" (confidence {result['confidence']:.0%})"
+        probabilities = result.get("probabilities")
+        if isinstance(probabilities, dict):
+            ranked = sorted(probabilities.items(), key=lambda item: item[1], reverse=True)
+            text += "".join(f"\n{label}: {p:.1%}" for label, p in ranked[:REPORT_TOP_CLASSES] if p > 0)
+        extra = {k: v for k, v in result.items() if k not in ("detection", "confidence", "probabilities")}
+        if extra:
+            text += "\n" + json.dumps(extra, indent=2, default=str)
+        return text
+    return json.dumps(result, indent=2, default=str)
+
+
+class _PageWriter:
+    """Lays out text blocks and images top to bottom, starting new pages as needed."""
+
+    def __init__(self):
+        from PIL import Image, ImageDraw
+
+        self._Image = Image
+        self._ImageDraw = ImageDraw
+        self.pages = []
+        self._new_page()
+
+    def _new_page(self):
+        self.page = self._Image.new("RGB", PAGE_SIZE, "white")
+        self.draw = self._ImageDraw.Draw(self.page)
+        self.pages.append(self.page)
+        self.y = MARGIN
+
+    def _ensure(self, height):
+        if self.y + height > PAGE_SIZE[1] - MARGIN:
+            self._new_page()
+
+    def text(self, text, size=26, color="black", gap=10):
+        font = _font(size)
+        line_height = int(size * LINE_SPACING)
+        for line in _wrap(self.draw, text, font, PAGE_SIZE[0] - 2 * MARGIN):
+            self._ensure(line_height)
+            self.draw.text((MARGIN, self.y), line, font=font, fill=color)
+            self.y += line_height
+        self.y += gap
+
+    def heading(self, text):
+        self._ensure(90)
+        self.y += 14
+        self.text(text, size=32, color="#1f3b73", gap=4)
+        self.draw.line((MARGIN, self.y, PAGE_SIZE[0] - MARGIN, self.y), fill="#c8d0e0", width=2)
+        self.y += 14
+
+    def images(self, image_paths):
+        """Place images two per row as thumbnails."""
+        column_width = (PAGE_SIZE[0] - 2 * MARGIN) // 2
+        for row_start in range(0, len(image_paths), 2):
+            thumbnails = []
+            for path in image_paths[row_start:row_start + 2]:
+                try:
+                    with self._Image.open(path) as img:
+                        img.draft("RGB", THUMBNAIL_SIZE)  # Decode large JPEGs at reduced size
+                        img = img.convert("RGB")
+                        img.thumbnail(THUMBNAIL_SIZE)
+                        thumbnails.append(img)
+                except OSError:
+                    continue
+            if not thumbnails:
+                continue
+            row_height = max(t.height for t in thumbnails)
+            self._ensure(row_height)
+            for index, thumbnail in enumerate(thumbnails):
+                self.page.paste(thumbnail, (MARGIN + index * column_width, self.y))
+            self.y += row_height + 24
+
+
+def render_session_report(session):
+    """
+    Render a detection session report as a PDF.
+
+    Pages are drawn with Pillow and saved as a multi-page PDF, so no extra
+    PDF library is needed.
+
+    Args:
+        session (dict): Session fields plus patient fields ('patient_id',
+            'name', 'sex', 'age', 'date_of_birth') and 'image_paths'
+
+    Returns:
+        bytes: The PDF document
+    """
+    writer = _PageWriter()
+    writer.text("Skin Disease Detection - Session Report", size=40, color="#1f3b73", gap=20)
+
+    writer.heading("Patient")
+    writer.text(
+        f"{session['name']} ({session['patient_id']})\n"
+        f"Sex: {session['sex']}    Date of birth: {session['date_of_birth']:%Y-%m-%d}    Age: {session['age']}"
+    )
+
+    writer.heading("Detection session")
+    writer.text(f"Date: {session['detection_date']:%Y-%m-%d %H:%M}")
+    writer.text(_format_detection_result(session['detection_result']))
+
+    writer.heading("Diagnostic result")
+    writer.text(session['diagnostic_result'] or "-")
+
+    writer.heading("Follow-up plan")
+    writer.text(session['follow_up_plan'] or "-")
+
+    if session['image_paths']:
+        writer.heading(f"Images ({len(session['image_paths'])})")
+        writer.images(session['image_paths'])
+
+    for number, page in enumerate(writer.pages, start=1):
+        page_draw = writer._ImageDraw.Draw(page)
+        page_draw.text(
+            (MARGIN, PAGE_SIZE[1] - MARGIN // 2 - 20),
+            f"Last updated {session['updated_at']:%Y-%m-%d %H:%M}    Page {number} of {len(writer.pages)}",
+            font=_font(20),
+            fill="#777777",
+        )
+
+    output = io.BytesIO()
+    writer.pages[0].save(output, format="PDF", save_all=True, append_images=writer.pages[1:], resolution=150)
+    return output.getvalue()
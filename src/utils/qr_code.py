@@ -1,18 +1,19 @@
-import qrcode
-import cv2
-import numpy as np
+import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
-def generate_qr(text, filename="qr_code.png"):
+def make_qr_image(text):
     """
-    Generate a QR code from text and save it as an image
+    Build the QR code image for a text, without saving it
     
     Args:
         text (str): The text to encode in the QR code
-        filename (str): The filename to save the QR code image (default: qr_code.png)
     
     Returns:
-        str: Path to the saved QR code image
+        PIL image of the QR code
     """
+    import qrcode
+
     # Create QR code instance
     qr = qrcode.QRCode(
         version=1,
@@ -26,12 +27,122 @@ def generate_qr(text, filename="qr_code.png"):
     qr.make(fit=True)
     
     # Create an image from the QR Code
-    qr_image = qr.make_image(fill_color="black", back_color="white")
+    return qr.make_image(fill_color="black", back_color="white")
+
+def generate_qr(text, filename="qr_code.png"):
+    """
+    Generate a QR code from text and save it as an image
+    
+    Args:
+        text (str): The text to encode in the QR code
+        filename (str): The filename to save the QR code image (default: qr_code.png)
+    
+    Returns:
+        str: Path to the saved QR code image
+    """
+    qr_image = make_qr_image(text)
     
     # Save the image
     qr_image.save(filename)
     return filename
 
+def generate_qr_png(text):
+    """
+    Generate a QR code from text as PNG bytes
+    
+    Args:
+        text (str): The text to encode in the QR code
+    
+    Returns:
+        bytes: The encoded PNG
+    """
+    buffer = io.BytesIO()
+    make_qr_image(text).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+_detectors = threading.local()
+
+# Photos are shrunk to this longest side before detection; wristband codes stay readable
+QR_DETECT_MAX_SIDE = 1024
+
+def _get_detector():
+    """Return this thread's QR detector (OpenCV detectors are not thread-safe)."""
+    detector = getattr(_detectors, "detector", None)
+    if detector is None:
+        import cv2
+        detector = _detectors.detector = cv2.QRCodeDetector()
+    return detector
+
+def decode_qr_image(image, max_side=QR_DETECT_MAX_SIDE):
+    """
+    Decode every QR code in an OpenCV image
+    
+    The image is downscaled first; if nothing is found that way, detection is
+    retried once at full resolution for small codes in large photos.
+    
+    Args:
+        image: BGR or grayscale image array
+        max_side (int): Longest side used for the first detection pass
+    
+    Returns:
+        list: Decoded texts, empty if no QR code was found
+    """
+    import cv2
+
+    if image is None:
+        return []
+
+    height, width = image.shape[:2]
+    scale = max_side / max(height, width)
+    candidates = [image]
+    if scale < 1:
+        small = cv2.resize(image, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+        candidates.insert(0, small)
+
+    detector = _get_detector()
+    for candidate in candidates:
+        found, decoded, points, _ = detector.detectAndDecodeMulti(candidate)
+        texts = [text for text in decoded if text] if found else []
+        if texts:
+            return list(dict.fromkeys(texts))
+    return []
+
+def decode_qr_bytes(data, max_side=QR_DETECT_MAX_SIDE):
+    """
+    Decode every QR code in an encoded image (PNG, JPEG, ...)
+    
+    Args:
+        data (bytes): The encoded image
+        max_side (int): Longest side used for the first detection pass
+    
+    Returns:
+        list: Decoded texts, empty if no QR code was found
+    """
+    import cv2
+    import numpy as np
+
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+    return decode_qr_image(image, max_side)
+
+def batch_decode_qr(images, workers=4):
+    """
+    Decode QR codes from many encoded images in a thread pool
+    
+    OpenCV releases the GIL while detecting, and each thread keeps its own
+    detector, so threads scale without pickling image bytes to processes.
+    
+    Args:
+        images (list): Encoded images as bytes
+        workers (int): Number of decoding threads
+    
+    Returns:
+        list: For each image, the list of decoded texts
+    """
+    if len(images) <= 1:
+        return [decode_qr_bytes(data) for data in images]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(decode_qr_bytes, images))
+
 def read_qr(image_path):
     """
     Read a QR code from an image using OpenCV
@@ -42,16 +153,15 @@ def read_qr(image_path):
     Returns:
         str: Decoded text from the QR code
     """
-    # Read the image
-    image = cv2.imread(image_path)
-    
-    # Initialize the QR code detector
-    qr_detector = cv2.QRCodeDetector()
+    # OpenCV is slow to import, so only load it when a QR code is actually read
+    import cv2
+
+    # Read the image in grayscale; detection does not need colour
+    image = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
     
-    # Detect and decode the QR code
-    data, bbox, straight_qrcode = qr_detector.detectAndDecode(image)
+    texts = decode_qr_image(image)
     
-    if bbox is not None:
-        return data
+    if texts:
+        return texts[0]
     else:
         return "No QR code found"
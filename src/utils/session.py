@@ -27,6 +27,14 @@ def reset_session_state_at_home_page():
         st.session_state.edited_session_index = None
     if 'deleted_session' in st.session_state:
         st.session_state.deleted_session = None
+    if 'sessions_page' in st.session_state:
+        st.session_state.sessions_page = 0
+    if 'open_galleries' in st.session_state:
+        st.session_state.open_galleries = set()
+    if 'open_results' in st.session_state:
+        st.session_state.open_results = set()
+    if 'open_similar' in st.session_state:
+        st.session_state.open_similar = set()
 
 def set_authenticated(username: str):
     """Set the session as authenticated."""
@@ -0,0 +1,288 @@
+import atexit
+import functools
+import json
+import os
+import queue
+import secrets
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from loguru import logger
+from psycopg2.extras import RealDictCursor
+
+from config import (
+    TRACING_ENABLED,
+    TRACING_EXPORTER,
+    TRACING_FILE,
+    TRACING_OTLP_ENDPOINT,
+    TRACING_SERVICE_NAME,
+)
+
+_current_span = ContextVar("current_span", default=None)
+_query_counter = ContextVar("query_counter", default=None)
+
+
+class Span:
+    """A single timed operation inside a trace."""
+
+    def __init__(self, name, trace_id, parent_id=None, attributes=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self.status = "OK"
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": (self.end_ns - self.start_ns) / 1e6,
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class JsonFileExporter:
+    """Append finished spans to a JSON lines file."""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def export(self, spans):
+        with open(self.path, "a") as f:
+            for s in spans:
+                f.write(json.dumps(s.to_dict(), default=str) + "\n")
+
+
+class OtlpHttpExporter:
+    """Send spans to an OTLP/HTTP JSON endpoint (collector or stand-in)."""
+
+    def __init__(self, endpoint, service_name):
+        self.endpoint = endpoint
+        self.service_name = service_name
+
+    def _encode(self, spans):
+        otlp_spans = []
+        for s in spans:
+            otlp_spans.append({
+                "traceId": s.trace_id,
+                "spanId": s.span_id,
+                "parentSpanId": s.parent_id or "",
+                "name": s.name,
+                "startTimeUnixNano": str(s.start_ns),
+                "endTimeUnixNano": str(s.end_ns),
+                "status": {"code": 1 if s.status == "OK" else 2},
+                "attributes": [
+                    {"key": k, "value": {"stringValue": str(v)}}
+                    for k, v in s.attributes.items()
+                ],
+            })
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [
+                    {"key": "service.name", "value": {"stringValue": self.service_name}}
+                ]},
+                "scopeSpans": [{"scope": {"name": "src.utils.tracing"}, "spans": otlp_spans}],
+            }]
+        }
+
+    def export(self, spans):
+        body = json.dumps(self._encode(spans)).encode()
+        request = urllib.request.Request(
+            self.endpoint,
+            data=body,
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        urllib.request.urlopen(request, timeout=5).close()
+
+
+class BatchSpanProcessor:
+    """Buffer finished spans and export them from a background thread."""
+
+    def __init__(self, exporter, max_batch=256, interval=1.0):
+        self.exporter = exporter
+        self.max_batch = max_batch
+        self.interval = interval
+        self._queue = queue.Queue(maxsize=10000)
+        self._thread = threading.Thread(target=self._run, daemon=True, name="span-exporter")
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def on_end(self, span):
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            pass  # Never block the request path on telemetry
+
+    def _drain(self):
+        batch = []
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def flush(self):
+        batch = self._drain()
+        while batch:
+            try:
+                self.exporter.export(batch)
+            except Exception as e:
+                logger.warning(f"Error exporting spans: {e}")
+                return
+            batch = self._drain()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            self.flush()
+
+
+def _create_processor():
+    if not TRACING_ENABLED:
+        return None
+    if TRACING_EXPORTER == "otlp":
+        exporter = OtlpHttpExporter(TRACING_OTLP_ENDPOINT, TRACING_SERVICE_NAME)
+    else:
+        exporter = JsonFileExporter(TRACING_FILE)
+    return BatchSpanProcessor(exporter)
+
+
+_processor = _create_processor()
+
+
+def current_span():
+    """Return the active span, or None outside of a trace."""
+    return _current_span.get()
+
+
+@contextmanager
+def span(name, parent=None, **attributes):
+    """
+    Time a block of code as a child of the active span.
+
+    Args:
+        name (str): Span name, e.g. "db.query" or "render.patient_detail"
+        parent (tuple): Optional (trace_id, span_id) of a remote parent
+        **attributes: Extra attributes recorded on the span
+
+    Yields:
+        Span: The started span, or None when tracing is disabled
+    """
+    if _processor is None:
+        yield None
+        return
+
+    active = _current_span.get()
+    if parent:
+        trace_id, parent_id = parent
+    elif active:
+        trace_id, parent_id = active.trace_id, active.span_id
+    else:
+        trace_id, parent_id = secrets.token_hex(16), None
+
+    s = Span(name, trace_id, parent_id, attributes)
+    token = _current_span.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.status = "ERROR"
+        s.set_attribute("error", repr(e))
+        raise
+    finally:
+        s.end_ns = time.time_ns()
+        _current_span.reset(token)
+        _processor.on_end(s)
+
+
+def traced(name=None):
+    """Decorator that wraps each call of a function in a span."""
+    def decorator(func):
+        span_name = name or f"{func.__module__}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def parse_traceparent(header):
+    """
+    Parse a W3C traceparent header.
+
+    Returns:
+        tuple: (trace_id, parent_span_id) or None if the header is invalid
+    """
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    return parts[1], parts[2]
+
+
+def format_traceparent(s):
+    """Format a span as a W3C traceparent header value."""
+    return f"00-{s.trace_id}-{s.span_id}-01"
+
+
+@contextmanager
+def count_queries():
+    """
+    Count statements executed through TracedCursor in the current context.
+
+    Yields:
+        dict: {"count": int, "statements": [(query, vars), ...]}, updated as statements run
+    """
+    counter = {"count": 0, "statements": []}
+    token = _query_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _query_counter.reset(token)
+
+
+@contextmanager
+def query_span(query, vars=None):
+    """
+    Record one statement for count_queries() and time it as a db.query span.
+
+    Yields:
+        Span: The started span, or None when tracing is disabled
+    """
+    counter = _query_counter.get()
+    if counter is not None:
+        counter["count"] += 1
+        counter["statements"].append((query, vars))
+    if _processor is None:
+        yield None
+        return
+    statement = query if isinstance(query, str) else str(query)
+    with span("db.query", statement=" ".join(statement.split())[:200]) as s:
+        yield s
+
+
+class TracedCursor(RealDictCursor):
+    """RealDictCursor that records every statement as a db.query span."""
+
+    def execute(self, query, vars=None):
+        with query_span(query, vars):
+            return super().execute(query, vars)
@@ -0,0 +1,173 @@
+import numpy as np
+
+# Below this many vectors an exact scan is faster than probing partitions
+BRUTE_FORCE_MAX = 50000
+
+# Vectors added after partitioning are scanned exactly until this many accumulate
+TAIL_MAX = 10000
+
+
+def _top_k(scores, k):
+    """Indices of the k largest scores, best first."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    idx = np.argpartition(-scores, k - 1)[:k]
+    return idx[np.argsort(-scores[idx])]
+
+
+def _kmeans(vectors, n_clusters, iterations=10, seed=0):
+    """Spherical k-means on unit vectors; returns normalised centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        empty = norms[:, 0] == 0
+        # Re-seed empty clusters with random points
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+        norms[empty] = 1
+        centroids = (sums / norms).astype(np.float32)
+    return centroids
+
+
+class VectorIndex:
+    """
+    In-memory top-k cosine similarity index over unit vectors.
+
+    Small collections are scanned exactly. Large ones use an inverted-file
+    (IVF) layout: vectors are partitioned by their nearest k-means centroid
+    and a query only scans the `nprobe` closest partitions, plus a small tail
+    of recently added vectors that have not been merged into partitions yet.
+    """
+
+    def __init__(self, dim, brute_force_max=BRUTE_FORCE_MAX, nprobe=16):
+        self.dim = dim
+        self.brute_force_max = brute_force_max
+        self.nprobe = nprobe
+        self.ids = []
+        self._vectors = np.empty((1024, dim), dtype=np.float32)
+        self._groups = np.empty(1024, dtype=np.int64)
+        self.centroids = None
+        self._assignment = None
+        self._list_order = None  # Row numbers sorted by partition
+        self._list_offsets = None
+        self._merged = 0  # Rows covered by the partition lists; later rows form the tail
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def vectors(self):
+        return self._vectors[:len(self)]
+
+    @property
+    def groups(self):
+        return self._groups[:len(self)]
+
+    def _reserve(self, extra):
+        needed = len(self) + extra
+        if needed <= len(self._vectors):
+            return
+        capacity = max(needed, 2 * len(self._vectors))
+        vectors = np.empty((capacity, self.dim), dtype=np.float32)
+        vectors[:len(self)] = self.vectors
+        groups = np.empty(capacity, dtype=np.int64)
+        groups[:len(self)] = self.groups
+        self._vectors, self._groups = vectors, groups
+
+    def add(self, ids, vectors, groups=None):
+        """
+        Append vectors.
+
+        Args:
+            ids (list): External id of each vector
+            vectors: (n, dim) array of unit vectors
+            groups: Optional int per vector (e.g. patient) for filtered queries
+        """
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        n = len(vectors)
+        self._reserve(n)
+        start = len(self)
+        self._vectors[start:start + n] = vectors
+        self._groups[start:start + n] = 0 if groups is None else np.asarray(groups, dtype=np.int64)
+        self.ids.extend(ids)
+
+        if self.centroids is None:
+            if len(self) > self.brute_force_max:
+                self.build()
+        elif len(self) - self._merged > TAIL_MAX:
+            self._merge_tail()
+
+    def build(self, seed=0):
+        """Train partitions; called automatically once the index outgrows brute force."""
+        n = len(self)
+        if n <= self.brute_force_max:
+            self.centroids = None
+            return
+        n_lists = int(np.sqrt(n))
+        sample = self.vectors[np.random.default_rng(seed).choice(n, min(n, n_lists * 64), replace=False)]
+        self.centroids = _kmeans(sample, n_lists, seed=seed)
+        self._assignment = np.empty(0, dtype=np.int64)
+        self._merged = 0
+        self._merge_tail()
+
+    def _merge_tail(self, chunk=65536):
+        tail = self.vectors[self._merged:]
+        assignment = np.empty(len(tail), dtype=np.int64)
+        for start in range(0, len(tail), chunk):
+            assignment[start:start + chunk] = np.argmax(tail[start:start + chunk] @ self.centroids.T, axis=1)
+        self._assignment = np.concatenate([self._assignment, assignment])
+        self._list_order = np.argsort(self._assignment, kind="stable")
+        counts = np.bincount(self._assignment, minlength=len(self.centroids))
+        self._list_offsets = np.concatenate([[0], np.cumsum(counts)])
+        self._merged = len(self)
+
+    def _candidates(self, query):
+        if self.centroids is None:
+            return None
+        probes = _top_k(self.centroids @ query, self.nprobe)
+        lists = [self._list_order[self._list_offsets[p]:self._list_offsets[p + 1]] for p in probes]
+        lists.append(np.arange(self._merged, len(self)))
+        return np.concatenate(lists)
+
+    def search(self, query, k=10, group=None, exclude=None):
+        """
+        Find the k most similar vectors.
+
+        Args:
+            query: Unit vector of length dim
+            k (int): Number of results
+            group (int): Only return vectors of this group (exact scan of the group)
+            exclude (set): External ids to leave out, e.g. the query image itself
+
+        Returns:
+            list: (id, cosine similarity) tuples, best first
+        """
+        if not len(self):
+            return []
+        query = np.asarray(query, dtype=np.float32)
+        exclude = exclude or set()
+
+        if group is not None:
+            rows = np.flatnonzero(self.groups == group)
+        else:
+            rows = self._candidates(query)
+
+        if rows is None:
+            scores = self.vectors @ query
+            rows = np.arange(len(self))
+        else:
+            scores = self.vectors[rows] @ query
+
+        results = []
+        for i in _top_k(scores, k + len(exclude)):
+            item_id = self.ids[rows[i]]
+            if item_id in exclude:
+                continue
+            results.append((item_id, float(scores[i])))
+            if len(results) == k:
+                break
+        return results
@@ -0,0 +1,66 @@
+import zipfile
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class _ChunkSink:
+    """Write-only, non-seekable file object that hands written bytes back to the generator."""
+
+    def __init__(self):
+        self._chunks = []
+        self._offset = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._offset += len(data)
+        return len(data)
+
+    def tell(self):
+        # zipfile records member offsets via tell(); seek() is deliberately absent
+        return self._offset
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_zip(members, chunk_size=CHUNK_SIZE):
+    """
+    Build a zip archive incrementally, yielding bytes as they are produced.
+
+    zipfile writes to a non-seekable sink using data descriptors, so at most
+    one chunk of one member is held in memory at a time, however large the
+    archive.
+
+    Args:
+        members: Iterable of (archive name, source, compress) where source is
+            bytes or a filesystem path; compress deflates the member (leave it
+            off for already-compressed images)
+        chunk_size (int): Bytes read from a source file per write
+
+    Yields:
+        bytes: Consecutive pieces of the zip archive
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, mode="w", allowZip64=True) as archive:
+        for name, source, compress in members:
+            info = zipfile.ZipInfo(name)
+            info.compress_type = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+            with archive.open(info, mode="w", force_zip64=True) as member:
+                if isinstance(source, bytes):
+                    member.write(source)
+                else:
+                    with open(source, "rb") as f:
+                        while chunk := f.read(chunk_size):
+                            member.write(chunk)
+                            data = sink.drain()
+                            if data:
+                                yield data
+            data = sink.drain()
+            if data:
+                yield data
+    yield sink.drain()
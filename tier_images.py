@@ -0,0 +1,36 @@
+import argparse
+import time
+
+from config import IMAGE_COLD_QUALITY, IMAGE_TIER_AFTER_DAYS
+from src.services.image_tiering import tier_old_images
+from src.services.storage import require_postgres
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move old detection images to cold storage as WebP")
+    parser.add_argument("--older-than-days", type=int, default=IMAGE_TIER_AFTER_DAYS)
+    parser.add_argument("--quality", type=int, default=IMAGE_COLD_QUALITY, help="WebP quality")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--batch-size", type=int, default=200, help="Files repointed per transaction")
+    parser.add_argument("--limit", type=int, default=None, help="Maximum files to move in this run")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be moved")
+    args = parser.parse_args()
+    require_postgres("Image tiering")
+
+    started = time.perf_counter()
+    stats = tier_old_images(
+        older_than_days=args.older_than_days,
+        quality=args.quality,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        limit=args.limit,
+        dry_run=args.dry_run,
+    )
+    elapsed = time.perf_counter() - started
+
+    if args.dry_run:
+        print(f"{stats['files']} files ({stats['bytes_before'] / 1e6:.1f} MB) would be moved")
+    else:
+        saved = stats['bytes_before'] - stats['bytes_after']
+        print(f"Moved {stats['files']} files ({stats['rows']} rows) in {elapsed:.1f}s, "
+              f"{stats['bytes_before'] / 1e6:.1f} MB -> {stats['bytes_after'] / 1e6:.1f} MB "
+              f"(saved {saved / 1e6:.1f} MB), {stats['failed']} failed")
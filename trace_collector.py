@@ -0,0 +1,108 @@
+import argparse
+import json
+import os
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from config import TRACING_FILE
+
+
+def otlp_to_spans(payload):
+    """Flatten an OTLP/JSON export request into the span dicts written by JsonFileExporter."""
+    spans = []
+    for resource_spans in payload.get("resourceSpans", []):
+        for scope_spans in resource_spans.get("scopeSpans", []):
+            for s in scope_spans.get("spans", []):
+                start_ns = int(s["startTimeUnixNano"])
+                end_ns = int(s["endTimeUnixNano"])
+                spans.append({
+                    "trace_id": s["traceId"],
+                    "span_id": s["spanId"],
+                    "parent_id": s.get("parentSpanId") or None,
+                    "name": s["name"],
+                    "start_ns": start_ns,
+                    "end_ns": end_ns,
+                    "duration_ms": (end_ns - start_ns) / 1e6,
+                    "status": "OK" if s.get("status", {}).get("code", 1) != 2 else "ERROR",
+                    "attributes": {
+                        a["key"]: next(iter(a["value"].values()), None)
+                        for a in s.get("attributes", [])
+                    },
+                })
+    return spans
+
+
+def serve(host, port, output):
+    """Run a minimal OTLP/HTTP JSON collector that appends spans to a JSON lines file."""
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+
+    class CollectorHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path != "/v1/traces":
+                self.send_response(404)
+                self.end_headers()
+                return
+            length = int(self.headers.get("Content-Length", 0))
+            spans = otlp_to_spans(json.loads(self.rfile.read(length)))
+            with open(output, "a") as f:
+                for s in spans:
+                    f.write(json.dumps(s) + "\n")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(b"{}")
+
+        def log_message(self, format, *args):
+            pass
+
+    print(f"Collecting spans on http://{host}:{port}/v1/traces -> {output}")
+    ThreadingHTTPServer((host, port), CollectorHandler).serve_forever()
+
+
+def report(path, limit):
+    """Print a per-trace latency breakdown of the slowest traces in a span file."""
+    traces = defaultdict(list)
+    with open(path) as f:
+        for line in f:
+            s = json.loads(line)
+            traces[s["trace_id"]].append(s)
+
+    def root_of(spans):
+        ids = {s["span_id"] for s in spans}
+        roots = [s for s in spans if s["parent_id"] not in ids]
+        return max(roots, key=lambda s: s["duration_ms"])
+
+    ranked = sorted(traces.values(), key=lambda spans: root_of(spans)["duration_ms"], reverse=True)
+    for spans in ranked[:limit]:
+        root = root_of(spans)
+        print(f"\n{root['name']} {root['attributes']} total={root['duration_ms']:.1f}ms")
+
+        # Aggregate child time by span name, e.g. db.query vs file.read vs render.*
+        by_name = defaultdict(lambda: [0, 0.0])
+        for s in spans:
+            if s is root:
+                continue
+            by_name[s["name"]][0] += 1
+            by_name[s["name"]][1] += s["duration_ms"]
+        for name, (count, total) in sorted(by_name.items(), key=lambda kv: kv[1][1], reverse=True):
+            print(f"  {name:<60} x{count:<4} {total:8.1f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Trace collector stand-in and latency report")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = subparsers.add_parser("serve", help="Accept OTLP/HTTP JSON spans")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=4318)
+    serve_parser.add_argument("--output", default=TRACING_FILE)
+
+    report_parser = subparsers.add_parser("report", help="Per-trace latency breakdown")
+    report_parser.add_argument("--input", default=TRACING_FILE)
+    report_parser.add_argument("--limit", type=int, default=10)
+
+    args = parser.parse_args()
+    if args.command == "serve":
+        serve(args.host, args.port, args.output)
+    else:
+        report(args.input, args.limit)